@@ -11,6 +11,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import time
+
+# 从导入插件开始计算启用耗时
+_import_start = time.perf_counter()
+
 bl_info = {
     'name': 'Bobh_mmd_genshin_shader_importer',
     'author': 'BobH',
@@ -22,82 +27,22 @@ bl_info = {
 }
 
 import bpy
-import os
-from .operators.apply_shader_to_mmd_mode import BOBH_OT_apply_shader_to_mmd_model
-from .operators.set_character_material_directory import BOBH_OT_set_character_material_directory
-from .operators.apply_light_and_outline import BOBH_OT_apply_light_and_outline
-from .operators.apply_postprocess import BOBH_OT_apply_postprocess
-
-class BOBH_OT_open_url(bpy.types.Operator):
-    """Operator to open URLs in web browser"""
-    bl_idname = "bobh.open_url"
-    bl_label = "Open URL"
-    bl_description = "Open URL in web browser"
-    
-    url: bpy.props.StringProperty(name="URL", default="")
-    
-    def execute(self, context):
-        import webbrowser
-        webbrowser.open(self.url)
-        return {'FINISHED'}
-
-class BOBH_PT_main_panel(bpy.types.Panel):
-    """Main panel for Genshin Impact shader tools"""
-    bl_space_type = 'VIEW_3D'
-    bl_region_type = 'UI'
-    bl_category = 'BobHTool'
-    bl_label = '仿原神渲染'
+from bpy.app.handlers import persistent
+from . import registry
+from .preferences import use_texture_proxies
 
-    def draw(self, context):
-        layout = self.layout
-        scene = context.scene
-
-        # Main functionality box
-        box = layout.box()
-        box.label(text="一键导入原神Shader", icon='MATERIAL')
-        
-        # Material directory settings
-        row = box.row()
-        row.operator('bobh.set_material_directory', text='设置角色材质目录')
-        
-        row = box.row()
-        row.label(text=f'当前材质目录: {scene.material_directory}')
-        
-        # Main operators
-        row = box.row()
-        row.operator('bobh.apply_shader_to_mmd_model', text='应用材质到选定mmd模型')
-        
-        row = box.row()
-        row.operator('bobh.apply_light_and_outline', text='应用灯光和描边效果')
-        
-        row = box.row()
-        row.operator('bobh.apply_postprocess', text='应用后处理')
-        
-        # Credits section
-        layout.separator()
-        credits_box = layout.box()
-        credits_box.label(text="Credits:")
-        
-        # Original author
-        row = credits_box.row(align=True)
-        row.label(text="shader原作者:")
-        op = row.operator('bobh.open_url', text='festivity', emboss=False)
-        op.url = "https://github.com/festivities"
-        
-        # Modifier
-        row = credits_box.row(align=True)
-        row.label(text="shader修改:")
-        op = row.operator('bobh.open_url', text='克里斯提亚娜', emboss=False)
-        op.url = "https://space.bilibili.com/322607631"
+@persistent
+def _bind_texture_proxies_on_load(*args):
+    # 打开文件后重新绑定磁盘上已有的代理贴图，只有启用了代理贴图时才导入texture_proxy
+    if bpy.app.background or not use_texture_proxies():
+        return
+    from .utils.texture_proxy import bind_cached_proxies
+    bind_cached_proxies()
 
 def register():
     """Register all classes and properties"""
-    bpy.utils.register_class(BOBH_OT_open_url)
-    bpy.utils.register_class(BOBH_PT_main_panel)
-    bpy.utils.register_class(BOBH_OT_set_character_material_directory)
-    bpy.utils.register_class(BOBH_OT_apply_shader_to_mmd_model)
-    bpy.utils.register_class(BOBH_OT_apply_light_and_outline)
-    bpy.utils.register_class(BOBH_OT_apply_postprocess)
+    # 注册表驱动注册：耗时的操作模块在第一次调用时才导入，无界面运行时跳过面板
+    registry.register()
 
     bpy.types.Scene.material_directory = bpy.props.StringProperty(
         name='Material Directory',
@@ -106,16 +51,36 @@ def register():
         default=""
     )
 
+    bpy.types.Object.material_directory = bpy.props.StringProperty(
+        name='Material Directory',
+        description='Directory for this MMD model\'s character materials',
+        subtype='DIR_PATH',
+        default=""
+    )
+
+    bpy.types.Scene.character_library_filter = bpy.props.StringProperty(
+        name='Character Filter',
+        description='按名称或路径筛选角色库中的角色',
+        default=""
+    )
+
+    # 工具模块在第一次导入时注册自己的处理函数，这里只为之前已经导入过的模块重新注册
+    registry.register_handlers()
+    bpy.app.handlers.load_post.append(_bind_texture_proxies_on_load)
+
+    enable_time = registry.record_enable_time(_import_start)
+    print(f'{bl_info["name"]} 启用耗时 {enable_time * 1000:.1f} ms')
+
 def unregister():
     """Unregister all classes and properties"""
-    bpy.utils.unregister_class(BOBH_OT_open_url)
-    bpy.utils.unregister_class(BOBH_PT_main_panel)
-    bpy.utils.unregister_class(BOBH_OT_set_character_material_directory)
-    bpy.utils.unregister_class(BOBH_OT_apply_shader_to_mmd_model)
-    bpy.utils.unregister_class(BOBH_OT_apply_light_and_outline)
-    bpy.utils.unregister_class(BOBH_OT_apply_postprocess)
+    if _bind_texture_proxies_on_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_bind_texture_proxies_on_load)
+    registry.unregister_handlers()
+    registry.unregister()
 
     del bpy.types.Scene.material_directory
+    del bpy.types.Object.material_directory
+    del bpy.types.Scene.character_library_filter
 
 if __name__ == '__main__':
     register()
\ No newline at end of file
@@ -2,19 +2,14 @@ import bpy
 import os
 from bpy.types import ShaderNodeTexImage, ShaderNodeGroup
 from ..bobh_exception import BobHException
+from ..utils.preset_library import PIPELINE_ASSETS, get_preset_path, load_pipeline_assets, find_preset_datablock
+from ..utils.stage_timer import StageTimer
 
 
 class BOBH_OT_apply_postprocess(bpy.types.Operator):
     bl_label = '应用后处理'
     bl_idname = 'bobh.apply_postprocess'
     
-    def try_rename_node_group(self, filepath, group_name, import_name):
-        """安全重命名节点组"""
-        if group_name not in bpy.data.node_groups:
-            raise BobHException(f'节点组"{group_name}"不存在于文件中')
-        bpy.data.node_groups[group_name].name = import_name
-        return True
-
     def setup_compositor_nodes(self, context):
         """设置合成器节点连接"""
         scene = context.scene
@@ -32,7 +27,7 @@ class BOBH_OT_apply_postprocess(bpy.types.Operator):
         render_node = tree.nodes.new('CompositorNodeRLayers')
         render_node.location = (-400, 0)
         
-        post_group = bpy.data.node_groups.get('GI_PostProcessing')
+        post_group = find_preset_datablock('node_groups', 'GI_PostProcessing')
         if not post_group:
             raise BobHException('后处理节点组未加载')
 
@@ -63,23 +58,36 @@ class BOBH_OT_apply_postprocess(bpy.types.Operator):
 
     def execute(self, context):
         """主执行函数"""
-        addon_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-        blend_path = os.path.join(addon_dir, "Data", "Genshin Impact Post-Processing.blend")
+        timer = StageTimer(self.bl_idname)
+        result = {'CANCELLED'}
+        try:
+            result = self.apply(context, timer)
+            return result
+        finally:
+            timer.finish(next(iter(result)))
+
+    def apply(self, context, timer: StageTimer):
+        blend_path = get_preset_path('POSTPROCESS')
         
         if not os.path.exists(blend_path):
             self.report({'ERROR'}, f'文件不存在: {blend_path}')
             return {'CANCELLED'}
             
         try:
-            # 导入节点组
-            with bpy.data.libraries.load(blend_path, link=False) as (data_from, data_to):
-                if 'HoYoverse - Post Processing' not in data_from.node_groups:
-                    raise BobHException('目标节点组不在文件中')
-                data_to.node_groups = ['HoYoverse - Post Processing']
+            # 节点组已存在时直接复用，避免重复导入产生 .001 副本
+            with timer.stage('import_postprocess_preset'):
+                if find_preset_datablock('node_groups', 'GI_PostProcessing') is None:
+                    # 导入节点组（是否存在由缓存的名称清单检查，不必先打开库文件）
+                    loaded = load_pipeline_assets('apply_postprocess')['POSTPROCESS']
+                    node_group_names = PIPELINE_ASSETS['apply_postprocess']['POSTPROCESS']['node_groups']
+                    for group_name, import_name in node_group_names.items():
+                        # 链接的库数据不能重命名，通过find_preset_datablock按原名称查找
+                        if loaded['node_groups'][group_name].library is None:
+                            loaded['node_groups'][group_name].name = import_name
 
-            # 重命名并设置
-            self.try_rename_node_group(blend_path, 'HoYoverse - Post Processing', 'GI_PostProcessing')
-            self.setup_compositor_nodes(context)
+            with timer.stage('setup_compositor_nodes') as counts:
+                self.setup_compositor_nodes(context)
+                counts['nodes'] = len(context.scene.node_tree.nodes)
 
         except BobHException as e:
             self.report({'ERROR'}, str(e))
@@ -1,49 +1,130 @@
 import bpy
 import os
-import json
+from functools import partial
 from ..bobh_exception import BobHException
+from ..utils.character_asset_index import CharacterAssetIndex
+from ..utils.image_cache import load_image, evict_unused_duplicates
+from ..utils.texture_preflight import TexturePreflight, check_texture_headers
+from ..utils.outline_info import OutlineSidecarCache
+from ..utils.preset_library import (
+    PIPELINE_ASSETS,
+    get_preset_path,
+    load_pipeline_assets,
+    find_preset_datablock,
+)
+from ..preferences import (
+    get_classifier_keyword_files,
+    get_move_model_collection,
+    use_texture_proxies,
+    get_texture_proxy_scale,
+    use_shared_materials,
+    get_shared_material_slots,
+)
+from ..utils.texture_proxy import get_proxy_image
+from ..utils.material_bindings import get_binding_schema, bind_textures, bind_outline_colors
+from ..utils.shared_materials import allocate_shared_slot, release_shared_slot, assign_character_slot
+from ..utils.material_classifier import get_material_classifier
+from .operator_properties import apply_shader_properties
+from ..utils.mmd_model_index import MMDModelIndex, find_mmd_root_object
+from ..utils.stage_timer import StageTimer
+from ..utils.modal_progress import run_steps, get_active_progress, begin_progress, update_progress, end_progress
+from ..utils.apply_journal import ApplyJournal
+from ..utils.character_state import (
+    MATERIAL_ROLES,
+    ROLE_PROPERTY,
+    get_model_name,
+    default_material_name,
+    tag_character_material,
+    is_character_material,
+    is_shared_material,
+    get_character_slot,
+    load_apply_state,
+    save_apply_state,
+    find_existing_material_map,
+)
 
 class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
     bl_label = '将Shader材质应用到角色'
     bl_idname = 'bobh.apply_shader_to_mmd_model'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # 属性定义与注册表中的延迟注册占位操作共用（apply_all_selected）
+    __annotations__ = apply_shader_properties()
 
     # 定义需要导入的资源列表
-    MAT_LIST = [
-        ('HoYoverse - Genshin Body', 'GI_Body'),
-        ('HoYoverse - Genshin Face', 'GI_Face'),
-        ('HoYoverse - Genshin Hair', 'GI_Hair'),
-        ('HoYoverse - Genshin Outlines', 'GI_Outlines'),
-    ]
-
-    OBJECT_LIST = [
-        ('Light Direction', 'Light Direction Template'),
-    ]
-
-    NODE_GROUP_LIST = [
-        ('Light Vectors', 'Light Vectors')
-    ]
-
-    def try_rename_node_group(self, group_name, import_name):
-        if group_name in bpy.data.node_groups:
-            imported_group = bpy.data.node_groups[group_name]
+    MAT_LIST = list(PIPELINE_ASSETS['apply_shader']['SHADER']['materials'].items())
+
+    OBJECT_LIST = list(PIPELINE_ASSETS['apply_shader']['SHADER']['objects'].items())
+
+    NODE_GROUP_LIST = list(PIPELINE_ASSETS['apply_shader']['SHADER']['node_groups'].items())
+
+    # 当前角色在共享材质中的槽位，每个角色使用单独的材质时为None
+    _shared_slot = None
+    # 当前Shader预设的材质绑定表（贴图后缀、节点路径、描边颜色输入）
+    _binding_schema = None
+    # 本次应用中已经检查过贴图文件头的材质目录
+    _header_checked_directories = frozenset()
+    # 分步执行（modal）时记录应用前的状态，用于取消时回滚
+    _journal = None
+    # 正在处理的角色应用前的状态，这个角色应用失败时回滚
+    _character_journal = None
+
+    # 每个角色依次执行的阶段，用于计算进度
+    CHARACTER_STAGES = (
+        'copy_meterial_for_character',
+        'read_character_outline_info',
+        'apply_texture_to_material',
+        'apply_outline_color_to_material',
+        'replace_mmd_material_with_shader',
+        'add_object_and_children_to_collection',
+        'create_light_dir_and_head_empty',
+    )
+
+    STAGE_LABELS = {
+        'start_texture_preflight': '预读贴图',
+        'import_shader_preset': '导入Shader预设',
+        'copy_meterial_for_character': '创建角色材质',
+        'read_character_outline_info': '读取描边颜色',
+        'apply_texture_to_material': '加载贴图',
+        'apply_outline_color_to_material': '设置描边材质',
+        'replace_mmd_material_with_shader': '替换材质槽',
+        'add_object_and_children_to_collection': '整理角色集合',
+        'create_light_dir_and_head_empty': '创建灯光方向和头部空物体',
+        'evict_unused_duplicates': '清理重复贴图',
+    }
+
+    def try_rename_node_group(self, group_name, import_name, imported_group=None):
+        if imported_group is None:
+            imported_group = bpy.data.node_groups.get(group_name)
+        if imported_group is not None and imported_group.library is not None:
+            # 链接的库数据不能重命名，通过find_preset_datablock按原名称查找
+            return True
+        if imported_group is not None:
             imported_group.name = import_name
             imported_group.use_fake_user = True  # 防止被自动清理
             return True
         else:
             raise BobHException(f'无法导入节点组{group_name}, 检查blend文件路径是否正确')
 
-    def try_rename_material(self, origin_name, import_name):
-        if origin_name in bpy.data.materials:
-            imported_material = bpy.data.materials[origin_name]
+    def try_rename_material(self, origin_name, import_name, imported_material=None):
+        if imported_material is None:
+            imported_material = bpy.data.materials.get(origin_name)
+        if imported_material is not None and imported_material.library is not None:
+            return True
+        if imported_material is not None:
             imported_material.name = import_name
             imported_material.use_fake_user = True  # 防止被自动清理
             return True
         else:
             raise BobHException(f'无法导入材质{origin_name}, 检查blend文件路径是否正确')
     
-    def try_rename_and_hide_objects(self, origin_name, import_name, hide=True):
-        if origin_name in bpy.data.objects:
-            imported_object = bpy.data.objects[origin_name]
+    def try_rename_and_hide_objects(self, origin_name, import_name, hide=True, imported_object=None):
+        if imported_object is None:
+            imported_object = bpy.data.objects.get(origin_name)
+        if imported_object is not None and imported_object.library is not None:
+            # 链接的模板物体只用于复制，不需要放入场景
+            return True
+        if imported_object is not None:
             imported_object.name = import_name
             imported_object.hide_viewport = hide
             imported_object.hide_render = hide
@@ -56,9 +137,7 @@ class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
             raise BobHException(f'无法导入物体{origin_name}, 检查blend文件路径是否正确')
 
     def import_shader_preset(self):
-        # 获取插件目录
-        addon_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-        blend_file = os.path.join(addon_dir, "Data", "Genshin Impact v3.4.blend")
+        blend_file = get_preset_path('SHADER')
         
         if not os.path.exists(blend_file):
             raise BobHException('Shader预设文件未找到，请检查插件安装是否完整')
@@ -68,27 +147,18 @@ class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
             if self.guard_shader_exist():
                 return
                 
-            # 导入blend文件中的资源
-            with bpy.data.libraries.load(blend_file, link=False) as (data_from, data_to):
-                # 准备要导入的资源名称列表
-                desire_mat_name = [item[0] for item in self.MAT_LIST]
-                desire_obj_name = [item[0] for item in self.OBJECT_LIST]
-                desire_ng_name = [item[0] for item in self.NODE_GROUP_LIST]
-                
-                # 筛选出需要导入的资源
-                data_to.materials = [name for name in data_from.materials if name in desire_mat_name]
-                data_to.objects = [name for name in data_from.objects if name in desire_obj_name]
-                data_to.node_groups = [name for name in data_from.node_groups if name in desire_ng_name]
+            # 一次打开blend文件导入全部资源，资源是否存在由缓存的名称清单检查
+            loaded = load_pipeline_assets('apply_shader')['SHADER']
             
             # 重命名导入的资源并设置保护
             for mat_name, import_name in self.MAT_LIST:
-                self.try_rename_material(mat_name, import_name)
+                self.try_rename_material(mat_name, import_name, loaded['materials'][mat_name])
                 
             for obj_name, import_name in self.OBJECT_LIST:
-                self.try_rename_and_hide_objects(obj_name, import_name)
+                self.try_rename_and_hide_objects(obj_name, import_name, imported_object=loaded['objects'][obj_name])
                 
             for ng_name, import_name in self.NODE_GROUP_LIST:
-                self.try_rename_node_group(ng_name, import_name)
+                self.try_rename_node_group(ng_name, import_name, loaded['node_groups'][ng_name])
             
             # 双重检查确保资源已正确导入
             if not self.guard_shader_exist():
@@ -97,87 +167,58 @@ class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
         except Exception as e:
             raise BobHException(f'导入Shader预设时发生错误: {str(e)}')
 
-    def find_mmd_root_object(self, obj: bpy.types.Object):
-        while obj is not None and obj.mmd_type != 'ROOT':
-            obj = obj.parent
-        return obj
-
     def guard_shader_exist(self):
         # 检查所有必需的材质
         required_materials = ['GI_Body', 'GI_Face', 'GI_Hair', 'GI_Outlines']
         for mat_name in required_materials:
-            mat = bpy.data.materials.get(mat_name)
+            mat = find_preset_datablock('materials', mat_name)
             if not mat:
                 return False
-            # 确保材质不会被自动清理
-            mat.use_fake_user = True
+            # 确保材质不会被自动清理（链接的库数据无法也无需设置）
+            if mat.library is None:
+                mat.use_fake_user = True
         
         # 检查必需的节点组
         required_node_groups = ['Light Vectors']
         for ng_name in required_node_groups:
-            ng = bpy.data.node_groups.get(ng_name)
+            ng = find_preset_datablock('node_groups', ng_name)
             if not ng:
                 return False
             # 确保节点组不会被自动清理
-            ng.use_fake_user = True
+            if ng.library is None:
+                ng.use_fake_user = True
         
         # 检查必需的对象
         required_objects = ['Light Direction Template']
         for obj_name in required_objects:
-            if obj_name not in bpy.data.objects:
+            if find_preset_datablock('objects', obj_name) is None:
                 return False
         
         return True
 
     def copy_meterial_for_character(self, model_name):
-        meterial_name_map = {
-            'Body_Mat_Name': f'GI_{model_name}_Body',
-            'Hair_Mat_Name': f'GI_{model_name}_Hair',
-            'Face_Mat_Name': f'GI_{model_name}_Face',
-            'Face_Outline_Mat_Name': f'GI_{model_name}_Face_Outline',
-            'Hair_Outline_Mat_Name': f'GI_{model_name}_Hair_Outline',
-            'Body_Outline_Mat_Name': f'GI_{model_name}_Body_Outline',
-        }
-        
-        # 如果Shader预设不存在，则自动导入
-        if not self.guard_shader_exist():
-            self.import_shader_preset()
-        
-        # Body mat
-        ref_material = bpy.data.materials['GI_Body']
-        char_material = ref_material.copy()         
-        char_material.name = meterial_name_map['Body_Mat_Name']
-        char_material.use_fake_user = False  # 角色材质不需要fake user
-
-        # Hair mat
-        ref_material = bpy.data.materials['GI_Hair']
-        char_material = ref_material.copy()         
-        char_material.name = meterial_name_map['Hair_Mat_Name']
-        char_material.use_fake_user = False
-
-        # Face mat
-        ref_material = bpy.data.materials['GI_Face']
-        char_material = ref_material.copy()         
-        char_material.name = meterial_name_map['Face_Mat_Name']
-        char_material.use_fake_user = False
-
-        # Outline mat
-        ref_material = bpy.data.materials['GI_Outlines']
-        char_material = ref_material.copy()         
-        char_material.name = meterial_name_map['Face_Outline_Mat_Name']
-        char_material.use_fake_user = False
-        char_material = ref_material.copy()         
-        char_material.name = meterial_name_map['Hair_Outline_Mat_Name']
-        char_material.use_fake_user = False
-        char_material = ref_material.copy()         
-        char_material.name = meterial_name_map['Body_Outline_Mat_Name']
-        char_material.use_fake_user = False
-
+        meterial_name_map = {}
+        
+        # Shader预设由execute统一检查和导入，这里不再重复检查
+        for role, (ref_material_name, _) in MATERIAL_ROLES.items():
+            ref_material = find_preset_datablock('materials', ref_material_name)
+            char_material = ref_material.copy()
+            char_material.name = default_material_name(model_name, role)
+            char_material.use_fake_user = False  # 角色材质不需要fake user
+            # 标记材质所属角色，重新应用时据此识别已有的设置
+            tag_character_material(char_material, model_name, role)
+            # 同名材质已存在时Blender会自动加后缀，记录实际名称
+            meterial_name_map[role] = char_material.name
+
+        # 材质中的节点组仍然共用模板（链接模式下保持链接），写入角色贴图时再按需复制
         return meterial_name_map
     
     def read_character_outline_info(self, mat_directory):
-        directory = os.path.join(mat_directory, 'Materials')
+        index = CharacterAssetIndex.get(mat_directory)
+        sidecar_cache = OutlineSidecarCache.get(index.materials_directory)
         outline_info = {}
+        # 记录每组描边颜色来自哪个文件
+        outline_sources = {}
         
         # 必需的文件类型
         required_files = {
@@ -193,69 +234,110 @@ class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
 
         # 处理必需文件
         for outline_type, file_suffix in required_files.items():
-            file_path = None
-            for file in os.listdir(directory):
-                if file.endswith(file_suffix):
-                    file_path = os.path.join(directory, file)
-                    break
+            file_path = index.outline_path(file_suffix)
             
             if not file_path:
                 raise BobHException(f'无法找到必需的描边文件: {file_suffix}')
             
             try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    json_obj = json.load(file)
-                outline_info[outline_type] = {
-                    'Color1': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor'],
-                    'Color2': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor2'],
-                    'Color3': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor3'],
-                    'Color4': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor4'],
-                    'Color5': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor5'],
-                }
+                outline_info[outline_type] = sidecar_cache.read_outline_colors(file_path)
+                outline_sources[outline_type] = os.path.basename(file_path)
             except Exception as e:
                 raise BobHException(f'读取描边文件失败: {file_path} - {str(e)}')
 
         # 处理可选文件（现在检查多个可能的文件名）
         for outline_type, file_suffixes in optional_files.items():
-            file_path = None
-            found_file = None
-            
             # 检查所有可能的文件名
-            for suffix in file_suffixes:
-                for file in os.listdir(directory):
-                    if file.endswith(suffix):
-                        file_path = os.path.join(directory, file)
-                        found_file = file
-                        break
-                if file_path:
-                    break
+            _, file_path = index.first_outline(file_suffixes)
+            found_file = os.path.basename(file_path) if file_path else None
             
             if file_path:
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        json_obj = json.load(file)
-                    outline_info[outline_type] = {
-                        'Color1': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor'],
-                        'Color2': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor2'],
-                        'Color3': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor3'],
-                        'Color4': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor4'],
-                        'Color5': json_obj['m_SavedProperties']['m_Colors']['_OutlineColor5'],
-                    }
-                    self.report({'INFO'}, f'使用描边文件: {found_file}')
+                    outline_info[outline_type] = sidecar_cache.read_outline_colors(file_path)
+                    outline_sources[outline_type] = found_file
                 except Exception as e:
                     self.report({'INFO'}, f'读取可选描边文件失败: {found_file} - {str(e)}，将使用身体描边设置')
                     outline_info[outline_type] = outline_info['BodyOutline'].copy()
+                    outline_sources[outline_type] = f'{outline_sources["BodyOutline"]} (身体描边)'
             else:
                 self.report({'INFO'}, f'未找到可选描边文件(任何其一即可): {", ".join(file_suffixes)}，将使用身体描边设置')
                 outline_info[outline_type] = outline_info['BodyOutline'].copy()
-        
+                outline_sources[outline_type] = f'{outline_sources["BodyOutline"]} (身体描边)'
+
+        sidecar_cache.save()
+        self._outline_sources = outline_sources
+        self.report({'INFO'}, '描边颜色来源: ' + ', '.join(
+            f'{outline_type} <- {source}' for outline_type, source in outline_sources.items()
+        ))
         return outline_info
 
     def find_texture_file_path(self, end_with, mat_directory):
-        for f in os.listdir(mat_directory):
-            if f.endswith(end_with):
-                return os.path.join(mat_directory, f)
-        return ''
+        return CharacterAssetIndex.get(mat_directory).texture_path(end_with)
+
+    def binding_schema(self):
+        if self._binding_schema is None:
+            self._binding_schema = get_binding_schema()
+        return self._binding_schema
+
+    def texture_suffixes(self):
+        return tuple(self.binding_schema()['textures'])
+
+    def check_texture_headers(self, mat_directories):
+        """只读取PNG文件头检查所有角色的贴图，有缺失或不符合用途的贴图时在创建数据块之前中止"""
+        problems = []
+        for mat_directory in mat_directories:
+            for problem in check_texture_headers(CharacterAssetIndex.get(mat_directory), self.texture_suffixes()):
+                problems.append(f'{mat_directory}: {problem}')
+        if problems:
+            raise BobHException(f'贴图文件不符合要求: {"; ".join(problems)}')
+        self._header_checked_directories = self._header_checked_directories | set(mat_directories)
+
+    def start_texture_preflight(self, mat_directories):
+        """在后台线程中预读并校验所有角色的贴图"""
+        paths = []
+        for mat_directory in mat_directories:
+            index = CharacterAssetIndex.get(mat_directory)
+            paths.extend(index.texture_path(suffix) for suffix in self.texture_suffixes())
+        self._texture_preflight = TexturePreflight(paths)
+
+    def load_verified_image(self, filepath):
+        preflight = getattr(self, '_texture_preflight', None)
+        content_hash = preflight.result(filepath) if preflight is not None else None
+        image = load_image(filepath, content_hash)
+        if not use_texture_proxies():
+            return image
+        # 视口中绑定缩小的代理贴图，渲染时由texture_proxy的渲染回调换回全分辨率贴图
+        try:
+            return get_proxy_image(image, get_texture_proxy_scale())
+        except OSError as e:
+            raise BobHException(f'无法生成代理贴图: {filepath} - {e}')
+
+    def texture_signature(self, mat_directory):
+        """贴图文件的路径、修改时间和大小，用于判断重新应用时贴图是否变化"""
+        index = CharacterAssetIndex.get(mat_directory)
+        signature = {}
+        for suffix in self.texture_suffixes():
+            path = index.texture_path(suffix)
+            try:
+                stat = os.stat(path)
+                signature[suffix] = [path, stat.st_mtime_ns, stat.st_size]
+            except OSError:
+                signature[suffix] = [path, None, None]
+        return signature
+
+    def reusable_material_map(self, mmd_root_obj, model_name):
+        """返回可以沿用的上一次应用的材质名称映射，需要重新创建或分配材质时返回None"""
+        existing_map = find_existing_material_map(mmd_root_obj, model_name)
+        if existing_map is not None and is_shared_material(bpy.data.materials[existing_map['Body_Mat_Name']]) != use_shared_materials():
+            # 切换了共享材质模式，重新创建或分配材质
+            return None
+        return existing_map
+
+    def needs_texture_update(self, mmd_root_obj, mat_directory):
+        """本次应用是否会重新绑定角色的贴图（与apply_to_character的判断一致），需要绑定的贴图都要预先校验"""
+        if self.reusable_material_map(mmd_root_obj, get_model_name(mmd_root_obj)) is None:
+            return True
+        return load_apply_state(mmd_root_obj).get('textures') != self.texture_signature(mat_directory)
 
     def find_material_node(self, node_name, nodes):
         for node in nodes:
@@ -263,272 +345,169 @@ class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
                 return node
         return None
 
+    def character_materials(self):
+        """材质用途键 -> 当前角色的材质"""
+        return {role: bpy.data.materials[name] for role, name in self._meterial_name_map.items()}
+
     def apply_texture_to_material(self, mat_directory):
-        # Face material
-        face_mat_name = self._meterial_name_map['Face_Mat_Name']
-        face_mat = bpy.data.materials[face_mat_name]
-        assert face_mat.use_nodes, '材质节点一定使用了节点'
-        
-        # Find and setup face diffuse node
-        diffuse_texture_node = self.find_material_node('Face_Diffuse', face_mat.node_tree.nodes)
-        assert diffuse_texture_node is not None, '找不到Diffuse节点'
-        
-        face_diffuse_file = self.find_texture_file_path('_Face_Diffuse.png', mat_directory)
-        assert face_diffuse_file != '', '找不到脸部Diffuse贴图文件'
-        
-        image_data = bpy.data.images.load(face_diffuse_file)
-        self._face_diffuse_image_data = image_data
-        diffuse_texture_node.image = image_data
-        diffuse_texture_node.image.colorspace_settings.name = 'sRGB'
-        diffuse_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-
-        # Hair material
-        hair_mat_name = self._meterial_name_map['Hair_Mat_Name']
-        hair_mat = bpy.data.materials[hair_mat_name]
-        assert hair_mat.use_nodes, '材质节点一定使用了节点'
-        
-        hair_diffuse_file = self.find_texture_file_path('_Hair_Diffuse.png', mat_directory)
-        hair_lightmap_file = self.find_texture_file_path('_Hair_Lightmap.png', mat_directory)
-        hair_shadowramp_file = self.find_texture_file_path('_Hair_Shadow_Ramp.png', mat_directory)
-        
-        assert hair_diffuse_file != '', '找不到头发Diffuse贴图文件'
-        assert hair_lightmap_file != '', '找不到头发Lightmap贴图文件'
-        assert hair_shadowramp_file != '', '找不到头发Shadowramp贴图文件'
-        
-        diffuse_texture_node = self.find_material_node('Body_Diffuse_UV0', hair_mat.node_tree.nodes)
-        lightmap_texture_node = self.find_material_node('Body_Lightmap_UV0', hair_mat.node_tree.nodes)
-        shadowramp_group_node = self.find_material_node('Shadow Ramp', hair_mat.node_tree.nodes)
-        
-        assert shadowramp_group_node is not None, '找不到Shadowramp组'
-        shadowramp_texture_node = self.find_material_node('Hair_Shadow_Ramp', shadowramp_group_node.node_tree.nodes)
-        
-        assert diffuse_texture_node is not None, '找不到DiffuseUV0节点'
-        assert lightmap_texture_node is not None, '找不到LightmapUV0节点'
-        assert shadowramp_texture_node is not None, '找不到Shadowramp节点'
-        
-        # Load hair diffuse
-        image_data = bpy.data.images.load(hair_diffuse_file)
-        self._hair_diffuse_image_data = image_data
-        diffuse_texture_node.image = image_data
-        diffuse_texture_node.image.colorspace_settings.name = 'sRGB'
-        diffuse_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        # Load hair lightmap
-        image_data = bpy.data.images.load(hair_lightmap_file)
-        self._hair_lightmap_image_data = image_data
-        lightmap_texture_node.image = image_data
-        lightmap_texture_node.image.colorspace_settings.name = 'Non-Color'
-        lightmap_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        # Load hair shadowramp
-        image_data = bpy.data.images.load(hair_shadowramp_file)
-        shadowramp_texture_node.image = image_data
-        shadowramp_texture_node.image.colorspace_settings.name = 'sRGB'
-        shadowramp_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-
-        # Body material
-        body_mat_name = self._meterial_name_map['Body_Mat_Name']
-        body_mat = bpy.data.materials[body_mat_name]
-        assert body_mat.use_nodes, '材质节点一定使用了节点'
-        
-        body_diffuse_file = self.find_texture_file_path('_Body_Diffuse.png', mat_directory)
-        body_lightmap_file = self.find_texture_file_path('_Body_Lightmap.png', mat_directory)
-        body_shadowramp_file = self.find_texture_file_path('_Body_Shadow_Ramp.png', mat_directory)
-        
-        assert body_diffuse_file != '', '找不到身体Diffuse贴图文件'
-        assert body_lightmap_file != '', '找不到身体Lightmap贴图文件'
-        assert body_shadowramp_file != '', '找不到身体Shadowramp贴图文件'
-        
-        diffuse_texture_node = self.find_material_node('Body_Diffuse_UV0', body_mat.node_tree.nodes)
-        lightmap_texture_node = self.find_material_node('Body_Lightmap_UV0', body_mat.node_tree.nodes)
-        shadowramp_group_node = self.find_material_node('Shadow Ramp', body_mat.node_tree.nodes)
-        
-        assert shadowramp_group_node is not None, '找不到Shadowramp组'
-        shadowramp_texture_node = self.find_material_node('Body_Shadow_Ramp', shadowramp_group_node.node_tree.nodes)
-        
-        assert diffuse_texture_node is not None, '找不到DiffuseUV0节点'
-        assert lightmap_texture_node is not None, '找不到LightmapUV0节点'
-        assert shadowramp_texture_node is not None, '找不到Shadowramp节点'
-        
-        # Load body diffuse
-        image_data = bpy.data.images.load(body_diffuse_file)
-        self._body_diffuse_image_data = image_data
-        diffuse_texture_node.image = image_data
-        diffuse_texture_node.image.colorspace_settings.name = 'sRGB'
-        diffuse_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        # Load body lightmap
-        image_data = bpy.data.images.load(body_lightmap_file)
-        self._body_lightmap_image_data = image_data
-        lightmap_texture_node.image = image_data
-        lightmap_texture_node.image.colorspace_settings.name = 'Non-Color'
-        lightmap_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        # Load body shadowramp
-        image_data = bpy.data.images.load(body_shadowramp_file)
-        shadowramp_texture_node.image = image_data
-        shadowramp_texture_node.image.colorspace_settings.name = 'sRGB'
-        shadowramp_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
+        """按绑定表加载角色贴图并写入材质，返回写入的图片节点数量"""
+        if mat_directory not in self._header_checked_directories:
+            # 正常情况下已在start_texture_preflight中检查，这里保证绑定的贴图都经过检查
+            self.check_texture_headers([mat_directory])
+        index = CharacterAssetIndex.get(mat_directory)
+        images = {}
+        for suffix in self.texture_suffixes():
+            texture_file = index.texture_path(suffix)
+            if not texture_file:
+                raise BobHException(f'找不到贴图文件: {suffix}')
+            images[suffix] = self.load_verified_image(texture_file)
+        return bind_textures(self.binding_schema(), self.character_materials(), images, self._shared_slot)
 
     def apply_outline_color_to_material(self, mat_directory):
-        # Face outlines
-        face_outline_mat_name = self._meterial_name_map['Face_Outline_Mat_Name']
-        face_outline_mat = bpy.data.materials[face_outline_mat_name]
-        assert face_outline_mat.use_nodes
-        
-        diffuse_texture_node = self.find_material_node('Outline_Diffuse', face_outline_mat.node_tree.nodes)
-        outline_group_node = self.find_material_node('Outlines', face_outline_mat.node_tree.nodes)
-        
-        assert diffuse_texture_node is not None, '找不到OutlineDiffuse节点'
-        assert outline_group_node is not None, '找不到Outlines节点'
-        
-        diffuse_texture_node.image = self._face_diffuse_image_data
-        diffuse_texture_node.image.colorspace_settings.name = 'sRGB'
-        diffuse_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        for i in range(1, 6):
-            color_input = outline_group_node.inputs[f'Outline Color {i}']
-            outline_color_obj = self._outline_info['FaceOutline'][f'Color{i}']
-            color_input.default_value = (
-                outline_color_obj['r'],
-                outline_color_obj['g'],
-                outline_color_obj['b'],
-                outline_color_obj['a']
-            )
-
-        # Hair outlines
-        hair_outline_mat_name = self._meterial_name_map['Hair_Outline_Mat_Name']
-        hair_outline_mat = bpy.data.materials[hair_outline_mat_name]
-        assert hair_outline_mat.use_nodes
-        
-        diffuse_texture_node = self.find_material_node('Outline_Diffuse', hair_outline_mat.node_tree.nodes)
-        lightmap_texture_node = self.find_material_node('Outline_Lightmap', hair_outline_mat.node_tree.nodes)
-        outline_group_node = self.find_material_node('Outlines', hair_outline_mat.node_tree.nodes)
-        
-        assert diffuse_texture_node is not None, '找不到OutlineDiffuse节点'
-        assert lightmap_texture_node is not None, '找不到OutlineLightmap节点'
-        assert outline_group_node is not None, '找不到Outlines节点'
-        
-        diffuse_texture_node.image = self._hair_diffuse_image_data
-        diffuse_texture_node.image.colorspace_settings.name = 'sRGB'
-        diffuse_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        lightmap_texture_node.image = self._hair_lightmap_image_data
-        lightmap_texture_node.image.colorspace_settings.name = 'Non-Color'
-        lightmap_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        for i in range(1, 6):
-            color_input = outline_group_node.inputs[f'Outline Color {i}']
-            outline_color_obj = self._outline_info['HairOutline'][f'Color{i}']
-            color_input.default_value = (
-                outline_color_obj['r'],
-                outline_color_obj['g'],
-                outline_color_obj['b'],
-                outline_color_obj['a']
-            )
-
-        # Body outlines
-        body_outline_mat_name = self._meterial_name_map['Body_Outline_Mat_Name']
-        body_outline_mat = bpy.data.materials[body_outline_mat_name]
-        assert body_outline_mat.use_nodes
-        
-        diffuse_texture_node = self.find_material_node('Outline_Diffuse', body_outline_mat.node_tree.nodes)
-        lightmap_texture_node = self.find_material_node('Outline_Lightmap', body_outline_mat.node_tree.nodes)
-        outline_group_node = self.find_material_node('Outlines', body_outline_mat.node_tree.nodes)
-        
-        assert diffuse_texture_node is not None, '找不到OutlineDiffuse节点'
-        assert lightmap_texture_node is not None, '找不到OutlineLightmap节点'
-        assert outline_group_node is not None, '找不到Outlines节点'
-        
-        diffuse_texture_node.image = self._body_diffuse_image_data
-        diffuse_texture_node.image.colorspace_settings.name = 'sRGB'
-        diffuse_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
-        
-        lightmap_texture_node.image = self._body_lightmap_image_data
-        lightmap_texture_node.image.colorspace_settings.name = 'Non-Color'
-        lightmap_texture_node.image.alpha_mode = 'CHANNEL_PACKED'
+        bind_outline_colors(self.binding_schema(), self.character_materials(), self._outline_info, self._shared_slot)
+
+    def classify_mmd_material(self, mat, classifier):
+        """返回材质应替换成的角色材质用途键，排除的材质返回None，无法识别时返回空字符串"""
+        # 检查是否是被排除的材质
+        if classifier.is_excluded(mat.name):
+            return None
         
-        for i in range(1, 6):
-            color_input = outline_group_node.inputs[f'Outline Color {i}']
-            outline_color_obj = self._outline_info['BodyOutline'][f'Color{i}']
-            color_input.default_value = (
-                outline_color_obj['r'],
-                outline_color_obj['g'],
-                outline_color_obj['b'],
-                outline_color_obj['a']
-            )
-
-    def replace_slot_material(self, mesh_obj, old_material_name, new_material_name):
-        new_material = bpy.data.materials.get(new_material_name)
-        if new_material is None:
-            raise BobHException(f"Material '{new_material_name}' not found.")
-        for slot in mesh_obj.material_slots:
-            if slot.material and slot.material.name == old_material_name:
-                slot.material = new_material
-                print(f"Replaced material '{old_material_name}' with '{new_material_name}'.")
-
-    def replace_mmd_material_with_shader(self, mesh_obj: bpy.types.Object):
-        face_detect_keywords = ['面', '颜', 'face', 'Face']
-        hair_detect_keywords = ['发', '髪', '髮', 'hair', 'Hair']
-        # 更精确的身体材质关键词
-        body_detect_keywords = ['体', '肌', 'skin', 'Skin']
-        dress_detect_keywords = ['服', '衣', 'dress', 'Dress', '裙', '裤']
-        eye_detect_keywords = ['目', 'eye', 'Eye']
-        # 排除的材质名称关键词
-        exclude_keywords = ['面具', 'mask', 'Mask', '舌', 'teeth', 'Teeth', '歯']
-
-        materials = [slot.material for slot in mesh_obj.material_slots if slot.material]
-        for mat in materials:
-            # 检查是否是被排除的材质
-            if any(ex_kw in mat.name for ex_kw in exclude_keywords):
-                continue
-            
-            mmd_base_tex_node = self.find_material_node('mmd_base_tex', mat.node_tree.nodes)
-            if mmd_base_tex_node is None or mmd_base_tex_node.image is None:
-                self.report({'WARNING'}, f'无法识别mesh的材质: {mat.name}，请手动绑定这个材质')
-                continue
-    
-            tex_image_name = mmd_base_tex_node.image.name.lower()  # 转换为小写便于比较
-    
-            # 更精确的匹配逻辑
-            use_face_shader = any(kw.lower() in tex_image_name for kw in face_detect_keywords)
-            use_hair_shader = any(kw.lower() in tex_image_name for kw in hair_detect_keywords)
-            use_body_shader = any(kw.lower() in tex_image_name for kw in body_detect_keywords)
-            use_dress_shader = any(kw.lower() in tex_image_name for kw in dress_detect_keywords)
-            use_eye_shader = any(kw.lower() in tex_image_name for kw in eye_detect_keywords)
-    
-            # 特殊处理"spa_h.png"这种情况
-            if 'spa_h' in tex_image_name:
-                use_hair_shader = True
-    
-            if use_face_shader:
-                self.replace_slot_material(mesh_obj, mat.name, self._meterial_name_map['Face_Mat_Name'])
-            elif use_hair_shader:
-                self.replace_slot_material(mesh_obj, mat.name, self._meterial_name_map['Hair_Mat_Name'])
-            elif use_body_shader:
-                self.replace_slot_material(mesh_obj, mat.name, self._meterial_name_map['Body_Mat_Name'])
-            elif use_dress_shader or use_eye_shader:
-                # 服装和眼睛也使用身体材质，但可以单独处理
-                self.replace_slot_material(mesh_obj, mat.name, self._meterial_name_map['Body_Mat_Name'])
-            else:
-                self.report({'WARNING'}, f'无法识别mesh的材质: {mat.name} (图片名: {tex_image_name})，请手动绑定这个材质')
+        mmd_base_tex_node = self.find_material_node('mmd_base_tex', mat.node_tree.nodes) if mat.node_tree else None
+        if mmd_base_tex_node is None or mmd_base_tex_node.image is None:
+            return ''
+
+        return classifier.classify_role(mmd_base_tex_node.image.name) or ''
+
+    def replace_mmd_material_with_shader(self, mmd_root_obj: bpy.types.Object):
+        """一次遍历模型下所有mesh：先为每个材质确定替换目标，再批量改写材质槽
+
+        返回替换结果的统计信息
+        """
+        mesh_objects = MMDModelIndex.get(mmd_root_obj).meshes
+        model_name = get_model_name(mmd_root_obj)
+        target_materials = {
+            role: bpy.data.materials.get(mat_name) for role, mat_name in self._meterial_name_map.items()
+        }
+        for role, material in target_materials.items():
+            if material is None:
+                raise BobHException(f"Material '{self._meterial_name_map[role]}' not found.")
+        # 每次替换只查找一次关键词表（偏好设置和文件修改时间），所有材质共用同一个分类器
+        classifier = get_material_classifier(get_classifier_keyword_files())
+
+        # 旧材质 -> 新材质，每个材质只识别一次
+        material_mapping = {}
+        summary = {
+            'meshes': len(mesh_objects),
+            'materials': 0,
+            'replaced_slots': 0,
+            'excluded': [],
+            'unrecognized': [],
+        }
+        for mesh_obj in mesh_objects:
+            for slot in mesh_obj.material_slots:
+                mat = slot.material
+                if mat is None or mat in material_mapping:
+                    continue
+                # 已经是本插件创建的角色材质（重新应用时），无需再识别；
+                # 切换了共享材质模式时，把该角色原来的材质按用途换成新的材质
+                if is_character_material(mat):
+                    target = target_materials.get(mat.get(ROLE_PROPERTY))
+                    if target == mat or not is_character_material(mat, model_name):
+                        target = None
+                    material_mapping[mat] = target
+                    continue
+                summary['materials'] += 1
+                role = self.classify_mmd_material(mat, classifier)
+                if role is None:
+                    summary['excluded'].append(mat.name)
+                    material_mapping[mat] = None
+                elif role == '':
+                    summary['unrecognized'].append(mat.name)
+                    material_mapping[mat] = None
+                else:
+                    material_mapping[mat] = target_materials[role]
+
+        for mesh_obj in mesh_objects:
+            for slot in mesh_obj.material_slots:
+                new_material = material_mapping.get(slot.material)
+                if new_material is not None:
+                    slot.material = new_material
+                    summary['replaced_slots'] += 1
+
+        return summary
+
+    def try_move_source_collection(self, objects, collection_name):
+        """模型独占一个集合时，直接重命名并移动该集合，而不是逐个对象重新链接
+
+        成功时返回True
+        """
+        if bpy.data.collections.get(collection_name) is not None:
+            return False
+        source_collections = objects[0].users_collection
+        if len(source_collections) != 1:
+            return False
+        source_collection = source_collections[0]
+        scene_collection = bpy.context.scene.collection
+        if source_collection == scene_collection or source_collection.library is not None:
+            return False
+        if source_collection.children or len(source_collection.objects) != len(objects):
+            return False
+        if any(tuple(obj.users_collection) != (source_collection,) for obj in objects):
+            return False
+
+        source_name = source_collection.name
+        source_collection.name = collection_name
+        self.record_rename('collections', source_name, source_collection.name)
+        for parent_collection in bpy.data.collections:
+            if source_collection.name in parent_collection.children:
+                parent_collection.children.unlink(source_collection)
+        # 集合也可能直接链接在其他场景的根集合下
+        for scene in bpy.data.scenes:
+            if scene.collection != scene_collection and source_collection.name in scene.collection.children:
+                scene.collection.children.unlink(source_collection)
+        if source_collection.name not in scene_collection.children:
+            scene_collection.children.link(source_collection)
+        return True
+
+    def record_rename(self, category, old_name, new_name):
+        # 回滚记录按名称查找数据块，重命名已有数据块时需要通知
+        for journal in (self._journal, self._character_journal):
+            if journal is not None:
+                journal.record_rename(category, old_name, new_name)
 
     def add_object_and_children_to_collection(self, obj, collection_name):
+        # 先一次性收集对象及其所有子对象（迭代遍历，避免层级过深时超过递归深度）
+        objects = []
+        stack = [obj]
+        while stack:
+            current = stack.pop()
+            objects.append(current)
+            stack.extend(current.children)
+
+        if get_move_model_collection() and self.try_move_source_collection(objects, collection_name):
+            return
+
         new_collection = bpy.data.collections.get(collection_name)
         if not new_collection:
             new_collection = bpy.data.collections.new(collection_name)
             bpy.context.scene.collection.children.link(new_collection)
-        
-        def add_to_collection_recursive(obj, collection):
-            if obj.name not in collection.objects:
-                collection.objects.link(obj)
-            for original_collection in obj.users_collection:
-                if original_collection != collection:
-                    original_collection.objects.unlink(obj)
-            for child in obj.children:
-                add_to_collection_recursive(child, collection)
-        
-        add_to_collection_recursive(obj, new_collection)
+
+        # 计算需要链接和按集合分组的需要取消链接的对象，再批量执行
+        existing_objects = set(new_collection.objects)
+        objects_to_link = [current for current in objects if current not in existing_objects]
+        objects_to_unlink = {}
+        for current in objects:
+            for original_collection in current.users_collection:
+                if original_collection != new_collection:
+                    objects_to_unlink.setdefault(original_collection, []).append(current)
+
+        link = new_collection.objects.link
+        for current in objects_to_link:
+            link(current)
+        for original_collection, collection_objects in objects_to_unlink.items():
+            unlink = original_collection.objects.unlink
+            for current in collection_objects:
+                unlink(current)
 
     def location_add(self, x, y):
         return tuple(a + b for a, b in zip(x, y))
@@ -542,94 +521,369 @@ class BOBH_OT_apply_shader_to_mmd_model(bpy.types.Operator):
     def get_head_up_position(self, mesh_location):
         return self.location_add((0, -0.0113, -0.826729), mesh_location)
 
-    def create_light_dir_and_head_empty(self, model_name, collection_name, mesh_location):
+    def create_light_dir_and_head_empty(self, model_index: MMDModelIndex, collection_name, mesh_location):
+        model_name = model_index.model_name
+        # 重新应用时保留已有的空物体（可能已被手动调整或绑定约束），只创建缺少的
         # Light Direction
-        light_template_object = bpy.data.objects.get('Light Direction Template')
-        if light_template_object is None:
-            raise BobHException('请先导入Shader预设')
-        
-        model_light_object = light_template_object.copy()
-        model_light_object.location = mesh_location
-        model_light_object.name = f'{model_name}Light Direction'
-        model_light_object.hide_render = False
-        model_light_object.hide_viewport = False
-        
-        collection = bpy.data.collections.get(collection_name)
-        collection.objects.link(model_light_object)
+        if model_index.get_empty('light_direction') is None:
+            light_template_object = find_preset_datablock('objects', 'Light Direction Template')
+            if light_template_object is None:
+                raise BobHException('请先导入Shader预设')
+            
+            model_light_object = light_template_object.copy()
+            model_light_object.location = mesh_location
+            model_light_object.name = f'{model_name}Light Direction'
+            model_light_object.hide_render = False
+            model_light_object.hide_viewport = False
+            
+            collection = bpy.data.collections.get(collection_name)
+            collection.objects.link(model_light_object)
 
         # Head binding
-        head_origin_object = bpy.data.objects.new(f'{model_name}Head Origin', None)
-        head_origin_object.empty_display_type = 'PLAIN_AXES'
-        head_origin_object.empty_display_size = 0.2
-        head_origin_object.delta_scale = (2.14208, 2.14208, 2.14208)
-        head_origin_object.location = self.get_head_origin_position(mesh_location)
-        self.add_object_and_children_to_collection(head_origin_object, collection_name)
-
-        head_forward_object = bpy.data.objects.new(f'{model_name}Head Forward', None)
-        head_forward_object.empty_display_type = 'CUBE'
-        head_forward_object.empty_display_size = 0.2
-        head_forward_object.delta_location = (0, -3.91348, 0)
-        head_forward_object.delta_scale = (0.657891, 0.657891, 0.657891)
-        head_forward_object.location = self.get_head_forward_position(mesh_location)
-        self.add_object_and_children_to_collection(head_forward_object, collection_name)
-
-        head_up_object = bpy.data.objects.new(f'{model_name}Head Up', None)
-        head_up_object.empty_display_type = 'CUBE'
-        head_up_object.empty_display_size = 0.2
-        head_up_object.delta_location = (0, 0, 2.69204)
-        head_up_object.delta_scale = (0.620684, 0.620684, 0.620684)
-        head_up_object.location = self.get_head_up_position(mesh_location)
-        self.add_object_and_children_to_collection(head_up_object, collection_name)
+        if model_index.get_empty('head_origin') is None:
+            head_origin_object = bpy.data.objects.new(f'{model_name}Head Origin', None)
+            head_origin_object.empty_display_type = 'PLAIN_AXES'
+            head_origin_object.empty_display_size = 0.2
+            head_origin_object.delta_scale = (2.14208, 2.14208, 2.14208)
+            head_origin_object.location = self.get_head_origin_position(mesh_location)
+            self.add_object_and_children_to_collection(head_origin_object, collection_name)
+
+        if model_index.get_empty('head_forward') is None:
+            head_forward_object = bpy.data.objects.new(f'{model_name}Head Forward', None)
+            head_forward_object.empty_display_type = 'CUBE'
+            head_forward_object.empty_display_size = 0.2
+            head_forward_object.delta_location = (0, -3.91348, 0)
+            head_forward_object.delta_scale = (0.657891, 0.657891, 0.657891)
+            head_forward_object.location = self.get_head_forward_position(mesh_location)
+            self.add_object_and_children_to_collection(head_forward_object, collection_name)
+
+        if model_index.get_empty('head_up') is None:
+            head_up_object = bpy.data.objects.new(f'{model_name}Head Up', None)
+            head_up_object.empty_display_type = 'CUBE'
+            head_up_object.empty_display_size = 0.2
+            head_up_object.delta_location = (0, 0, 2.69204)
+            head_up_object.delta_scale = (0.620684, 0.620684, 0.620684)
+            head_up_object.location = self.get_head_up_position(mesh_location)
+            self.add_object_and_children_to_collection(head_up_object, collection_name)
+
+    def collect_targets(self, context):
+        """收集需要处理的 (mmd根对象, mesh对象) 列表，同一个模型只处理一次"""
+        if not self.apply_all_selected:
+            select_obj = context.active_object
+            if select_obj is None or select_obj.type != 'MESH':
+                raise BobHException('请选中一个MMD模型角色的mesh')
+            mmd_root_obj = find_mmd_root_object(select_obj)
+            if not mmd_root_obj:
+                raise BobHException('请选中一个MMD模型角色')
+            return [(mmd_root_obj, select_obj)]
+
+        targets = {}
+        for obj in context.selected_objects:
+            mmd_root_obj = find_mmd_root_object(obj)
+            if mmd_root_obj is None:
+                continue
+            if obj.type == 'MESH':
+                # 优先使用用户选中的mesh
+                if targets.get(mmd_root_obj.name, (None, None))[1] is None or obj == context.active_object:
+                    targets[mmd_root_obj.name] = (mmd_root_obj, obj)
+            elif mmd_root_obj.name not in targets:
+                targets[mmd_root_obj.name] = (mmd_root_obj, None)
+
+        result = []
+        for mmd_root_obj, mesh_obj in targets.values():
+            if mesh_obj is None:
+                meshes = MMDModelIndex.get(mmd_root_obj).meshes
+                mesh_obj = meshes[0] if meshes else None
+            if mesh_obj is None:
+                self.report({'WARNING'}, f'模型 {mmd_root_obj.name} 下找不到mesh，已跳过')
+                continue
+            result.append((mmd_root_obj, mesh_obj))
+        if not result:
+            raise BobHException('请至少选中一个MMD模型角色')
+        return result
+
+    def get_material_directory(self, context, mmd_root_obj):
+        """批量模式下优先使用模型根对象上记录的材质目录，否则使用场景的材质目录"""
+        if self.apply_all_selected and mmd_root_obj.material_directory:
+            return mmd_root_obj.material_directory
+        return context.scene.material_directory
+
+    def target_objects(self, root_name, mesh_name):
+        """按名称查找角色的根对象和mesh
+
+        生成器在步骤之间只保存名称，每一步重新查找，分步执行时用户可能在步骤之间删除或重命名了它们
+        """
+        mmd_root_obj = bpy.data.objects.get(root_name)
+        mesh_obj = bpy.data.objects.get(mesh_name)
+        if mmd_root_obj is None or mesh_obj is None:
+            raise BobHException(f'角色 {root_name} 已被删除或重命名')
+        return mmd_root_obj, mesh_obj
+
+    def missing_targets(self, targets):
+        return [
+            root_name for root_name, mesh_name in targets
+            if bpy.data.objects.get(root_name) is None or bpy.data.objects.get(mesh_name) is None
+        ]
+
+    def apply_to_character(self, root_name, mesh_name, mat_directory):
+        """按阶段应用到一个角色，每个阶段开始前yield阶段名称"""
+        mmd_root_obj, mesh_obj = self.target_objects(root_name, mesh_name)
+        mesh_location = mesh_obj.matrix_world.to_translation()
+        model_name = get_model_name(mmd_root_obj)
+        collection_name = f'{model_name}_Collection'
+        stage = partial(self._timer.stage, character=model_name)
+
+        # 已经应用过时只更新变化的部分
+        previous_state = load_apply_state(mmd_root_obj)
+        texture_signature = self.texture_signature(mat_directory)
+        existing_map = self.reusable_material_map(mmd_root_obj, model_name)
+
+        if existing_map is None:
+            yield 'copy_meterial_for_character'
+            with stage('copy_meterial_for_character') as counts:
+                if use_shared_materials():
+                    self._meterial_name_map, self._shared_slot = allocate_shared_slot(
+                        model_name, get_shared_material_slots()
+                    )
+                else:
+                    self._meterial_name_map = self.copy_meterial_for_character(model_name)
+                    self._shared_slot = None
+                counts['materials'] = len(self._meterial_name_map)
+            textures_changed = True
+        else:
+            self._meterial_name_map = existing_map
+            self._shared_slot = get_character_slot(bpy.data.materials[existing_map['Body_Mat_Name']], model_name)
+            textures_changed = previous_state.get('textures') != texture_signature
+
+        yield 'read_character_outline_info'
+        with stage('read_character_outline_info') as counts:
+            self._outline_info = self.read_character_outline_info(mat_directory)
+            counts['outline_files'] = len(self._outline_info)
+        outline_changed = textures_changed or previous_state.get('outline') != self._outline_info
+
+        if textures_changed:
+            yield 'apply_texture_to_material'
+            with stage('apply_texture_to_material') as counts:
+                counts['images'] = self.apply_texture_to_material(mat_directory)
+        if outline_changed:
+            yield 'apply_outline_color_to_material'
+            with stage('apply_outline_color_to_material') as counts:
+                self.apply_outline_color_to_material(mat_directory)
+                counts['materials'] = 3  # 脸、头发、身体的描边材质
+
+        yield 'replace_mmd_material_with_shader'
+        mmd_root_obj, _ = self.target_objects(root_name, mesh_name)
+        with stage('replace_mmd_material_with_shader') as counts:
+            replace_summary = self.replace_mmd_material_with_shader(mmd_root_obj)
+            counts['objects'] = replace_summary['meshes']
+            counts['materials'] = replace_summary['materials']
+            counts['slots'] = replace_summary['replaced_slots']
+        if self._shared_slot is not None:
+            assign_character_slot(MMDModelIndex.get(mmd_root_obj).meshes, self._shared_slot)
+        else:
+            release_shared_slot(model_name)
+        if replace_summary['unrecognized']:
+            self.report({'WARNING'}, f'无法识别mesh的材质: {", ".join(replace_summary["unrecognized"])}，请手动绑定这些材质')
+        self.report({'INFO'}, f'在{replace_summary["meshes"]}个mesh中替换了{replace_summary["replaced_slots"]}个材质槽')
+
+        collection = bpy.data.collections.get(collection_name)
+        if existing_map is None or collection is None or collection not in mmd_root_obj.users_collection:
+            yield 'add_object_and_children_to_collection'
+            mmd_root_obj, _ = self.target_objects(root_name, mesh_name)
+            with stage('add_object_and_children_to_collection'):
+                self.add_object_and_children_to_collection(mmd_root_obj, collection_name)
+        yield 'create_light_dir_and_head_empty'
+        mmd_root_obj, _ = self.target_objects(root_name, mesh_name)
+        with stage('create_light_dir_and_head_empty'):
+            self.create_light_dir_and_head_empty(MMDModelIndex.get(mmd_root_obj), collection_name, mesh_location)
+
+        save_apply_state(mmd_root_obj, {
+            'materials': self._meterial_name_map,
+            'textures': texture_signature,
+            'outline': self._outline_info,
+        })
 
     def execute(self, context):
-        context.scene.view_settings.view_transform = 'Standard'
-        select_obj = context.active_object
-        
-        if select_obj.type != 'MESH':
-            self.report({'ERROR'}, '请选中一个MMD模型角色的mesh')
+        self._timer = StageTimer(self.bl_idname)
+        result = {'CANCELLED'}
+        try:
+            prepared = self.prepare(context)
+            if prepared is not None:
+                result = run_steps(self.apply(*prepared))
+            return result
+        finally:
+            self._timer.finish(next(iter(result)))
+
+    def invoke(self, context, event):
+        """在界面中分步执行：每个计时器事件执行一个阶段，期间界面保持响应，按Esc取消并回滚"""
+        if bpy.app.background or context.window is None:
+            return self.execute(context)
+        if get_active_progress() is not None:
+            self.report({'ERROR'}, '已有正在进行的应用任务，请等待完成或按Esc取消')
             return {'CANCELLED'}
-            
-        mat_directory = context.scene.material_directory
-        mmd_root_obj = self.find_mmd_root_object(select_obj)
-        
-        if not mmd_root_obj:
-            self.report({'ERROR'}, '请选中一个MMD模型角色')
+
+        self._timer = StageTimer(self.bl_idname)
+        # 在prepare修改色彩管理设置之前记录场景状态
+        self._journal = ApplyJournal(context.scene)
+        prepared = self.prepare(context)
+        if prepared is None:
+            self._journal = None
+            self._timer.finish('CANCELLED')
             return {'CANCELLED'}
-        
-        if not mat_directory or mat_directory == '':
-            self.report({'ERROR'}, '请指定要导入角色的材质目录')
+        self._targets = prepared[0]
+        self._journal.record_targets(self._targets)
+        self._steps = self._journal.track_steps(self.apply(*prepared))
+        self._progress = (0, 1, '')
+        begin_progress(context, self.bl_label)
+        self._event_timer = context.window_manager.event_timer_add(0.01, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish_modal(context, None)
+            self.report({'WARNING'}, '已取消应用材质，场景已恢复到应用前的状态')
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            # 步骤之间用户可以继续操作，生成器每一步按名称重新查找物体和材质
+            return {'PASS_THROUGH'}
+
+        missing = self.missing_targets(self._targets)
+        if missing:
+            self.finish_modal(context, None)
+            self.report({'ERROR'}, f'应用过程中角色被删除或重命名: {", ".join(missing)}，场景已恢复到应用前的状态')
+            return {'CANCELLED'}
+        try:
+            stage_name = next(self._steps)
+        except StopIteration as stop:
+            self.finish_modal(context, stop.value)
+            return stop.value
+        except Exception as e:
+            self.finish_modal(context, None)
+            self.report({'ERROR'}, f'发生未知错误: {str(e)}，场景已恢复到应用前的状态')
             return {'CANCELLED'}
-        
-        mesh_location = select_obj.matrix_world.to_translation()
-        model_name = f'{mmd_root_obj.mmd_root.name}_{mmd_root_obj.mmd_root.name_e}_'
-        collection_name = f'{model_name}_Collection'
 
+        index, total, character = self._progress
+        value = index / total
+        if stage_name in self.CHARACTER_STAGES:
+            value += self.CHARACTER_STAGES.index(stage_name) / len(self.CHARACTER_STAGES) / total
+        update_progress(context, self.STAGE_LABELS.get(stage_name, stage_name), character, value)
+        return {'RUNNING_MODAL'}
+
+    def cancel(self, context):
+        # 窗口关闭等情况下Blender中止操作
+        self.finish_modal(context, None)
+
+    def finish_modal(self, context, result):
+        """结束分步执行，result为None时表示取消：中止剩余的阶段并回滚，应用失败（CANCELLED）时同样回滚"""
+        context.window_manager.event_timer_remove(self._event_timer)
+        end_progress(context)
+        if result is None or result == {'CANCELLED'}:
+            # 关闭生成器会执行其中的清理（停止贴图预读线程）
+            self._steps.close()
+            self._journal.rollback()
+        self._journal = None
+        self._timer.finish(next(iter(result or {'CANCELLED'})))
+
+    def prepare(self, context):
+        """在第一个阶段之前用context确定要处理的角色和材质目录，无法执行时返回None
+
+        返回(targets, mat_directories)，targets为 (根对象名称, mesh名称) 列表，mat_directories按根对象名称索引。
+        分步执行时之后的context已经失效，生成器中不再使用context，也不持有数据块的引用
+        """
         try:
-            # 确保预设存在，必要时重新导入
-            if not self.guard_shader_exist():
-                self.import_shader_preset()
-                # 导入后再次检查
+            targets = self.collect_targets(context)
+        except BobHException as e:
+            self.report({'ERROR'}, str(e))
+            return None
+
+        mat_directories = {}
+        for mmd_root_obj, _ in targets:
+            mat_directories[mmd_root_obj.name] = self.get_material_directory(context, mmd_root_obj)
+            if not mat_directories[mmd_root_obj.name]:
+                self.report({'ERROR'}, f'请指定要导入角色的材质目录: {mmd_root_obj.name}')
+                return None
+
+        context.scene.view_settings.view_transform = 'Standard'
+        return [(mmd_root_obj.name, mesh_obj.name) for mmd_root_obj, mesh_obj in targets], mat_directories
+
+    def apply(self, targets, mat_directories):
+        """按阶段执行整个应用过程的生成器，返回操作结果"""
+        yield 'start_texture_preflight'
+        try:
+            # 贴图在后台线程中读取和校验，与预设导入、材质复制、描边解析并行进行
+            # 重新应用时只预读这次会重新绑定贴图的角色（贴图变化，或者需要重新创建、分配材质）
+            with self._timer.stage('start_texture_preflight') as counts:
+                update_directories = {
+                    mat_directory for root_name, mat_directory in mat_directories.items()
+                    if self.needs_texture_update(bpy.data.objects[root_name], mat_directory)
+                }
+                self.check_texture_headers(update_directories)
+                self.start_texture_preflight(update_directories)
+                counts['images'] = len(update_directories) * len(self.texture_suffixes())
+        except OSError as e:
+            self.report({'ERROR'}, f'无法读取材质目录: {e}')
+            return {'CANCELLED'}
+        except BobHException as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        try:
+            return (yield from self.apply_to_targets(targets, mat_directories))
+        finally:
+            self._texture_preflight.shutdown()
+            self._texture_preflight = None
+
+    def apply_to_targets(self, targets, mat_directories):
+        yield 'import_shader_preset'
+        try:
+            # 确保预设存在，必要时重新导入（所有角色只检查一次）
+            with self._timer.stage('import_shader_preset'):
                 if not self.guard_shader_exist():
-                    raise BobHException('Shader预设导入失败，请检查插件安装')
-                
-            self._meterial_name_map = self.copy_meterial_for_character(model_name)
-            self._outline_info = self.read_character_outline_info(mat_directory)
-            self.apply_texture_to_material(mat_directory)
-            self.apply_outline_color_to_material(mat_directory)
-            self.replace_mmd_material_with_shader(select_obj)
-            self.add_object_and_children_to_collection(mmd_root_obj, collection_name)
-            self.create_light_dir_and_head_empty(model_name, collection_name, mesh_location)
-            
-            # 确保操作完成后预设资源仍然存在
-            if not self.guard_shader_exist():
-                raise BobHException('操作过程中Shader预设被意外移除')
-                
+                    self.import_shader_preset()
+                    # 导入后再次检查
+                    if not self.guard_shader_exist():
+                        raise BobHException('Shader预设导入失败，请检查插件安装')
         except BobHException as e:
             self.report({'ERROR'}, str(e))
             return {'CANCELLED'}
-        except Exception as e:
-            self.report({'ERROR'}, f'发生未知错误: {str(e)}')
+
+        failed = []
+        for index, (root_name, mesh_name) in enumerate(targets):
+            self._progress = (index, len(targets), root_name)
+            # 应用失败的角色回滚到应用前的状态，不留下部分创建的材质和节点
+            journal = self._character_journal = ApplyJournal()
+            journal.record_targets([(root_name, mesh_name)])
+            try:
+                yield from journal.track_steps(self.apply_to_character(root_name, mesh_name, mat_directories[root_name]))
+            except BobHException as e:
+                self.report({'ERROR'}, f'{root_name}: {e}' if self.apply_all_selected else str(e))
+                failed.append(root_name)
+                journal.rollback()
+            except Exception as e:
+                self.report({'ERROR'}, f'发生未知错误: {str(e)}')
+                failed.append(root_name)
+                journal.rollback()
+            finally:
+                self._character_journal = None
+
+        # 确保操作完成后预设资源仍然存在
+        if not self.guard_shader_exist():
+            self.report({'ERROR'}, '操作过程中Shader预设被意外移除')
             return {'CANCELLED'}
 
-        self.report({'INFO'}, '应用材质到角色成功')
+        # 清理被替换下来的重复贴图
+        yield 'evict_unused_duplicates'
+        with self._timer.stage('evict_unused_duplicates') as counts:
+            evicted = evict_unused_duplicates()
+            counts['images'] = evicted
+        if evicted:
+            self.report({'INFO'}, f'已清理{evicted}个未使用的重复贴图')
+
+        if len(failed) == len(targets):
+            return {'CANCELLED'}
+        if failed:
+            self.report({'WARNING'}, f'以下角色应用失败: {", ".join(failed)}')
+        else:
+            self.report({'INFO'}, f'应用材质到{len(targets)}个角色成功' if len(targets) > 1 else '应用材质到角色成功')
         return {'FINISHED'}
@@ -0,0 +1,36 @@
+import bpy
+from ..preferences import get_character_library_directory
+from ..utils.character_library import CharacterLibrary
+from ..utils.stage_timer import StageTimer
+
+
+class BOBH_OT_index_character_library(bpy.types.Operator):
+    bl_label = '索引角色库'
+    bl_idname = 'bobh.index_character_library'
+    bl_description = '并行扫描角色库根目录下的所有角色解包目录并保存索引，之后只重新扫描修改过的目录'
+
+    def execute(self, context):
+        root = get_character_library_directory()
+        if not root:
+            self.report({'ERROR'}, '请先在插件偏好设置中设置角色库目录')
+            return {'CANCELLED'}
+
+        timer = StageTimer(self.bl_idname)
+        try:
+            with timer.stage('scan_library') as counts:
+                library = CharacterLibrary.get(root)
+                directories, rescanned = library.scan()
+                counts['directories'] = directories
+        except OSError as e:
+            self.report({'ERROR'}, f'无法读取角色库目录: {e}')
+            timer.finish('CANCELLED')
+            return {'CANCELLED'}
+        timer.finish('FINISHED')
+
+        characters = library.characters()
+        complete = sum(character['complete'] for character in characters)
+        self.report({'INFO'}, f'共{directories}个目录(重新扫描{rescanned}个)，找到{len(characters)}个角色，'
+                              f'其中{complete}个文件齐全')
+        if context.area:
+            context.area.tag_redraw()
+        return {'FINISHED'}
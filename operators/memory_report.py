@@ -0,0 +1,29 @@
+import bpy
+from ..utils.memory_report import build_memory_report, format_bytes
+from .operator_properties import memory_report_properties
+
+
+class BOBH_OT_memory_report(bpy.types.Operator):
+    bl_label = '统计角色内存占用'
+    bl_idname = 'bobh.memory_report'
+    bl_description = '统计每个角色材质绑定的贴图和描边修改器增加的几何数据'
+
+    # 属性定义与注册表中的延迟注册占位操作共用（max_texture_size）
+    __annotations__ = memory_report_properties()
+
+    def execute(self, context):
+        report = build_memory_report(context, self.max_texture_size)
+        if not report['characters']:
+            self.report({'WARNING'}, '场景中没有已应用材质的角色')
+            return {'FINISHED'}
+
+        # 每张贴图的明细显示在面板中（展开当前选中的角色）
+        scene_total = report['scene']
+        self.report({'INFO'}, f'{len(report["characters"])}个角色共{scene_total["images"]}张贴图 '
+                              f'{format_bytes(scene_total["image_bytes"])}，描边增加 '
+                              f'{scene_total["outline_vertices"]} 顶点 / {scene_total["outline_corners"]} 面角')
+        for names in report['duplicates']:
+            self.report({'WARNING'}, f'内容相同的重复贴图: {", ".join(names)}')
+        if report['oversized']:
+            self.report({'WARNING'}, f'超过{report["max_texture_size"]}的贴图: {", ".join(report["oversized"])}')
+        return {'FINISHED'}
@@ -0,0 +1,43 @@
+import bpy
+
+
+# 延迟注册的操作的属性定义，真实的操作类和注册表中的占位操作共用同一份定义
+# 这个模块只依赖bpy，启用插件时导入不会加载操作模块
+
+
+def apply_shader_properties():
+    return {
+        'apply_all_selected': bpy.props.BoolProperty(
+            name='应用到所有选中角色',
+            description='一次处理所有选中的MMD模型，每个模型使用各自记录的材质目录',
+            default=False
+        ),
+    }
+
+
+def set_material_directory_properties():
+    return {
+        'directory': bpy.props.StringProperty(subtype='DIR_PATH'),
+        # 从角色库中选择时目录已知，不再打开文件浏览器
+        'from_library': bpy.props.BoolProperty(options={'HIDDEN', 'SKIP_SAVE'}),
+    }
+
+
+def switch_texture_proxies_properties():
+    return {
+        'use_proxies': bpy.props.BoolProperty(
+            name='使用代理贴图',
+            default=True
+        ),
+    }
+
+
+def memory_report_properties():
+    return {
+        'max_texture_size': bpy.props.IntProperty(
+            name='贴图尺寸上限',
+            description='宽或高超过该值的贴图会被标记为过大',
+            default=2048,
+            min=1
+        ),
+    }
@@ -1,79 +1,90 @@
 import bpy
-import os
 from ..bobh_exception import BobHException
+from ..utils.mmd_model_index import find_mmd_root_object
+from ..utils.stage_timer import StageTimer
+from .operator_properties import set_material_directory_properties
+from ..utils.texture_preflight import check_texture_headers
+from ..utils.character_asset_index import (
+    CharacterAssetIndex,
+    REQUIRED_MAT_FILES,
+    REQUIRED_OUTLINE_FILES,
+    OPTIONAL_OUTLINE_FILES,
+)
 
 
 class BOBH_OT_set_character_material_directory(bpy.types.Operator):
     bl_label = '选择角色解包材质目录'
     bl_idname = 'bobh.set_material_directory'
-    directory: bpy.props.StringProperty(subtype='DIR_PATH') # type: ignore
+
+    # 属性定义与注册表中的延迟注册占位操作共用（directory, from_library）
+    __annotations__ = set_material_directory_properties()
 
     # 必需的材质文件列表
-    REQUIRED_MAT_FILES = [
-        '_Tex_Body_Diffuse.png',
-        '_Tex_Body_Lightmap.png',
-        '_Tex_Body_Shadow_Ramp.png',
-        '_Face_Diffuse.png',
-        '_Hair_Diffuse.png',
-        '_Hair_Lightmap.png',
-        '_Hair_Shadow_Ramp.png',
-    ]
+    REQUIRED_MAT_FILES = REQUIRED_MAT_FILES
 
     # 必需的描边文件列表
-    REQUIRED_OUTLINE_FILES = [
-        '_Mat_Body.json',
-        '_Mat_Face.json',
-        '_Mat_Hair.json',
-    ]
+    REQUIRED_OUTLINE_FILES = REQUIRED_OUTLINE_FILES
 
     # 可选的描边文件列表（_Mat_Dress.json和_Mat_Leather.json作用相同，任选其一即可）
-    OPTIONAL_OUTLINE_FILES = [
-        '_Mat_Dress.json',
-        '_Mat_Leather.json',
-    ]
+    OPTIONAL_OUTLINE_FILES = OPTIONAL_OUTLINE_FILES
 
     def validate_path(self, path):
         """验证材质目录结构"""
+        try:
+            index = CharacterAssetIndex.get(path)
+        except OSError as e:
+            raise BobHException(f'无法读取材质目录: {e}')
+
         # 检查主目录下的PNG文件
-        png_files = [f for f in os.listdir(path) if f.endswith('.png')]
-        missing_mat_files = [file for file in self.REQUIRED_MAT_FILES 
-                           if not any(f.endswith(file) for f in png_files)]
+        missing_mat_files = index.missing_textures(self.REQUIRED_MAT_FILES)
         if missing_mat_files:
             raise BobHException(f'目录缺少以下必需的材质文件: {", ".join(missing_mat_files)}')
 
+        # 只读取PNG文件头，检查贴图是否损坏以及尺寸、位深和alpha通道是否符合用途
+        texture_problems = check_texture_headers(index, self.REQUIRED_MAT_FILES)
+        if texture_problems:
+            raise BobHException(f'贴图文件不符合要求: {"; ".join(texture_problems)}')
+
         # 检查Materials子目录
-        materials_dir = os.path.join(path, 'Materials')
-        if not os.path.isdir(materials_dir):
+        if not index.has_materials_directory:
             raise BobHException('目录中缺少 "Materials" 文件夹')
 
         # 检查必需的描边文件
-        materials_files = [f for f in os.listdir(materials_dir)]
-        missing_required_outline = [file for file in self.REQUIRED_OUTLINE_FILES 
-                                  if not any(f.endswith(file) for f in materials_files)]
+        missing_required_outline = index.missing_outlines(self.REQUIRED_OUTLINE_FILES)
         if missing_required_outline:
             raise BobHException(f'Materials 文件夹中缺少以下必需文件: {", ".join(missing_required_outline)}')
 
         # 检查可选的描边文件（至少存在其中一个即可）
-        has_optional_outline = any(
-            any(f.endswith(file) for f in materials_files)
-            for file in self.OPTIONAL_OUTLINE_FILES
-        )
-        if not has_optional_outline:
+        _, optional_outline_path = index.first_outline(self.OPTIONAL_OUTLINE_FILES)
+        if optional_outline_path is None:
             self.report({'WARNING'}, f'Materials 文件夹中缺少以下可选文件(任选其一即可): {", ".join(self.OPTIONAL_OUTLINE_FILES)}')
 
     def execute(self, context):
         if not self.directory:
             return {'CANCELLED'}
+        timer = StageTimer(self.bl_idname)
         try:
-            self.validate_path(self.directory)
+            with timer.stage('validate_path') as counts:
+                self.validate_path(self.directory)
+                index = CharacterAssetIndex.get(self.directory)
+                counts['files'] = len(index.textures) + len(index.outlines)
             context.scene.material_directory = self.directory
+            # 同时记录到选中模型的根对象上，便于多角色批量应用
+            mmd_root_obj = find_mmd_root_object(context.active_object)
+            if mmd_root_obj is not None:
+                mmd_root_obj.material_directory = self.directory
             self.report({'INFO'}, f'材质目录设置为: {context.scene.material_directory}')
-            bpy.context.area.tag_redraw()
+            if context.area:
+                context.area.tag_redraw()
         except BobHException as e:
             self.report({'ERROR'}, f'{e}')
+            timer.finish('CANCELLED')
             return {'CANCELLED'}
+        timer.finish('FINISHED')
         return {'FINISHED'}
 
     def invoke(self, context, event):
+        if self.from_library:
+            return self.execute(context)
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}
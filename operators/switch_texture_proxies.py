@@ -0,0 +1,32 @@
+import bpy
+from ..bobh_exception import BobHException
+from ..preferences import get_texture_proxy_scale
+from ..utils.texture_proxy import bind_proxies, bind_full_resolution
+from .operator_properties import switch_texture_proxies_properties
+
+
+class BOBH_OT_switch_texture_proxies(bpy.types.Operator):
+    bl_label = '切换视口代理贴图'
+    bl_idname = 'bobh.switch_texture_proxies'
+    bl_description = '把所有角色材质的贴图换成缩小的代理贴图或换回全分辨率贴图，渲染时总是使用全分辨率贴图'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # 属性定义与注册表中的延迟注册占位操作共用（use_proxies）
+    __annotations__ = switch_texture_proxies_properties()
+
+    def execute(self, context):
+        try:
+            if self.use_proxies:
+                scale = get_texture_proxy_scale()
+                count = bind_proxies(scale)
+                self.report({'INFO'}, f'已将{count}个贴图节点换成1/{scale}代理贴图')
+            else:
+                count = bind_full_resolution()
+                self.report({'INFO'}, f'已将{count}个贴图节点换回全分辨率贴图')
+        except ImportError as e:
+            self.report({'ERROR'}, f'生成代理贴图需要numpy: {e}')
+            return {'CANCELLED'}
+        except (OSError, BobHException) as e:
+            self.report({'ERROR'}, f'切换代理贴图失败: {e}')
+            return {'CANCELLED'}
+        return {'FINISHED'}
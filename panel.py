@@ -0,0 +1,164 @@
+import bpy
+from .preferences import stage_timing_enabled, get_character_library_directory
+from .utils.stage_timer import get_last_run
+from .utils.modal_progress import get_active_progress
+
+
+class BOBH_OT_open_url(bpy.types.Operator):
+    """Operator to open URLs in web browser"""
+    bl_idname = "bobh.open_url"
+    bl_label = "Open URL"
+    bl_description = "Open URL in web browser"
+    
+    url: bpy.props.StringProperty(name="URL", default="")
+    
+    def execute(self, context):
+        import webbrowser
+        webbrowser.open(self.url)
+        return {'FINISHED'}
+
+
+class BOBH_PT_main_panel(bpy.types.Panel):
+    """Main panel for Genshin Impact shader tools"""
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'BobHTool'
+    bl_label = '仿原神渲染'
+
+    # 角色库中最多列出的匹配角色数
+    MAX_LIBRARY_ITEMS = 20
+
+    def draw_character_library(self, layout, scene):
+        library_box = layout.box()
+        library_box.label(text="角色库", icon='ASSET_MANAGER')
+        root = get_character_library_directory()
+        if not root:
+            library_box.label(text='在插件偏好设置中设置角色库目录后可按名称选择角色')
+            return
+        # 面板在启用插件时注册，角色库等工具模块在第一次绘制时才导入
+        from .utils.character_library import CharacterLibrary
+
+        row = library_box.row(align=True)
+        row.prop(scene, 'character_library_filter', text='', icon='VIEWZOOM')
+        row.operator('bobh.index_character_library', text='', icon='FILE_REFRESH')
+
+        library = CharacterLibrary.get(root)
+        if not library.entries:
+            library_box.label(text='尚未索引，点击刷新按钮扫描角色库')
+            return
+        characters = library.find(scene.character_library_filter)
+        col = library_box.column(align=True)
+        for character in characters[:self.MAX_LIBRARY_ITEMS]:
+            op = col.operator('bobh.set_material_directory', text=character['name'],
+                              icon='CHECKMARK' if character['complete'] else 'ERROR')
+            op.directory = character['path']
+            op.from_library = True
+        if len(characters) > self.MAX_LIBRARY_ITEMS:
+            col.label(text=f'还有{len(characters) - self.MAX_LIBRARY_ITEMS}个匹配的角色，请输入更多关键字')
+        elif not characters:
+            col.label(text='没有匹配的角色')
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        # Main functionality box
+        box = layout.box()
+        box.label(text="一键导入原神Shader", icon='MATERIAL')
+        
+        # Material directory settings
+        row = box.row()
+        row.operator('bobh.set_material_directory', text='设置角色材质目录')
+        
+        row = box.row()
+        row.label(text=f'当前材质目录: {scene.material_directory}')
+
+        self.draw_character_library(box, scene)
+        
+        # Main operators
+        row = box.row()
+        row.operator('bobh.apply_shader_to_mmd_model', text='应用材质到选定mmd模型')
+
+        row = box.row()
+        op = row.operator('bobh.apply_shader_to_mmd_model', text='应用材质到所有选中mmd模型')
+        op.apply_all_selected = True
+
+        progress = get_active_progress()
+        if progress is not None:
+            col = box.column(align=True)
+            col.label(text=f"正在应用({progress['value'] * 100:.0f}%): {progress['character']} {progress['stage']}",
+                      icon='SORTTIME')
+            col.label(text='按Esc取消并恢复应用前的状态')
+        
+        row = box.row()
+        row.operator('bobh.apply_light_and_outline', text='应用灯光和描边效果')
+        
+        row = box.row()
+        row.operator('bobh.apply_postprocess', text='应用后处理')
+
+        row = box.row(align=True)
+        op = row.operator('bobh.switch_texture_proxies', text='视口代理贴图', icon='IMAGE_DATA')
+        op.use_proxies = True
+        op = row.operator('bobh.switch_texture_proxies', text='全分辨率贴图')
+        op.use_proxies = False
+
+        # Memory report
+        memory_box = layout.box()
+        memory_box.operator('bobh.memory_report', text='统计角色内存占用', icon='MEMORY')
+        from .utils.memory_report import get_last_report
+        report = get_last_report()
+        if report is not None:
+            from .utils.memory_report import format_bytes
+            from .utils.mmd_model_index import find_mmd_root_object
+            active_root = find_mmd_root_object(context.active_object)
+            col = memory_box.column(align=True)
+            for character in report['characters']:
+                col.label(text=f"{character['name']}: {len(character['images'])}张贴图 "
+                               f"{format_bytes(character['image_bytes'])}，描边 +{character['outline_vertices']} 顶点 "
+                               f"+{character['outline_corners']} 面角")
+                # 只展开当前选中角色的贴图明细
+                if active_root is None or active_root.name != character['name']:
+                    continue
+                for info in report['images'].values():
+                    if character['name'] in info['characters']:
+                        col.label(text=f"    {info['name']}: {info['width']}x{info['height']} {info['channels']}通道 "
+                                       f"{format_bytes(info['bytes'])} x{len(info['characters'])}"
+                                       + (' (代理)' if info['is_proxy'] else '')
+                                       + ('' if info['loaded'] else ' (未加载)'))
+            scene_total = report['scene']
+            col.label(text=f"场景合计: {scene_total['images']}张贴图 {format_bytes(scene_total['image_bytes'])}，"
+                           f"描边 +{scene_total['outline_vertices']} 顶点 +{scene_total['outline_corners']} 面角")
+            for names in report['duplicates']:
+                col.label(text=f"重复贴图: {', '.join(names)}", icon='ERROR')
+            for image_name in report['oversized']:
+                col.label(text=f"过大贴图: {image_name}", icon='ERROR')
+
+        # Stage timing of the last run
+        last_run = get_last_run()
+        if stage_timing_enabled() and last_run is not None:
+            timing_box = layout.box()
+            timing_box.label(
+                text=f"上次运行: {last_run['operator']} ({last_run['result']}) {last_run['total'] * 1000:.1f} ms",
+                icon='TIME'
+            )
+            col = timing_box.column(align=True)
+            for stage_name, duration, count in last_run['stages']:
+                suffix = f' x{count}' if count > 1 else ''
+                col.label(text=f'{stage_name}{suffix}: {duration * 1000:.1f} ms')
+        
+        # Credits section
+        layout.separator()
+        credits_box = layout.box()
+        credits_box.label(text="Credits:")
+        
+        # Original author
+        row = credits_box.row(align=True)
+        row.label(text="shader原作者:")
+        op = row.operator('bobh.open_url', text='festivity', emboss=False)
+        op.url = "https://github.com/festivities"
+        
+        # Modifier
+        row = credits_box.row(align=True)
+        row.label(text="shader修改:")
+        op = row.operator('bobh.open_url', text='克里斯提亚娜', emboss=False)
+        op.url = "https://space.bilibili.com/322607631"
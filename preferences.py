@@ -0,0 +1,213 @@
+import bpy
+import os
+from .registry import get_enable_time, get_lazy_load_times
+
+
+ADDON_PACKAGE = __package__
+
+
+class BOBH_AddonPreferences(bpy.types.AddonPreferences):
+    bl_idname = ADDON_PACKAGE
+
+    use_linked_presets: bpy.props.BoolProperty(
+        name='链接预设资源',
+        description='从预设库链接节点组和模板材质而不是追加到场景，只把需要按角色修改的部分变为本地数据，'
+                    '可以减小保存的blend文件并加快打开速度',
+        default=False
+    ) # type: ignore
+
+    preset_library_directory: bpy.props.StringProperty(
+        name='预设库目录',
+        description='存放预设blend文件的目录（例如工作室共享的副本），留空时使用插件自带的Data目录',
+        subtype='DIR_PATH',
+        default=''
+    ) # type: ignore
+
+    classifier_keyword_file: bpy.props.StringProperty(
+        name='材质关键词表',
+        description='额外的材质识别关键词表json文件，用于补充默认的脸/头发/身体/服装/眼睛/排除关键词',
+        subtype='FILE_PATH',
+        default=''
+    ) # type: ignore
+
+    move_model_collection: bpy.props.BoolProperty(
+        name='直接移动模型集合',
+        description='模型独占一个集合时，直接重命名并移动该集合，而不是逐个对象重新链接（物体数量很多时更快）',
+        default=False
+    ) # type: ignore
+
+    enable_stage_timing: bpy.props.BoolProperty(
+        name='记录各阶段耗时',
+        description='记录每个操作各阶段的耗时和处理的数据块数量，在面板中显示最近一次的结果并追加写入日志文件',
+        default=False
+    ) # type: ignore
+
+    stage_timing_log_file: bpy.props.StringProperty(
+        name='耗时日志文件',
+        description='各阶段耗时的日志文件（每行一条json记录），留空时写入插件缓存目录下的logs/stage_timing.jsonl',
+        subtype='FILE_PATH',
+        default=''
+    ) # type: ignore
+
+    use_texture_proxies: bpy.props.BoolProperty(
+        name='视口使用代理贴图',
+        description='应用材质时在视口中绑定缩小的代理贴图（缓存在磁盘上），渲染时自动换回全分辨率贴图，'
+                    '可以减少多角色场景视口播放时的显存占用',
+        default=False
+    ) # type: ignore
+
+    texture_proxy_scale: bpy.props.EnumProperty(
+        name='代理贴图尺寸',
+        items=[
+            ('2', '1/2', '宽高缩小为原来的1/2'),
+            ('4', '1/4', '宽高缩小为原来的1/4'),
+            ('8', '1/8', '宽高缩小为原来的1/8'),
+        ],
+        default='4'
+    ) # type: ignore
+
+    use_shared_materials: bpy.props.BoolProperty(
+        name='角色共用材质',
+        description='多个角色共用一套材质（每种用途一个），每个角色的贴图和描边颜色由材质中按槽位查找的节点提供，'
+                    '槽位编号记录在角色mesh物体的属性上，可以减少多角色场景的材质数量和Shader编译时间',
+        default=False
+    ) # type: ignore
+
+    shared_material_slots: bpy.props.IntProperty(
+        name='每套共享材质的角色数',
+        description='一套共享材质最多容纳的角色数，超出时再创建一套。每个槽位都会在Shader中采样自己的贴图，'
+                    '数量过多可能超过显卡的贴图数量限制',
+        default=4,
+        min=2,
+        max=8
+    ) # type: ignore
+
+    character_library_directory: bpy.props.StringProperty(
+        name='角色库目录',
+        description='存放所有角色解包目录的根目录（例如整个游戏贴图的解包结果），索引后可以在面板中按名称直接选择角色材质目录',
+        subtype='DIR_PATH',
+        default=''
+    ) # type: ignore
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, 'use_linked_presets')
+        layout.prop(self, 'preset_library_directory')
+        layout.prop(self, 'classifier_keyword_file')
+        layout.prop(self, 'move_model_collection')
+        layout.prop(self, 'enable_stage_timing')
+        row = layout.row()
+        row.enabled = self.enable_stage_timing
+        row.prop(self, 'stage_timing_log_file')
+        layout.prop(self, 'use_texture_proxies')
+        row = layout.row()
+        row.enabled = self.use_texture_proxies
+        row.prop(self, 'texture_proxy_scale')
+        layout.prop(self, 'use_shared_materials')
+        row = layout.row()
+        row.enabled = self.use_shared_materials
+        row.prop(self, 'shared_material_slots')
+        layout.prop(self, 'character_library_directory')
+
+        enable_time = get_enable_time()
+        if enable_time is not None:
+            col = layout.column(align=True)
+            col.label(text=f'插件启用耗时: {enable_time * 1000:.1f} ms', icon='TIME')
+            for class_name, load_time in get_lazy_load_times().items():
+                col.label(text=f'首次调用时加载 {class_name}: {load_time * 1000:.1f} ms')
+
+
+def get_addon_preferences():
+    """返回插件偏好设置，插件未注册时(例如在Blender外运行)返回None"""
+    addon = bpy.context.preferences.addons.get(ADDON_PACKAGE)
+    if addon is None:
+        return None
+    return addon.preferences
+
+
+def use_linked_presets():
+    # 环境变量优先，便于渲染农场的无界面任务统一设置
+    env_value = os.environ.get('BOBH_LINK_PRESETS')
+    if env_value is not None:
+        return env_value.lower() in ('1', 'true', 'yes', 'on')
+    prefs = get_addon_preferences()
+    return bool(prefs and prefs.use_linked_presets)
+
+
+def get_preset_library_directory():
+    env_value = os.environ.get('BOBH_PRESET_LIBRARY_DIR')
+    if env_value:
+        return env_value
+    prefs = get_addon_preferences()
+    if prefs and prefs.preset_library_directory:
+        return bpy.path.abspath(prefs.preset_library_directory)
+    return ''
+
+
+def get_classifier_keyword_files():
+    """额外的材质关键词表，环境变量中可以用路径分隔符指定多个"""
+    paths = []
+    env_value = os.environ.get('BOBH_CLASSIFIER_KEYWORDS')
+    if env_value:
+        paths.extend(path for path in env_value.split(os.pathsep) if path)
+    prefs = get_addon_preferences()
+    if prefs and prefs.classifier_keyword_file:
+        paths.append(bpy.path.abspath(prefs.classifier_keyword_file))
+    return tuple(paths)
+
+
+def get_move_model_collection():
+    prefs = get_addon_preferences()
+    return bool(prefs and prefs.move_model_collection)
+
+
+def stage_timing_enabled():
+    env_value = os.environ.get('BOBH_STAGE_TIMING')
+    if env_value is not None:
+        return env_value.lower() in ('1', 'true', 'yes', 'on')
+    prefs = get_addon_preferences()
+    return bool(prefs and prefs.enable_stage_timing)
+
+
+def get_stage_timing_log_file():
+    """返回耗时日志文件路径，未设置时返回空字符串"""
+    env_value = os.environ.get('BOBH_STAGE_TIMING_LOG')
+    if env_value:
+        return env_value
+    prefs = get_addon_preferences()
+    if prefs and prefs.stage_timing_log_file:
+        return bpy.path.abspath(prefs.stage_timing_log_file)
+    return ''
+
+
+def use_texture_proxies():
+    prefs = get_addon_preferences()
+    return bool(prefs and prefs.use_texture_proxies)
+
+
+def get_texture_proxy_scale():
+    prefs = get_addon_preferences()
+    return int(prefs.texture_proxy_scale) if prefs else 4
+
+
+def use_shared_materials():
+    env_value = os.environ.get('BOBH_SHARED_MATERIALS')
+    if env_value is not None:
+        return env_value.lower() in ('1', 'true', 'yes', 'on')
+    prefs = get_addon_preferences()
+    return bool(prefs and prefs.use_shared_materials)
+
+
+def get_shared_material_slots():
+    prefs = get_addon_preferences()
+    return prefs.shared_material_slots if prefs else 4
+
+
+def get_character_library_directory():
+    env_value = os.environ.get('BOBH_CHARACTER_LIBRARY')
+    if env_value:
+        return env_value
+    prefs = get_addon_preferences()
+    if prefs and prefs.character_library_directory:
+        return bpy.path.abspath(prefs.character_library_directory)
+    return ''
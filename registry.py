@@ -0,0 +1,212 @@
+import bpy
+import importlib
+import inspect
+import os
+import sys
+import time
+from .bobh_exception import BobHException
+from .operators.operator_properties import (
+    apply_shader_properties,
+    set_material_directory_properties,
+    switch_texture_proxies_properties,
+    memory_report_properties,
+)
+
+
+ADDON_PACKAGE = __package__
+
+# 注册方式
+EAGER = 'eager'  # 启用插件时导入模块并注册
+LAZY = 'lazy'    # 启用时只注册同名的占位操作，第一次调用时才导入模块
+UI = 'ui'        # 界面类，无界面运行时跳过
+
+# 注册表: (模块, 类名, 注册方式, 延迟注册的占位操作定义)
+# 占位操作的bl_idname和标签必须与真实的操作类一致，属性与真实的操作类使用operator_properties中的同一份定义
+# （第一次调用时会检查属性名称），methods为真实操作类中定义的Blender回调
+REGISTRY = (
+    ('.preferences', 'BOBH_AddonPreferences', EAGER, None),
+    ('.panel', 'BOBH_OT_open_url', UI, None),
+    ('.panel', 'BOBH_PT_main_panel', UI, None),
+    ('.operators.set_character_material_directory', 'BOBH_OT_set_character_material_directory', LAZY, {
+        'bl_idname': 'bobh.set_material_directory',
+        'bl_label': '选择角色解包材质目录',
+        'methods': ('execute', 'invoke'),
+        'properties': set_material_directory_properties,
+    }),
+    ('.operators.apply_shader_to_mmd_mode', 'BOBH_OT_apply_shader_to_mmd_model', LAZY, {
+        'bl_idname': 'bobh.apply_shader_to_mmd_model',
+        'bl_label': '将Shader材质应用到角色',
+        'bl_options': {'REGISTER', 'UNDO'},
+        'methods': ('execute', 'invoke', 'modal', 'cancel'),
+        'properties': apply_shader_properties,
+    }),
+    ('.operators.apply_light_and_outline', 'BOBH_OT_apply_light_and_outline', LAZY, {
+        'bl_idname': 'bobh.apply_light_and_outline',
+        'bl_label': '将灯光和描边节点应用给模型',
+        'methods': ('execute',),
+    }),
+    ('.operators.apply_postprocess', 'BOBH_OT_apply_postprocess', LAZY, {
+        'bl_idname': 'bobh.apply_postprocess',
+        'bl_label': '应用后处理',
+        'methods': ('execute',),
+    }),
+    ('.operators.switch_texture_proxies', 'BOBH_OT_switch_texture_proxies', LAZY, {
+        'bl_idname': 'bobh.switch_texture_proxies',
+        'bl_label': '切换视口代理贴图',
+        'bl_description': '把所有角色材质的贴图换成缩小的代理贴图或换回全分辨率贴图，渲染时总是使用全分辨率贴图',
+        'bl_options': {'REGISTER', 'UNDO'},
+        'methods': ('execute',),
+        'properties': switch_texture_proxies_properties,
+    }),
+    ('.operators.memory_report', 'BOBH_OT_memory_report', LAZY, {
+        'bl_idname': 'bobh.memory_report',
+        'bl_label': '统计角色内存占用',
+        'bl_description': '统计每个角色材质绑定的贴图和描边修改器增加的几何数据',
+        'methods': ('execute',),
+        'properties': memory_report_properties,
+    }),
+    ('.operators.index_character_library', 'BOBH_OT_index_character_library', LAZY, {
+        'bl_idname': 'bobh.index_character_library',
+        'bl_label': '索引角色库',
+        'bl_description': '并行扫描角色库根目录下的所有角色解包目录并保存索引，之后只重新扫描修改过的目录',
+        'methods': ('execute',),
+    }),
+)
+
+_registered_classes = []
+# 启用插件的耗时（秒）和延迟加载的操作类的导入耗时: 类名 -> 秒
+_enable_time = None
+_lazy_load_times = {}
+
+
+def get_enable_time():
+    return _enable_time
+
+
+def get_lazy_load_times():
+    return dict(_lazy_load_times)
+
+
+def register_ui_classes():
+    """无界面运行（渲染农场等）时默认不注册面板，环境变量BOBH_REGISTER_UI可以强制指定"""
+    env_value = os.environ.get('BOBH_REGISTER_UI')
+    if env_value is not None:
+        return env_value.lower() in ('1', 'true', 'yes', 'on')
+    return not bpy.app.background
+
+
+def load_class(module_name, class_name):
+    return getattr(importlib.import_module(module_name, ADDON_PACKAGE), class_name)
+
+
+def _load_implementation(cls):
+    """导入真实的操作类（只在第一次调用时导入）"""
+    if cls._lazy_implementation is None:
+        start = time.perf_counter()
+        implementation = load_class(cls._lazy_module, cls._lazy_class)
+        property_names = set(getattr(implementation, '__annotations__', {}))
+        if property_names != set(cls._lazy_properties):
+            raise BobHException(f'注册表中{cls._lazy_class}的属性与操作类不一致: '
+                                f'{sorted(property_names ^ set(cls._lazy_properties))}')
+        cls._lazy_implementation = implementation
+        _lazy_load_times[cls._lazy_class] = time.perf_counter() - start
+    return cls._lazy_implementation
+
+
+def _implementation_attribute(self, name):
+    """占位操作上没有的属性（辅助方法、类常量）从真实的操作类中取"""
+    if name.startswith('__'):
+        raise AttributeError(name)
+    attribute = inspect.getattr_static(type(self)._load_implementation(), name)
+    if hasattr(attribute, '__get__'):
+        return attribute.__get__(self, type(self))
+    return attribute
+
+
+# Blender注册时检查回调的参数个数，所以每种回调单独定义
+def _execute(self, context):
+    return type(self)._load_implementation().execute(self, context)
+
+
+def _invoke(self, context, event):
+    return type(self)._load_implementation().invoke(self, context, event)
+
+
+def _modal(self, context, event):
+    return type(self)._load_implementation().modal(self, context, event)
+
+
+def _cancel(self, context):
+    return type(self)._load_implementation().cancel(self, context)
+
+
+LAZY_METHODS = {'execute': _execute, 'invoke': _invoke, 'modal': _modal, 'cancel': _cancel}
+
+
+def make_lazy_operator(module_name, class_name, definition):
+    """创建占位操作类：回调在第一次调用时导入真实的操作类，并以占位操作实例作为self执行"""
+    properties = definition['properties']() if 'properties' in definition else {}
+    namespace = {
+        'bl_idname': definition['bl_idname'],
+        'bl_label': definition['bl_label'],
+        '__annotations__': properties,
+        '_lazy_module': module_name,
+        '_lazy_class': class_name,
+        '_lazy_properties': tuple(properties),
+        '_lazy_implementation': None,
+        '_load_implementation': classmethod(_load_implementation),
+        '__getattr__': _implementation_attribute,
+    }
+    for key in ('bl_options', 'bl_description'):
+        if key in definition:
+            namespace[key] = definition[key]
+    for method in definition['methods']:
+        namespace[method] = LAZY_METHODS[method]
+    return type(class_name, (bpy.types.Operator,), namespace)
+
+
+def record_enable_time(start):
+    """记录从start（导入插件时的perf_counter）到现在的启用耗时，返回耗时（秒）"""
+    global _enable_time
+    _enable_time = time.perf_counter() - start
+    return _enable_time
+
+
+# 注册了应用处理函数（bpy.app.handlers）的工具模块，启用插件时不导入，模块在第一次导入时注册自己的处理函数
+HANDLER_MODULES = ('.utils.mmd_model_index', '.utils.texture_proxy')
+
+
+def _imported_handler_modules():
+    for module_name in HANDLER_MODULES:
+        module = sys.modules.get(ADDON_PACKAGE + module_name)
+        if module is not None:
+            yield module
+
+
+def register_handlers():
+    """重新启用插件时，为之前已经导入的工具模块重新注册处理函数"""
+    for module in _imported_handler_modules():
+        module.register()
+
+
+def unregister_handlers():
+    for module in _imported_handler_modules():
+        module.unregister()
+
+
+def register():
+    include_ui = register_ui_classes()
+    for module_name, class_name, mode, definition in REGISTRY:
+        if mode == UI and not include_ui:
+            continue
+        if mode == LAZY:
+            cls = make_lazy_operator(module_name, class_name, definition)
+        else:
+            cls = load_class(module_name, class_name)
+        bpy.utils.register_class(cls)
+        _registered_classes.append(cls)
+
+
+def unregister():
+    while _registered_classes:
+        bpy.utils.unregister_class(_registered_classes.pop())
@@ -0,0 +1,295 @@
+"""批量转换MMD角色的命令行入口
+
+用法:
+    blender -b --python scripts/batch_convert.py -- --manifest jobs.json --workers 4
+
+manifest 为json文件，可以是任务列表，也可以是带 "jobs" 字段的对象:
+    {
+        "postprocess": false,
+        "jobs": [
+            {
+                "source": "D:/models/Furina/Furina.pmx",
+                "material_directory": "D:/GI-Assets/Furina",
+                "output": "D:/out/Furina.blend",
+                "postprocess": true
+            }
+        ]
+    }
+
+source 可以是 .pmx/.pmd (需要启用mmd_tools) 或 .blend 文件。
+可选的 "name" 用于日志文件名和报告，默认为 "<任务序号>_<输出文件名>"，任务之间不能重名。
+指定了角色库根目录 "character_library" (顶层或单个任务) 时，任务可以用 "character" 代替
+"material_directory"，按名称或相对路径从角色库索引中查找材质目录（索引为空时先扫描一次）。
+每个任务在独立的Blender子进程中执行，主进程只负责调度和汇总结果。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+RESULT_PREFIX = 'BOBH_BATCH_RESULT '
+
+
+def script_args(argv):
+    """Blender会把 '--' 之后的参数留给脚本"""
+    if '--' in argv:
+        return argv[argv.index('--') + 1:]
+    return argv[1:]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='批量将原神Shader应用到MMD模型')
+    parser.add_argument('--manifest', help='任务清单json文件')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='并行的Blender子进程数量')
+    parser.add_argument('--blender', default=None, help='Blender可执行文件路径，默认使用当前Blender')
+    parser.add_argument('--addon-module', default=os.path.basename(ADDON_DIR),
+                        help='插件模块名 (以扩展方式安装时形如 bl_ext.user_default.xxx)')
+    parser.add_argument('--postprocess', action='store_true', help='所有任务都应用后处理')
+    parser.add_argument('--timeout', type=float, default=None, help='单个任务的超时时间(秒)')
+    parser.add_argument('--report', default=None, help='结果报告json输出路径')
+    parser.add_argument('--log-dir', default=None, help='保存每个任务子进程输出的目录')
+    # 子进程内部使用
+    parser.add_argument('--worker-job', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def load_manifest(path, postprocess_default=False):
+    with open(path, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+
+    postprocess_default = manifest.get('postprocess', postprocess_default)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    names = set()
+    for i, job in enumerate(manifest.get('jobs', [])):
+        job = dict(job)
+        if manifest.get('character_library'):
+            job.setdefault('character_library', manifest['character_library'])
+        # 用角色名称代替材质目录时，材质目录在子进程中从角色库索引查找
+        by_character = not job.get('material_directory') and job.get('character') and job.get('character_library')
+        for key in ('source', 'output') if by_character else ('source', 'material_directory', 'output'):
+            if not job.get(key):
+                raise ValueError(f'第{i}个任务缺少字段: {key}')
+        for key in ('source', 'material_directory', 'output', 'character_library'):
+            if job.get(key):
+                job[key] = os.path.join(base_dir, job[key])
+        job.setdefault('postprocess', postprocess_default)
+        # 名称用作 --log-dir 下的日志文件名和报告中的标识，不同目录下的输出文件可能同名，默认加上任务序号
+        job.setdefault('name', f'{i:03d}_{os.path.splitext(os.path.basename(job["output"]))[0]}')
+        if job['name'] in names:
+            raise ValueError(f'第{i}个任务的名称重复: {job["name"]}')
+        names.add(job['name'])
+        jobs.append(job)
+    return jobs
+
+
+# ---------------------------------------------------------------------------
+# 子进程: 在Blender内执行单个任务
+# ---------------------------------------------------------------------------
+
+def _check_operator(result, name):
+    if 'FINISHED' not in result:
+        raise RuntimeError(f'{name} 执行失败: {result}')
+
+
+def _find_mmd_root(bpy, root_name=None):
+    for obj in bpy.context.scene.objects:
+        if getattr(obj, 'mmd_type', None) != 'ROOT':
+            continue
+        if root_name is None or obj.name == root_name:
+            return obj
+    return None
+
+
+def _find_main_mesh(root_obj):
+    meshes = []
+    stack = list(root_obj.children)
+    while stack:
+        obj = stack.pop()
+        if obj.type == 'MESH':
+            meshes.append(obj)
+        stack.extend(obj.children)
+    if not meshes:
+        return None
+    return max(meshes, key=lambda obj: len(obj.data.polygons))
+
+
+def _resolve_character_directory(addon_module, root, character):
+    """从角色库索引中查找角色的材质目录，名称完全相同的优先，否则要求只有一个文件齐全的匹配"""
+    import importlib
+    library_module = importlib.import_module(f'{addon_module}.utils.character_library')
+    library = library_module.CharacterLibrary.get(root)
+    if not library.entries:
+        library.scan()
+    matches = library.find(character, complete_only=True)
+    exact = [match for match in matches if match['name'].lower() == character.lower()]
+    if len(exact) == 1 or len(matches) == 1:
+        return (exact or matches)[0]['path']
+    if not matches:
+        raise RuntimeError(f'角色库中找不到文件齐全的角色: {character}')
+    raise RuntimeError(f'角色库中有多个匹配 {character} 的角色: '
+                       f'{", ".join(match["relative_path"] for match in matches[:5])}')
+
+
+def _select_only(bpy, obj):
+    for other in bpy.context.view_layer.objects:
+        other.select_set(False)
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+
+
+def run_worker_job(job, addon_module):
+    import bpy
+    import addon_utils
+
+    timings = {}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    if ADDON_DIR not in sys.path and os.path.dirname(ADDON_DIR) not in sys.path:
+        sys.path.append(os.path.dirname(ADDON_DIR))
+    if addon_module not in bpy.context.preferences.addons:
+        timed('enable_addon', addon_utils.enable, addon_module, default_set=True)
+
+    if not job.get('material_directory'):
+        job['material_directory'] = timed('resolve_character', _resolve_character_directory,
+                                          addon_module, job['character_library'], job['character'])
+
+    source = job['source']
+    if source.lower().endswith('.blend'):
+        timed('open_source', bpy.ops.wm.open_mainfile, filepath=source)
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True)
+        _check_operator(timed('open_source', bpy.ops.mmd_tools.import_model, filepath=source), 'mmd_tools.import_model')
+
+    root_obj = _find_mmd_root(bpy, job.get('root'))
+    if root_obj is None:
+        raise RuntimeError('场景中找不到MMD模型根对象')
+    mesh_obj = _find_main_mesh(root_obj)
+    if mesh_obj is None:
+        raise RuntimeError(f'MMD模型 {root_obj.name} 下找不到mesh对象')
+    _select_only(bpy, mesh_obj)
+
+    _check_operator(timed('set_material_directory', bpy.ops.bobh.set_material_directory,
+                          directory=job['material_directory']), 'set_material_directory')
+    _check_operator(timed('apply_shader_to_mmd_model', bpy.ops.bobh.apply_shader_to_mmd_model),
+                    'apply_shader_to_mmd_model')
+    _select_only(bpy, mesh_obj)
+    _check_operator(timed('apply_light_and_outline', bpy.ops.bobh.apply_light_and_outline),
+                    'apply_light_and_outline')
+    if job.get('postprocess'):
+        _check_operator(timed('apply_postprocess', bpy.ops.bobh.apply_postprocess), 'apply_postprocess')
+
+    os.makedirs(os.path.dirname(job['output']) or '.', exist_ok=True)
+    _check_operator(timed('save', bpy.ops.wm.save_as_mainfile, filepath=job['output']), 'save_as_mainfile')
+    return timings
+
+
+def worker_main(args):
+    job = json.loads(args.worker_job)
+    result = {'name': job['name'], 'ok': False, 'timings': {}, 'error': None}
+    try:
+        result['timings'] = run_worker_job(job, args.addon_module)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False), flush=True)
+    return 0 if result['ok'] else 1
+
+
+# ---------------------------------------------------------------------------
+# 主进程: 调度Blender子进程池
+# ---------------------------------------------------------------------------
+
+def default_blender_path():
+    try:
+        import bpy
+        return bpy.app.binary_path
+    except ImportError:
+        return 'blender'
+
+
+def run_job_subprocess(job, args):
+    command = [
+        args.blender, '-b', '--python', os.path.realpath(__file__), '--',
+        '--worker-job', json.dumps(job, ensure_ascii=False),
+        '--addon-module', args.addon_module,
+    ]
+    start = time.perf_counter()
+    result = {'name': job['name'], 'ok': False, 'timings': {}, 'error': None}
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, encoding='utf-8',
+                              errors='replace', timeout=args.timeout)
+        output = proc.stdout + proc.stderr
+        for line in proc.stdout.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                result = json.loads(line[len(RESULT_PREFIX):])
+                break
+        else:
+            result['error'] = f'子进程退出码 {proc.returncode}，未返回结果'
+    except subprocess.TimeoutExpired as e:
+        output = (e.stdout or '') if isinstance(e.stdout, str) else ''
+        result['error'] = f'超时 ({args.timeout}s)'
+    result['wall_time'] = time.perf_counter() - start
+    result['output'] = job['output']
+
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+        with open(os.path.join(args.log_dir, f'{job["name"]}.log'), 'w', encoding='utf-8') as file:
+            file.write(output)
+    return result
+
+
+def coordinator_main(args):
+    if not args.manifest:
+        print('必须指定 --manifest')
+        return 2
+    if args.blender is None:
+        args.blender = default_blender_path()
+
+    jobs = load_manifest(args.manifest, args.postprocess)
+    workers = max(1, min(args.workers, len(jobs) or 1))
+    print(f'共 {len(jobs)} 个任务，使用 {workers} 个Blender进程')
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job_subprocess, job, args) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = 'OK  ' if result['ok'] else 'FAIL'
+            print(f'[{status}] {result["name"]}  {result["wall_time"]:.1f}s'
+                  + (f'  {result["error"]}' if result['error'] else ''), flush=True)
+    total_time = time.perf_counter() - start
+
+    failed = [r for r in results if not r['ok']]
+    print(f'完成: {len(results) - len(failed)} 成功, {len(failed)} 失败, 总耗时 {total_time:.1f}s')
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump({'total_time': total_time, 'workers': workers, 'jobs': results},
+                      file, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+def main(argv):
+    args = parse_args(script_args(argv))
+    if args.worker_job is not None:
+        return worker_main(args)
+    return coordinator_main(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
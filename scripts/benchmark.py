@@ -0,0 +1,463 @@
+"""在无界面Blender中对插件各操作做基准测试
+
+用法:
+    blender -b --factory-startup --python scripts/benchmark.py -- --scenario small --scenario large \
+        --repeat 3 --output results.json --compare baseline.json
+
+每个场景会生成合成的MMD模型（根对象、骨骼、带材质槽的mesh、子物体）和合成的角色材质目录
+（指定尺寸的PNG贴图、描边json、额外的json和无关文件），然后依次计时:
+    set_material_directory, apply_shader_to_mmd_model, apply_shader_to_mmd_model (重新应用),
+    apply_light_and_outline, apply_postprocess
+
+结果以表格输出，并可保存为json，用 --compare 与另一次提交的结果对比。
+没有启用mmd_tools时会注册最小的 mmd_type / mmd_root 属性，使合成模型能被插件识别。
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# 场景预设，命令行参数可以覆盖其中的任意一项
+SCENARIOS = {
+    'small': {
+        'characters': 1, 'meshes': 4, 'slots': 4, 'children': 8, 'bones': 64,
+        'texture_size': 512, 'json_dumps': 8, 'noise_files': 20,
+    },
+    'medium': {
+        'characters': 3, 'meshes': 16, 'slots': 8, 'children': 64, 'bones': 256,
+        'texture_size': 1024, 'json_dumps': 32, 'noise_files': 200,
+    },
+    'large': {
+        'characters': 8, 'meshes': 48, 'slots': 12, 'children': 256, 'bones': 512,
+        'texture_size': 2048, 'json_dumps': 128, 'noise_files': 2000,
+    },
+}
+
+# 合成材质使用的贴图名称关键词，覆盖脸/头发/身体/服装/眼睛/排除/无法识别
+MATERIAL_KEYWORDS = ['颜', '髪', '体', '服', '目', 'mask', 'misc']
+
+SHADOW_RAMP_SIZE = (256, 20)
+MESH_RESOLUTION = 16
+
+OPERATORS = [
+    'set_material_directory',
+    'apply_shader_to_mmd_model',
+    'apply_shader_to_mmd_model (reapply)',
+    'apply_light_and_outline',
+    'apply_postprocess',
+]
+
+
+def script_args(argv):
+    """Blender会把 '--' 之后的参数留给脚本"""
+    if '--' in argv:
+        return argv[argv.index('--') + 1:]
+    return argv[1:]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='插件各操作的基准测试')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='要运行的场景预设，可以指定多次，默认small')
+    for key in SCENARIOS['small']:
+        parser.add_argument('--' + key.replace('_', '-'), type=int, default=None,
+                            help=f'覆盖场景预设中的 {key}')
+    parser.add_argument('--repeat', type=int, default=3, help='每个场景重复的次数')
+    parser.add_argument('--cold', action='store_true',
+                        help='每次重复前清空插件的目录索引、描边缓存和图片缓存')
+    parser.add_argument('--stages', action='store_true', help='同时记录各操作内部的阶段耗时')
+    parser.add_argument('--addon-module', default=os.path.basename(ADDON_DIR),
+                        help='插件模块名 (以扩展方式安装时形如 bl_ext.user_default.xxx)')
+    parser.add_argument('--mmd-tools-module', default='mmd_tools', help='mmd_tools插件模块名')
+    parser.add_argument('--workdir', default=None, help='生成合成材质目录的位置，默认使用临时目录')
+    parser.add_argument('--keep', action='store_true', help='保留生成的合成材质目录')
+    parser.add_argument('--output', default=None, help='结果json输出路径')
+    parser.add_argument('--compare', default=None, help='用于对比的基准结果json')
+    parser.add_argument('--fail-threshold', type=float, default=None,
+                        help='中位数比基准慢超过该百分比时以非零退出码结束')
+    return parser.parse_args(argv)
+
+
+def scenario_params(name, args):
+    params = dict(SCENARIOS[name])
+    for key in params:
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+    return params
+
+
+# ---------------------------------------------------------------------------
+# 合成角色材质目录
+# ---------------------------------------------------------------------------
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+
+def write_png(path, width, height, rgba):
+    """写入纯色的8位PNG，rgba只有3个分量时写入不带alpha通道的RGB PNG"""
+    row = b'\x00' + bytes(rgba) * width
+    header = struct.pack('>IIBBBBB', width, height, 8, 6 if len(rgba) == 4 else 2, 0, 0, 0)
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(_png_chunk(b'IHDR', header))
+        file.write(_png_chunk(b'IDAT', zlib.compress(row * height, 1)))
+        file.write(_png_chunk(b'IEND', b''))
+
+
+def outline_material_json(name, seed):
+    colors = {}
+    for i, prop in enumerate(('_OutlineColor', '_OutlineColor2', '_OutlineColor3', '_OutlineColor4', '_OutlineColor5')):
+        value = ((seed * 31 + i * 17) % 255) / 255
+        colors[prop] = {'r': value, 'g': 1 - value, 'b': value / 2, 'a': 1.0}
+    # 填充与真实解包文件相似的其它属性，使解析的数据量接近实际
+    floats = {f'_Float{i}': i / 100 for i in range(200)}
+    tex_envs = {f'_Tex{i}': {'m_Texture': {'m_FileID': 0, 'm_PathID': i}, 'm_Scale': {'x': 1, 'y': 1}}
+                for i in range(40)}
+    return {
+        'm_Name': name,
+        'm_Shader': {'m_FileID': 0, 'm_PathID': seed},
+        'm_SavedProperties': {'m_TexEnvs': tex_envs, 'm_Floats': floats, 'm_Colors': colors},
+    }
+
+
+def generate_material_directory(directory, prefix, seed, params, asset_index):
+    materials_directory = os.path.join(directory, 'Materials')
+    os.makedirs(materials_directory, exist_ok=True)
+
+    size = params['texture_size']
+    for i, suffix in enumerate(asset_index.REQUIRED_MAT_FILES):
+        width, height = SHADOW_RAMP_SIZE if 'Shadow_Ramp' in suffix else (size, size)
+        rgba = ((seed * 37 + i * 11) % 256, (seed * 13 + i) % 256, i * 30 % 256, 255)
+        write_png(os.path.join(directory, prefix + suffix), width, height, rgba)
+
+    for i, suffix in enumerate(asset_index.REQUIRED_OUTLINE_FILES + asset_index.OPTIONAL_OUTLINE_FILES[:1]):
+        with open(os.path.join(materials_directory, prefix + suffix), 'w', encoding='utf-8') as file:
+            json.dump(outline_material_json(prefix + suffix, seed + i), file, indent=2)
+
+    for i in range(params['json_dumps']):
+        with open(os.path.join(materials_directory, f'{prefix}_Mat_Extra{i}.json'), 'w', encoding='utf-8') as file:
+            json.dump(outline_material_json(f'{prefix}_Mat_Extra{i}', seed + i), file, indent=2)
+
+    for i in range(params['noise_files']):
+        name = f'{prefix}_Tex_Effect{i}.png' if i % 2 else f'noise_{i}.txt'
+        with open(os.path.join(directory, name), 'wb') as file:
+            file.write(b'noise')
+
+
+def prepare_material_directories(workdir, scenario_name, params, asset_index):
+    """生成场景的角色材质目录，参数未变化时复用之前生成的目录"""
+    signature = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    scenario_directory = os.path.join(workdir, f'{scenario_name}_{signature}')
+    directories = [os.path.join(scenario_directory, f'Bench{i}') for i in range(params['characters'])]
+    marker = os.path.join(scenario_directory, '.complete')
+    if os.path.exists(marker):
+        return directories
+
+    shutil.rmtree(scenario_directory, ignore_errors=True)
+    for i, directory in enumerate(directories):
+        generate_material_directory(directory, f'Avatar_Bench{i}', i, params, asset_index)
+    with open(marker, 'w', encoding='utf-8') as file:
+        file.write(signature)
+    return directories
+
+
+def clear_sidecar_files(directories, outline_info):
+    for directory in directories:
+        path = outline_info.sidecar_path(os.path.join(directory, 'Materials'))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# ---------------------------------------------------------------------------
+# 合成MMD模型
+# ---------------------------------------------------------------------------
+
+def ensure_mmd_properties(bpy, mmd_tools_module):
+    import addon_utils
+
+    if not hasattr(bpy.types.Object, 'mmd_type'):
+        try:
+            addon_utils.enable(mmd_tools_module, default_set=True)
+        except Exception:
+            pass
+    if hasattr(bpy.types.Object, 'mmd_type'):
+        return
+
+    class BOBH_BenchMMDRoot(bpy.types.PropertyGroup):
+        name: bpy.props.StringProperty() # type: ignore
+        name_e: bpy.props.StringProperty() # type: ignore
+
+    bpy.utils.register_class(BOBH_BenchMMDRoot)
+    bpy.types.Object.mmd_type = bpy.props.StringProperty(default='NONE')
+    bpy.types.Object.mmd_root = bpy.props.PointerProperty(type=BOBH_BenchMMDRoot)
+    print('未找到mmd_tools，使用最小的mmd_type/mmd_root属性')
+
+
+def grid_mesh(bpy, name, slots):
+    resolution = MESH_RESOLUTION
+    vertices = [(x / resolution, 0.0, y / resolution) for y in range(resolution + 1) for x in range(resolution + 1)]
+    faces = []
+    for y in range(resolution):
+        for x in range(resolution):
+            i = y * (resolution + 1) + x
+            faces.append((i, i + 1, i + resolution + 2, i + resolution + 1))
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(vertices, [], faces)
+    mesh.polygons.foreach_set('material_index', [i % slots for i in range(len(faces))])
+    return mesh
+
+
+def mmd_material(bpy, name, image):
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    texture_node = material.node_tree.nodes.new('ShaderNodeTexImage')
+    texture_node.name = 'mmd_base_tex'
+    texture_node.image = image
+    return material
+
+
+def build_character(bpy, index, params):
+    """创建一个与mmd_tools导入结果结构相似的模型，返回 (根对象, 主mesh)"""
+    scene = bpy.context.scene
+    model_name = f'Bench{index}'
+    collection = bpy.data.collections.new(model_name)
+    scene.collection.children.link(collection)
+
+    root = bpy.data.objects.new(model_name, None)
+    root.mmd_type = 'ROOT'
+    root.mmd_root.name = model_name
+    root.mmd_root.name_e = f'{model_name}_e'
+    root.location = (index * 2.0, 0.0, 0.0)
+    collection.objects.link(root)
+
+    armature = bpy.data.objects.new(f'{model_name}_arm', bpy.data.armatures.new(f'{model_name}_arm'))
+    armature.parent = root
+    collection.objects.link(armature)
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+    for i in range(max(1, params['bones'])):
+        bone = armature.data.edit_bones.new('頭' if i == 0 else f'bone_{i}')
+        bone.head = (0.0, 0.0, 1.3 + i * 0.001)
+        bone.tail = (0.0, 0.05, 1.3 + i * 0.001)
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    images = {
+        keyword: bpy.data.images.new(f'{keyword}_{model_name}.png', 4, 4)
+        for keyword in MATERIAL_KEYWORDS
+    }
+    meshes = []
+    for m in range(params['meshes']):
+        mesh_obj = bpy.data.objects.new(f'{model_name}_mesh{m}', grid_mesh(bpy, f'{model_name}_mesh{m}', params['slots']))
+        mesh_obj.parent = armature
+        collection.objects.link(mesh_obj)
+        for s in range(params['slots']):
+            keyword = MATERIAL_KEYWORDS[(m * params['slots'] + s) % len(MATERIAL_KEYWORDS)]
+            mesh_obj.data.materials.append(mmd_material(bpy, f'{model_name}_{keyword}_{m}_{s}', images[keyword]))
+        meshes.append(mesh_obj)
+
+    for c in range(params['children']):
+        child = bpy.data.objects.new(f'{model_name}_child{c}', None)
+        child.parent = meshes[c % len(meshes)] if meshes else armature
+        collection.objects.link(child)
+
+    return root, meshes[0] if meshes else None
+
+
+# ---------------------------------------------------------------------------
+# 计时
+# ---------------------------------------------------------------------------
+
+def select_only(bpy, objects):
+    for other in bpy.context.view_layer.objects:
+        other.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    bpy.context.view_layer.objects.active = objects[0]
+
+
+def run_operator(name, func, **kwargs):
+    start = time.perf_counter()
+    result = func(**kwargs)
+    duration = time.perf_counter() - start
+    if 'FINISHED' not in result:
+        raise RuntimeError(f'{name} 执行失败: {result}')
+    return duration
+
+
+def run_once(bpy, params, directories, stage_timer):
+    bpy.ops.wm.read_homefile(use_empty=True)
+    characters = [build_character(bpy, i, params) for i in range(params['characters'])]
+    meshes = [mesh_obj for _, mesh_obj in characters]
+
+    timings = {name: 0.0 for name in OPERATORS}
+    stages = {}
+
+    def record(name, duration):
+        timings[name] += duration
+        last_run = stage_timer.get_last_run() if stage_timer else None
+        if last_run is not None:
+            stages.setdefault(name, []).append(last_run['stages'])
+
+    for mesh_obj, directory in zip(meshes, directories):
+        select_only(bpy, [mesh_obj])
+        record('set_material_directory', run_operator(
+            'set_material_directory', bpy.ops.bobh.set_material_directory, directory=directory))
+
+    select_only(bpy, meshes)
+    record('apply_shader_to_mmd_model', run_operator(
+        'apply_shader_to_mmd_model', bpy.ops.bobh.apply_shader_to_mmd_model, apply_all_selected=True))
+    record('apply_shader_to_mmd_model (reapply)', run_operator(
+        'apply_shader_to_mmd_model', bpy.ops.bobh.apply_shader_to_mmd_model, apply_all_selected=True))
+
+    for mesh_obj in meshes:
+        select_only(bpy, [mesh_obj])
+        record('apply_light_and_outline', run_operator(
+            'apply_light_and_outline', bpy.ops.bobh.apply_light_and_outline))
+
+    record('apply_postprocess', run_operator('apply_postprocess', bpy.ops.bobh.apply_postprocess))
+    return timings, stages
+
+
+def run_scenario(bpy, name, params, args, workdir, modules):
+    directories = prepare_material_directories(workdir, name, params, modules['character_asset_index'])
+    result = {'params': params, 'operators': {}, 'stages': {}, 'error': None}
+    runs = []
+    try:
+        for _ in range(args.repeat):
+            if args.cold:
+                modules['character_asset_index'].CharacterAssetIndex.invalidate()
+                modules['outline_info'].OutlineSidecarCache.invalidate()
+                modules['image_cache'].clear_cache()
+                clear_sidecar_files(directories, modules['outline_info'])
+            timings, stages = run_once(bpy, params, directories, modules['stage_timer'] if args.stages else None)
+            runs.append(timings)
+            for op_name, op_stages in stages.items():
+                result['stages'].setdefault(op_name, []).extend(op_stages)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+
+    for op_name in OPERATORS:
+        times = [run[op_name] for run in runs]
+        if times:
+            result['operators'][op_name] = {
+                'times': times,
+                'median': statistics.median(times),
+                'min': min(times),
+                'max': max(times),
+            }
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 结果
+# ---------------------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.run(['git', '-C', ADDON_DIR, 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    header = f'{"scenario":<10} {"operator":<38} {"median ms":>10} {"min ms":>10} {"max ms":>10}'
+    if baseline is not None:
+        header += f' {"base ms":>10} {"delta":>8}'
+    print(header)
+    print('-' * len(header))
+    regressions = []
+    for scenario_name, scenario in results['scenarios'].items():
+        for op_name, stats in scenario['operators'].items():
+            line = (f'{scenario_name:<10} {op_name:<38} {stats["median"] * 1000:>10.1f}'
+                    f' {stats["min"] * 1000:>10.1f} {stats["max"] * 1000:>10.1f}')
+            if baseline is not None:
+                base = baseline.get('scenarios', {}).get(scenario_name, {}).get('operators', {}).get(op_name)
+                if base:
+                    delta = (stats['median'] - base['median']) / base['median'] * 100 if base['median'] else 0.0
+                    line += f' {base["median"] * 1000:>10.1f} {delta:>+7.1f}%'
+                    regressions.append((scenario_name, op_name, delta))
+                else:
+                    line += f' {"-":>10} {"-":>8}'
+            print(line)
+        if scenario['error']:
+            print(f'{scenario_name:<10} 出错: {scenario["error"]}')
+    return regressions
+
+
+def main(argv):
+    args = parse_args(script_args(argv))
+    import bpy
+    import addon_utils
+
+    if args.stages:
+        os.environ['BOBH_STAGE_TIMING'] = '1'
+        os.environ.setdefault('BOBH_STAGE_TIMING_LOG', os.path.join(tempfile.gettempdir(), 'bobh_benchmark_stages.jsonl'))
+
+    if os.path.dirname(ADDON_DIR) not in sys.path:
+        sys.path.append(os.path.dirname(ADDON_DIR))
+    ensure_mmd_properties(bpy, args.mmd_tools_module)
+    if args.addon_module not in bpy.context.preferences.addons:
+        addon_utils.enable(args.addon_module, default_set=True)
+    modules = {
+        name: importlib.import_module(f'{args.addon_module}.utils.{name}')
+        for name in ('character_asset_index', 'outline_info', 'image_cache', 'stage_timer')
+    }
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bobh_benchmark_')
+    os.makedirs(workdir, exist_ok=True)
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'blender': bpy.app.version_string,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'repeat': args.repeat,
+            'cold': args.cold,
+        },
+        'scenarios': {},
+    }
+    try:
+        for name in args.scenario or ['small']:
+            params = scenario_params(name, args)
+            print(f'运行场景 {name}: {params}', flush=True)
+            results['scenarios'][name] = run_scenario(bpy, name, params, args, workdir, modules)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        print(f'对比基准: {args.compare} (revision {baseline.get("meta", {}).get("revision")})')
+    regressions = print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    if any(scenario['error'] for scenario in results['scenarios'].values()):
+        return 1
+    if args.fail_threshold is not None and any(delta > args.fail_threshold for _, _, delta in regressions):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,231 @@
+"""在普通CPython中使用bpy替身运行插件逻辑的微基准
+
+用法:
+    python scripts/microbench.py [--meshes 16 --slots 8 --number 200 --filter outline]
+
+不需要Blender。通过 scripts/standin 下的 bpy/mathutils 替身导入插件模块，
+先检查一遍各函数的结果（目录校验、描边颜色解析、材质识别与替换），再分别计时:
+    validate_path, check_texture_headers, read_character_outline_info, replace_mmd_material_with_shader
+缓存相关的函数分别计时冷启动（清空缓存）和缓存命中两种情况。
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.realpath(__file__))
+ADDON_DIR = os.path.dirname(SCRIPTS_DIR)
+
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, 'standin'))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import bpy  # noqa: E402  bpy替身
+from benchmark import SCENARIOS, MATERIAL_KEYWORDS, build_character, generate_material_directory, write_png  # noqa: E402
+
+
+def import_addon():
+    """以插件目录名作为包名导入插件（与Blender加载插件的方式一致）"""
+    name = os.path.basename(ADDON_DIR)
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(ADDON_DIR, '__init__.py'), submodule_search_locations=[ADDON_DIR]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def addon_module(addon, path):
+    return importlib.import_module(f'{addon.__name__}.{path}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='使用bpy替身的插件微基准')
+    params = SCENARIOS['small']
+    parser.add_argument('--meshes', type=int, default=params['meshes'])
+    parser.add_argument('--slots', type=int, default=params['slots'])
+    parser.add_argument('--children', type=int, default=params['children'])
+    parser.add_argument('--bones', type=int, default=params['bones'])
+    parser.add_argument('--texture-size', type=int, default=64, help='合成贴图的尺寸（微基准不解码贴图）')
+    parser.add_argument('--json-dumps', type=int, default=params['json_dumps'])
+    parser.add_argument('--noise-files', type=int, default=params['noise_files'])
+    parser.add_argument('--number', type=int, default=100, help='每轮调用的次数')
+    parser.add_argument('--repeat', type=int, default=5, help='计时的轮数')
+    parser.add_argument('--filter', default=None, help='只运行名称包含该字符串的基准')
+    return parser.parse_args(argv)
+
+
+def timeit(func, setup=None, number=100, repeat=5):
+    """返回每次调用耗时（秒）的列表，setup在每次调用前执行且不计时"""
+    per_call = []
+    for _ in range(repeat):
+        total = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            total += time.perf_counter() - start
+        per_call.append(total / number)
+    return per_call
+
+
+class Fixture:
+    """合成的角色材质目录和替身场景"""
+
+    def __init__(self, addon, args):
+        self.addon = addon
+        self.args = args
+        self.asset_index = addon_module(addon, 'utils.character_asset_index')
+        self.outline_info = addon_module(addon, 'utils.outline_info')
+        self.mmd_model_index = addon_module(addon, 'utils.mmd_model_index')
+        self.character_state = addon_module(addon, 'utils.character_state')
+        self.texture_preflight = addon_module(addon, 'utils.texture_preflight')
+        self.set_directory_module = addon_module(addon, 'operators.set_character_material_directory')
+        self.apply_shader_module = addon_module(addon, 'operators.apply_shader_to_mmd_mode')
+
+        self.workdir = tempfile.mkdtemp(prefix='bobh_microbench_')
+        self.directory = os.path.join(self.workdir, 'Bench0')
+        params = {
+            'texture_size': args.texture_size,
+            'json_dumps': args.json_dumps,
+            'noise_files': args.noise_files,
+        }
+        generate_material_directory(self.directory, 'Avatar_Bench0', 0, params, self.asset_index)
+        self.build_scene()
+
+    def build_scene(self):
+        bpy.reset()
+        params = {
+            'meshes': self.args.meshes,
+            'slots': self.args.slots,
+            'children': self.args.children,
+            'bones': self.args.bones,
+        }
+        self.root, _ = build_character(bpy, 0, params)
+        model_name = self.character_state.get_model_name(self.root)
+        self.material_map = {}
+        for role in self.character_state.MATERIAL_ROLES:
+            material = bpy.data.materials.new(self.character_state.default_material_name(model_name, role))
+            self.character_state.tag_character_material(material, model_name, role)
+            self.material_map[role] = material.name
+        self.meshes = self.mmd_model_index.MMDModelIndex.get(self.root).meshes
+        self.original_materials = [list(mesh_obj.data.materials) for mesh_obj in self.meshes]
+
+    def restore_materials(self):
+        for mesh_obj, materials in zip(self.meshes, self.original_materials):
+            mesh_obj.data.materials[:] = materials
+
+    def clear_directory_caches(self):
+        self.asset_index.CharacterAssetIndex.invalidate()
+        self.outline_info.OutlineSidecarCache.invalidate()
+        sidecar = self.outline_info.sidecar_path(os.path.join(self.directory, 'Materials'))
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+
+    def set_directory_operator(self):
+        return self.set_directory_module.BOBH_OT_set_character_material_directory()
+
+    def apply_shader_operator(self):
+        operator = self.apply_shader_module.BOBH_OT_apply_shader_to_mmd_model()
+        operator._meterial_name_map = self.material_map
+        return operator
+
+    def expected_replaced_slots(self):
+        recognized = {'颜', '髪', '体', '服', '目'}
+        return sum(
+            1 for m in range(self.args.meshes) for s in range(self.args.slots)
+            if MATERIAL_KEYWORDS[(m * self.args.slots + s) % len(MATERIAL_KEYWORDS)] in recognized
+        )
+
+    def close(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def check(fixture):
+    """确认替身环境下各函数的结果正确，再开始计时"""
+    operator = fixture.set_directory_operator()
+    operator.validate_path(fixture.directory)
+
+    # 文件头不符合用途的贴图在校验目录时就被拒绝
+    index = fixture.asset_index.CharacterAssetIndex.get(fixture.directory)
+    lightmap = index.texture_path('_Hair_Lightmap.png')
+    with open(lightmap, 'rb') as file:
+        original = file.read()
+    try:
+        write_png(lightmap, 4, 4, (0, 0, 0))
+        problems = fixture.texture_preflight.check_texture_headers(index, fixture.asset_index.REQUIRED_MAT_FILES)
+        assert len(problems) == 1 and 'alpha' in problems[0], problems
+    finally:
+        with open(lightmap, 'wb') as file:
+            file.write(original)
+
+    fixture.clear_directory_caches()
+    operator = fixture.apply_shader_operator()
+    outline_info = operator.read_character_outline_info(fixture.directory)
+    assert set(outline_info) == {'BodyOutline', 'FaceOutline', 'HairOutline', 'DressOutline'}, outline_info
+    assert outline_info['BodyOutline']['Color1'] == {'r': 0.0, 'g': 1.0, 'b': 0.0, 'a': 1.0}
+
+    fixture.restore_materials()
+    summary = operator.replace_mmd_material_with_shader(fixture.root)
+    assert summary['replaced_slots'] == fixture.expected_replaced_slots(), summary
+    assert summary['meshes'] == fixture.args.meshes, summary
+    assert all('mask' in name for name in summary['excluded']), summary
+    assert all('misc' in name for name in summary['unrecognized']), summary
+    fixture.restore_materials()
+
+
+def benchmarks(fixture):
+    directory_operator = fixture.set_directory_operator()
+    shader_operator = fixture.apply_shader_operator()
+    index_class = fixture.mmd_model_index.MMDModelIndex
+
+    def replace():
+        shader_operator.replace_mmd_material_with_shader(fixture.root)
+
+    def cold_replace_setup():
+        fixture.restore_materials()
+        index_class.invalidate()
+
+    return [
+        ('validate_path (cold)', lambda: directory_operator.validate_path(fixture.directory),
+         fixture.asset_index.CharacterAssetIndex.invalidate),
+        ('validate_path (warm)', lambda: directory_operator.validate_path(fixture.directory), None),
+        ('check_texture_headers', lambda: fixture.texture_preflight.check_texture_headers(
+            fixture.asset_index.CharacterAssetIndex.get(fixture.directory), fixture.asset_index.APPLY_TEXTURE_FILES
+        ), None),
+        ('read_character_outline_info (cold)', lambda: shader_operator.read_character_outline_info(fixture.directory),
+         fixture.clear_directory_caches),
+        ('read_character_outline_info (warm)', lambda: shader_operator.read_character_outline_info(fixture.directory),
+         None),
+        ('replace_mmd_material_with_shader (cold)', replace, cold_replace_setup),
+        ('replace_mmd_material_with_shader (warm)', replace, fixture.restore_materials),
+    ]
+
+
+def main(argv):
+    args = parse_args(argv)
+    addon = import_addon()
+    fixture = Fixture(addon, args)
+    try:
+        check(fixture)
+        print(f'{"benchmark":<42} {"median us":>10} {"min us":>10}')
+        print('-' * 64)
+        for name, func, setup in benchmarks(fixture):
+            if args.filter and args.filter not in name:
+                continue
+            per_call = timeit(func, setup, args.number, args.repeat)
+            print(f'{name:<42} {statistics.median(per_call) * 1e6:>10.1f} {min(per_call) * 1e6:>10.1f}')
+    finally:
+        fixture.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,925 @@
+"""纯Python的最小bpy替身
+
+只实现插件模块会用到的一小部分API，使这些模块可以在普通的CPython中导入和运行，
+用于单元测试和微基准（见 scripts/microbench.py）。不会执行任何真正的Blender操作:
+    - bpy.data 的各数据块集合（按名称查找、重名时自动加 .001 后缀）
+    - 带节点树的材质、带父级和材质槽的物体、集合
+    - bpy.data.libraries.load 只记录调用，并按 register_library 注册的名称清单"导入"数据块
+    - bpy.props/bpy.types/bpy.utils 只保证类定义和注册调用能够执行
+
+用法:
+    sys.path.insert(0, 'scripts/standin')
+    import bpy
+    bpy.reset()  # 每个测试前清空数据
+"""
+import os
+import sys
+import tempfile
+import types as _module_types
+from contextlib import contextmanager
+from mathutils import Matrix
+
+
+# ---------------------------------------------------------------------------
+# 数据块
+# ---------------------------------------------------------------------------
+
+class ID:
+    def __init__(self, name=''):
+        self._name = name
+        self._collection = None
+        self._props = {}
+        self.library = None
+        self.use_fake_user = False
+        self.users = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if self._collection is not None:
+            self._collection._rename(self, value)
+        else:
+            self._name = value
+
+    @property
+    def name_full(self):
+        return self._name if self.library is None else f'{self._name} [{self.library}]'
+
+    # 自定义属性
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        self._props[key] = value
+
+    def __delitem__(self, key):
+        del self._props[key]
+
+    def __contains__(self, key):
+        return key in self._props
+
+    def get(self, key, default=None):
+        return self._props.get(key, default)
+
+    def copy(self):
+        duplicate = self._copy_data()
+        duplicate._props = dict(self._props)
+        if self._collection is not None:
+            self._collection._add(duplicate, self._name)
+        return duplicate
+
+    def _copy_data(self):
+        return type(self)(self._name)
+
+    def make_local(self):
+        self.library = None
+        return self
+
+    def as_pointer(self):
+        return id(self)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self._name!r}>'
+
+
+class Socket:
+    def __init__(self, name, default_value=None, socket_type='VALUE', identifier=None):
+        self.name = name
+        self.identifier = identifier or name
+        self.type = socket_type
+        self.default_value = default_value
+        self.links = []
+
+    @property
+    def is_linked(self):
+        return bool(self.links)
+
+
+class Sockets(list):
+    def get(self, name):
+        for socket in self:
+            if socket.name == name:
+                return socket
+        return None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            socket = self.get(key)
+            if socket is None:
+                raise KeyError(key)
+            return socket
+        return list.__getitem__(self, key)
+
+    def new(self, name, default_value=None, socket_type='VALUE', identifier=None):
+        socket = Socket(name, default_value, socket_type, identifier)
+        self.append(socket)
+        return socket
+
+
+_RGBA = (0.0, 0.0, 0.0, 1.0)
+
+# 节点类型名 -> (node.type, 属性默认值, 输入 [(名称, 标识符, 类型, 默认值)], 输出)
+_NODE_SPECS = {
+    'ShaderNodeTexImage': ('TEX_IMAGE', {'interpolation': 'Linear', 'projection': 'FLAT', 'extension': 'REPEAT'},
+                           [('Vector', None, 'VECTOR', None)],
+                           [('Color', None, 'RGBA', _RGBA), ('Alpha', None, 'VALUE', 1.0)]),
+    'ShaderNodeAttribute': ('ATTRIBUTE', {'attribute_type': 'GEOMETRY', 'attribute_name': ''}, [],
+                            [('Color', None, 'RGBA', _RGBA), ('Vector', None, 'VECTOR', None),
+                             ('Fac', None, 'VALUE', 0.0), ('Alpha', None, 'VALUE', 1.0)]),
+    'ShaderNodeMath': ('MATH', {'operation': 'ADD'},
+                       [('Value', 'Value', 'VALUE', 0.5), ('Value', 'Value_001', 'VALUE', 0.5),
+                        ('Value', 'Value_002', 'VALUE', 0.5)],
+                       [('Value', None, 'VALUE', 0.0)]),
+    'ShaderNodeMix': ('MIX', {'data_type': 'FLOAT'},
+                      [('Factor', 'Factor_Float', 'VALUE', 0.5),
+                       ('A', 'A_Float', 'VALUE', 0.0), ('B', 'B_Float', 'VALUE', 0.0),
+                       ('A', 'A_Color', 'RGBA', _RGBA), ('B', 'B_Color', 'RGBA', _RGBA)],
+                      [('Result', 'Result_Float', 'VALUE', 0.0), ('Result', 'Result_Color', 'RGBA', _RGBA)]),
+    'ShaderNodeRGB': ('RGB', {}, [], [('Color', None, 'RGBA', _RGBA)]),
+    'ShaderNodeGroup': ('GROUP', {}, [], []),
+}
+
+
+class Node:
+    def __init__(self, node_type, name):
+        spec = _NODE_SPECS.get(node_type)
+        self.type = spec[0] if spec is not None else node_type
+        self.bl_idname = node_type
+        self.name = name
+        self.label = ''
+        self.location = (0.0, 0.0)
+        self.inputs = Sockets()
+        self.outputs = Sockets()
+        self._image = None
+        self._node_tree = None
+        if spec is not None:
+            for attribute, value in spec[1].items():
+                setattr(self, attribute, value)
+            for sockets, definitions in ((self.inputs, spec[2]), (self.outputs, spec[3])):
+                for socket_name, identifier, socket_type, default_value in definitions:
+                    sockets.new(socket_name, default_value, socket_type, identifier)
+
+    # 图片和节点组按引用计数维护users
+    @property
+    def image(self):
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = _swap_user(self._image, image)
+
+    @property
+    def node_tree(self):
+        return self._node_tree
+
+    @node_tree.setter
+    def node_tree(self, node_tree):
+        self._node_tree = _swap_user(self._node_tree, node_tree)
+
+    def copy_into(self, nodes):
+        node = nodes.new(self.bl_idname)
+        node.__dict__.update({
+            key: value for key, value in self.__dict__.items()
+            if key not in ('inputs', 'outputs', '_image', '_node_tree')
+        })
+        node.node_tree = self.node_tree
+        node.image = self.image
+        node.inputs, node.outputs = Sockets(), Sockets()
+        for sockets, copied in ((self.inputs, node.inputs), (self.outputs, node.outputs)):
+            for socket in sockets:
+                copied.new(socket.name, socket.default_value, socket.type, socket.identifier)
+        return node
+
+
+def _swap_user(old, new):
+    if old is not None:
+        old.users -= 1
+    if new is not None:
+        new.users += 1
+    return new
+
+
+class Nodes(list):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            node = self.get(key)
+            if node is None:
+                raise KeyError(key)
+            return node
+        return list.__getitem__(self, key)
+
+    def new(self, node_type):
+        base = node_type
+        name = base
+        existing = {node.name for node in self}
+        i = 0
+        while name in existing:
+            i += 1
+            name = f'{base}.{i:03d}'
+        node = Node(node_type, name)
+        self.append(node)
+        return node
+
+    def get(self, name):
+        for node in self:
+            if node.name == name:
+                return node
+        return None
+
+    def clear(self):
+        for node in self:
+            node.image = None
+            node.node_tree = None
+        del self[:]
+
+
+class Links(list):
+    def new(self, output_socket, input_socket):
+        # 与Blender一致：连接到已有连接的输入时替换原来的连接
+        for link in list(input_socket.links):
+            self.remove(link)
+        link = _module_types.SimpleNamespace(from_socket=output_socket, to_socket=input_socket)
+        output_socket.links.append(link)
+        input_socket.links.append(link)
+        self.append(link)
+        return link
+
+    def remove(self, link):
+        link.from_socket.links.remove(link)
+        link.to_socket.links.remove(link)
+        list.remove(self, link)
+
+
+class NodeTree(ID):
+    def __init__(self, name='', tree_type='ShaderNodeTree'):
+        super().__init__(name)
+        self.bl_idname = tree_type
+        self.nodes = Nodes()
+        self.links = Links()
+        self.interface = _module_types.SimpleNamespace(items_tree=[])
+
+    def _copy_data(self):
+        tree = NodeTree(self._name, self.bl_idname)
+        copied = {}
+        for node in self.nodes:
+            copied[node] = node.copy_into(tree.nodes)
+        for link in self.links:
+            from_node, from_index = self._socket_position(link.from_socket, 'outputs')
+            to_node, to_index = self._socket_position(link.to_socket, 'inputs')
+            tree.links.new(copied[from_node].outputs[from_index], copied[to_node].inputs[to_index])
+        return tree
+
+    def _socket_position(self, socket, direction):
+        for node in self.nodes:
+            for index, candidate in enumerate(getattr(node, direction)):
+                if candidate is socket:
+                    return node, index
+        raise ValueError('socket不属于该节点树')
+
+
+class Material(ID):
+    def __init__(self, name=''):
+        super().__init__(name)
+        self._use_nodes = False
+        self.node_tree = None
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and self.node_tree is None:
+            self.node_tree = NodeTree('Shader Nodetree')
+
+    def _copy_data(self):
+        material = Material(self._name)
+        material._use_nodes = self._use_nodes
+        if self.node_tree is not None:
+            material.node_tree = self.node_tree._copy_data()
+        return material
+
+
+class Image(ID):
+    def __init__(self, name='', width=0, height=0, filepath=''):
+        super().__init__(name)
+        self.filepath = filepath
+        self.size = (width, height)
+        self.channels = 4
+        self.depth = 32
+        self.alpha_mode = 'STRAIGHT'
+        self.colorspace_settings = _module_types.SimpleNamespace(name='sRGB')
+        self.is_float = False
+        self.packed_file = None
+        # 只读取了文件路径的图片（bpy.data.images.load）还没有解码像素
+        self.has_data = bool(width and height)
+
+    def buffers_free(self):
+        pass
+
+
+class PropertyArray(list):
+    """支持 foreach_get/foreach_set 的元素列表"""
+
+    def foreach_get(self, attribute, buffer):
+        buffer[:] = [getattr(item, attribute) for item in self]
+
+    def foreach_set(self, attribute, values):
+        for item, value in zip(self, values):
+            setattr(item, attribute, value)
+
+
+class Mesh(ID):
+    def __init__(self, name=''):
+        super().__init__(name)
+        self.materials = []
+        self.vertices = PropertyArray()
+        self.polygons = PropertyArray()
+        self.loops = PropertyArray()
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices = PropertyArray(_module_types.SimpleNamespace(co=tuple(co)) for co in vertices)
+        self.polygons = PropertyArray(
+            _module_types.SimpleNamespace(vertices=tuple(face), material_index=0) for face in faces
+        )
+        self.loops = PropertyArray(
+            _module_types.SimpleNamespace(vertex_index=index) for face in faces for index in face
+        )
+
+    def _copy_data(self):
+        mesh = Mesh(self._name)
+        mesh.materials = list(self.materials)
+        mesh.vertices = PropertyArray(self.vertices)
+        mesh.polygons = PropertyArray(self.polygons)
+        mesh.loops = PropertyArray(self.loops)
+        return mesh
+
+
+class Bone:
+    def __init__(self, name):
+        self.name = name
+        self.head = (0.0, 0.0, 0.0)
+        self.tail = (0.0, 0.0, 1.0)
+
+
+class Bones(dict):
+    def new(self, name):
+        bone = Bone(name)
+        self[name] = bone
+        return bone
+
+    def __iter__(self):
+        return iter(self.values())
+
+
+class Armature(ID):
+    def __init__(self, name=''):
+        super().__init__(name)
+        self.bones = Bones()
+        # 替身中不区分编辑模式
+        self.edit_bones = self.bones
+
+
+class MaterialSlot:
+    def __init__(self, obj, index):
+        self._obj = obj
+        self._index = index
+
+    @property
+    def material(self):
+        return self._obj.data.materials[self._index]
+
+    @material.setter
+    def material(self, material):
+        self._obj.data.materials[self._index] = material
+
+
+class Modifier:
+    def __init__(self, name, modifier_type):
+        self.name = name
+        self.type = modifier_type
+        self.node_group = None
+        self._inputs = {}
+
+    def __getitem__(self, key):
+        return self._inputs[key]
+
+    def __setitem__(self, key, value):
+        self._inputs[key] = value
+
+
+class Modifiers(list):
+    def new(self, name, type):
+        modifier = Modifier(name, type)
+        self.append(modifier)
+        return modifier
+
+
+class Constraint:
+    def __init__(self, constraint_type):
+        self.type = constraint_type
+        self.target = None
+        self.subtarget = ''
+
+
+class Constraints(list):
+    def new(self, type):
+        constraint = Constraint(type)
+        self.append(constraint)
+        return constraint
+
+
+class MMDRoot:
+    def __init__(self):
+        self.name = ''
+        self.name_e = ''
+
+
+class Object(ID):
+    def __init__(self, name='', object_data=None):
+        super().__init__(name)
+        self.data = object_data
+        if object_data is None:
+            self.type = 'EMPTY'
+        elif isinstance(object_data, Mesh):
+            self.type = 'MESH'
+        elif isinstance(object_data, Armature):
+            self.type = 'ARMATURE'
+        else:
+            self.type = 'EMPTY'
+        self._parent = None
+        self._children = []
+        self.location = (0.0, 0.0, 0.0)
+        self.delta_location = (0.0, 0.0, 0.0)
+        self.delta_scale = (1.0, 1.0, 1.0)
+        self.matrix_local = Matrix.Identity(4)
+        self.hide_viewport = False
+        self.hide_render = False
+        self.empty_display_type = 'PLAIN_AXES'
+        self.empty_display_size = 1.0
+        self.modifiers = Modifiers()
+        self.constraints = Constraints()
+        self.mmd_type = 'NONE'
+        self.mmd_root = MMDRoot()
+        self.material_directory = ''
+        self._selected = False
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        if self._parent is not None:
+            self._parent._children.remove(self)
+        self._parent = parent
+        if parent is not None:
+            parent._children.append(self)
+
+    @property
+    def children(self):
+        return tuple(self._children)
+
+    @property
+    def matrix_world(self):
+        return Matrix.Translation(self.location)
+
+    @property
+    def material_slots(self):
+        if self.data is None or not hasattr(self.data, 'materials'):
+            return []
+        return [MaterialSlot(self, i) for i in range(len(self.data.materials))]
+
+    @property
+    def users_collection(self):
+        return tuple(collection for collection in _all_collections() if self in collection.objects)
+
+    def select_set(self, state):
+        self._selected = state
+
+    def select_get(self):
+        return self._selected
+
+    def _copy_data(self):
+        duplicate = Object(self._name, self.data)
+        duplicate.location = self.location
+        duplicate.hide_viewport = self.hide_viewport
+        duplicate.hide_render = self.hide_render
+        return duplicate
+
+
+class CollectionObjects:
+    def __init__(self):
+        self._objects = {}
+
+    def link(self, obj):
+        if obj in self._objects:
+            raise RuntimeError(f"Object '{obj.name}' already in collection")
+        self._objects[obj] = None
+
+    def unlink(self, obj):
+        del self._objects[obj]
+
+    def get(self, name):
+        for obj in self._objects:
+            if obj.name == name:
+                return obj
+        return None
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return self.get(item) is not None
+        return item in self._objects
+
+    def __iter__(self):
+        return iter(list(self._objects))
+
+    def __len__(self):
+        return len(self._objects)
+
+
+class CollectionChildren(CollectionObjects):
+    pass
+
+
+class Collection(ID):
+    def __init__(self, name=''):
+        super().__init__(name)
+        self.objects = CollectionObjects()
+        self.children = CollectionChildren()
+
+
+# ---------------------------------------------------------------------------
+# bpy.data
+# ---------------------------------------------------------------------------
+
+class BlendDataCollection:
+    """按名称索引的数据块集合，重名时与Blender一样加上 .001 后缀"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._items = {}
+
+    def _unique_name(self, name):
+        if name not in self._items:
+            return name
+        base = name
+        i = 0
+        while name in self._items:
+            i += 1
+            name = f'{base}.{i:03d}'
+        return name
+
+    def _add(self, datablock, name):
+        datablock._name = self._unique_name(name)
+        datablock._collection = self
+        self._items[datablock._name] = datablock
+        return datablock
+
+    def _rename(self, datablock, name):
+        if name == datablock._name:
+            return
+        del self._items[datablock._name]
+        datablock._name = self._unique_name(name)
+        self._items[datablock._name] = datablock
+
+    def new(self, name, *args, **kwargs):
+        return self._add(self._factory(name, *args, **kwargs), name)
+
+    def load(self, filepath, check_existing=False):
+        """仅用于图片，不会读取文件内容"""
+        if check_existing:
+            for image in self._items.values():
+                if image.filepath == filepath:
+                    return image
+        image = self._add(Image(os.path.basename(filepath), filepath=filepath), os.path.basename(filepath))
+        image.filepath = filepath
+        return image
+
+    def remove(self, datablock, do_unlink=True):
+        del self._items[datablock._name]
+        datablock._collection = None
+        if do_unlink:
+            for collection in _all_collections():
+                for members in (collection.objects, collection.children):
+                    if datablock in members:
+                        members.unlink(datablock)
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self._items.values())[key]
+        return self._items[key]
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        self._items.clear()
+
+
+class LibraryData:
+    def __init__(self, contents=None):
+        for category in BlendData.CATEGORIES:
+            setattr(self, category, list((contents or {}).get(category, ())))
+
+
+class Libraries(BlendDataCollection):
+    def __init__(self):
+        super().__init__(ID)
+        # blend文件路径 -> {类型: [名称]}
+        self.contents = {}
+        # 每次load调用的记录: (路径, link, {类型: [名称]})
+        self.load_calls = []
+
+    @contextmanager
+    def load(self, filepath, link=False, relative=False):
+        data_from = LibraryData(self.contents.get(os.path.normcase(os.path.abspath(filepath))))
+        data_to = LibraryData()
+        yield data_from, data_to
+
+        requested = {}
+        for category in BlendData.CATEGORIES:
+            names = list(getattr(data_to, category))
+            if not names:
+                continue
+            requested[category] = names
+            available = set(getattr(data_from, category))
+            collection = getattr(data, category)
+            loaded = []
+            for name in names:
+                if name not in available:
+                    loaded.append(None)
+                    continue
+                datablock = collection.new(name)
+                if link:
+                    datablock.library = filepath
+                loaded.append(datablock)
+            setattr(data_to, category, loaded)
+        self.load_calls.append((filepath, link, requested))
+
+
+def register_library(filepath, contents):
+    """注册替身库文件中的数据块名称: {类型: [名称]}，供 bpy.data.libraries.load 使用"""
+    data.libraries.contents[os.path.normcase(os.path.abspath(filepath))] = contents
+
+
+class BlendData:
+    CATEGORIES = ('materials', 'node_groups', 'objects', 'images', 'meshes', 'collections')
+
+    def __init__(self):
+        self.filepath = ''
+        self.objects = BlendDataCollection(Object)
+        self.meshes = BlendDataCollection(Mesh)
+        self.materials = BlendDataCollection(Material)
+        self.node_groups = BlendDataCollection(NodeTree)
+        self.images = BlendDataCollection(Image)
+        self.collections = BlendDataCollection(Collection)
+        self.armatures = BlendDataCollection(Armature)
+        self.libraries = Libraries()
+
+
+def _all_collections():
+    yield context.scene.collection
+    yield from data.collections
+
+
+# ---------------------------------------------------------------------------
+# bpy.context
+# ---------------------------------------------------------------------------
+
+class LayerObjects:
+    def __init__(self):
+        self.active = None
+
+    def __iter__(self):
+        return iter(context.scene.objects)
+
+
+class Scene(ID):
+    def __init__(self, name='Scene'):
+        super().__init__(name)
+        self.collection = Collection('Scene Collection')
+        self.material_directory = ''
+        self.view_settings = _module_types.SimpleNamespace(view_transform='Filmic')
+        self.use_nodes = False
+        self.node_tree = NodeTree('Compositing', 'CompositorNodeTree')
+        self.render = _module_types.SimpleNamespace(engine='BLENDER_EEVEE', use_lock_interface=False)
+
+    @property
+    def objects(self):
+        seen = {}
+        stack = [self.collection]
+        while stack:
+            collection = stack.pop()
+            for obj in collection.objects:
+                seen[obj] = None
+            stack.extend(collection.children)
+        return list(seen)
+
+
+class Context:
+    def __init__(self):
+        self.scene = Scene()
+        self.view_layer = _module_types.SimpleNamespace(objects=LayerObjects())
+        self.preferences = _module_types.SimpleNamespace(addons={})
+        self.window_manager = _module_types.SimpleNamespace()
+        self.area = None
+
+    @property
+    def active_object(self):
+        return self.view_layer.objects.active
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in self.scene.objects if obj.select_get()]
+
+    def evaluated_depsgraph_get(self):
+        # 替身不求值修改器，只有没有描边修改器的统计可以在替身中运行
+        return None
+
+
+# ---------------------------------------------------------------------------
+# bpy.props / bpy.types / bpy.utils / bpy.path / bpy.app
+# ---------------------------------------------------------------------------
+
+class _Property:
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        self.keywords = kwargs
+        self.default = kwargs.get('default')
+
+
+def _property_factory(kind):
+    def factory(**kwargs):
+        return _Property(kind, **kwargs)
+    factory.__name__ = kind
+    return factory
+
+
+props = _module_types.ModuleType('bpy.props')
+for _kind in ('BoolProperty', 'IntProperty', 'FloatProperty', 'StringProperty', 'EnumProperty',
+              'PointerProperty', 'CollectionProperty', 'FloatVectorProperty'):
+    setattr(props, _kind, _property_factory(_kind))
+
+
+class _RNAStruct:
+    def __init__(self, *args, **kwargs):
+        # 按类注解中的属性定义设置默认值
+        for cls in reversed(type(self).__mro__):
+            for name, value in getattr(cls, '__annotations__', {}).items():
+                if isinstance(value, _Property):
+                    setattr(self, name, value.default)
+
+
+class Operator(_RNAStruct):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.reports = []
+
+    def report(self, level, message):
+        self.reports.append((next(iter(level)), message))
+
+
+types = _module_types.ModuleType('bpy.types')
+types.ID = ID
+types.Object = Object
+types.Material = Material
+types.Image = Image
+types.Mesh = Mesh
+types.NodeTree = NodeTree
+types.Node = Node
+types.Collection = Collection
+types.Scene = Scene
+types.Operator = Operator
+types.Panel = _RNAStruct
+types.AddonPreferences = _RNAStruct
+types.PropertyGroup = _RNAStruct
+
+
+def _types_getattr(name):
+    # 其余类型（例如节点类型）只用于导入和isinstance，按需创建占位类
+    placeholder = type(name, (_RNAStruct,), {})
+    setattr(types, name, placeholder)
+    return placeholder
+
+
+types.__getattr__ = _types_getattr
+
+
+utils = _module_types.ModuleType('bpy.utils')
+utils.registered_classes = []
+
+
+def _register_class(cls):
+    utils.registered_classes.append(cls)
+
+
+def _unregister_class(cls):
+    if cls in utils.registered_classes:
+        utils.registered_classes.remove(cls)
+
+
+def _user_resource(resource_type, path='', create=False):
+    directory = os.path.join(tempfile.gettempdir(), 'bpy_standin', resource_type.lower(), path)
+    if create:
+        os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+utils.register_class = _register_class
+utils.unregister_class = _unregister_class
+utils.user_resource = _user_resource
+
+
+path = _module_types.ModuleType('bpy.path')
+
+
+def _abspath(filepath, start=None):
+    if filepath.startswith('//'):
+        base = start or os.path.dirname(data.filepath) or os.getcwd()
+        return os.path.join(base, filepath[2:])
+    return filepath
+
+
+path.abspath = _abspath
+
+
+app = _module_types.ModuleType('bpy.app')
+app.version = (4, 2, 0)
+app.version_string = '4.2.0 (bpy stand-in)'
+app.binary_path = ''
+app.background = True
+app.handlers = _module_types.ModuleType('bpy.app.handlers')
+for _handler in ('depsgraph_update_post', 'load_post', 'undo_post', 'redo_post',
+                 'render_pre', 'render_post', 'render_cancel', 'render_complete', 'save_pre', 'save_post'):
+    setattr(app.handlers, _handler, [])
+
+
+def _persistent(func):
+    func._bpy_persistent = True
+    return func
+
+
+app.handlers.persistent = _persistent
+app.timers = _module_types.SimpleNamespace(register=lambda func, **kwargs: None,
+                                           unregister=lambda func: None,
+                                           is_registered=lambda func: False)
+
+
+class _OpsRecorder:
+    """bpy.ops替身: 记录调用并返回 {'FINISHED'}"""
+
+    calls = []
+
+    def __init__(self, path=''):
+        self._path = path
+
+    def __getattr__(self, name):
+        return _OpsRecorder(f'{self._path}.{name}' if self._path else name)
+
+    def __call__(self, *args, **kwargs):
+        _OpsRecorder.calls.append((self._path, kwargs))
+        return {'FINISHED'}
+
+
+ops = _OpsRecorder()
+
+
+# ---------------------------------------------------------------------------
+
+data = None
+context = None
+
+
+def reset():
+    """清空所有数据，相当于打开一个空的blend文件"""
+    global data, context
+    data = BlendData()
+    context = Context()
+    data.scenes = [context.scene]
+    _OpsRecorder.calls.clear()
+    for func in list(app.handlers.load_post):
+        func(None)
+
+
+reset()
+
+sys.modules.setdefault('bpy.props', props)
+sys.modules.setdefault('bpy.types', types)
+sys.modules.setdefault('bpy.utils', utils)
+sys.modules.setdefault('bpy.path', path)
+sys.modules.setdefault('bpy.app', app)
+sys.modules.setdefault('bpy.app.handlers', app.handlers)
@@ -0,0 +1,85 @@
+"""纯Python的最小mathutils替身，配合 bpy.py 使用，只实现插件用到的矩阵和向量运算"""
+
+
+class Vector(tuple):
+    def __new__(cls, values=(0.0, 0.0, 0.0)):
+        return super().__new__(cls, (float(value) for value in values))
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self, other))
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self, other))
+
+    @property
+    def x(self):
+        return self[0]
+
+    @property
+    def y(self):
+        return self[1]
+
+    @property
+    def z(self):
+        return self[2]
+
+    def copy(self):
+        return Vector(self)
+
+
+class Matrix:
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self.rows = [[float(value) for value in row] for row in rows]
+
+    @classmethod
+    def Identity(cls, size):
+        return cls([[1.0 if i == j else 0.0 for j in range(size)] for i in range(size)])
+
+    @classmethod
+    def Translation(cls, vector):
+        matrix = cls.Identity(4)
+        for i, value in enumerate(tuple(vector)[:3]):
+            matrix.rows[i][3] = float(value)
+        return matrix
+
+    def copy(self):
+        return Matrix(self.rows)
+
+    def to_translation(self):
+        return Vector(row[3] for row in self.rows[:3])
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            size = len(self.rows)
+            return Matrix([
+                [sum(self.rows[i][k] * other.rows[k][j] for k in range(size)) for j in range(size)]
+                for i in range(size)
+            ])
+        values = tuple(other) + (1.0,) * (len(self.rows) - len(other))
+        result = [sum(a * b for a, b in zip(row, values)) for row in self.rows]
+        return Vector(result[:len(other)])
+
+    def inverted(self):
+        """高斯-约当消元求逆"""
+        size = len(self.rows)
+        augmented = [row[:] + [1.0 if i == j else 0.0 for j in range(size)] for i, row in enumerate(self.rows)]
+        for column in range(size):
+            pivot = max(range(column, size), key=lambda r: abs(augmented[r][column]))
+            if abs(augmented[pivot][column]) < 1e-12:
+                raise ValueError('matrix does not have an inverse')
+            augmented[column], augmented[pivot] = augmented[pivot], augmented[column]
+            factor = augmented[column][column]
+            augmented[column] = [value / factor for value in augmented[column]]
+            for r in range(size):
+                if r != column and augmented[r][column] != 0.0:
+                    scale = augmented[r][column]
+                    augmented[r] = [a - scale * b for a, b in zip(augmented[r], augmented[column])]
+        return Matrix([row[size:] for row in augmented])
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and self.rows == other.rows
+
+    def __repr__(self):
+        return f'Matrix({self.rows})'
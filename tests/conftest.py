@@ -0,0 +1,119 @@
+"""使用 scripts/standin 下的bpy替身在普通CPython中运行插件逻辑的测试夹具
+
+不需要Blender。每个测试使用新的替身场景: Shader预设中的模板材质和节点组、合成的角色材质目录和MMD模型。
+"""
+import os
+import sys
+import types
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(TESTS_DIR), 'scripts')
+
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, 'standin'))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import bpy  # noqa: E402  bpy替身
+from benchmark import build_character, generate_material_directory  # noqa: E402
+from microbench import import_addon, addon_module  # noqa: E402
+
+CHARACTER_COUNT = 2
+MODEL_PARAMS = {'meshes': 2, 'slots': 7, 'children': 1, 'bones': 1}
+DIRECTORY_PARAMS = {'texture_size': 8, 'json_dumps': 1, 'noise_files': 0}
+
+
+@pytest.fixture(scope='session')
+def addon():
+    return import_addon()
+
+
+@pytest.fixture(scope='session')
+def module(addon):
+    return lambda path: addon_module(addon, path)
+
+
+def _template_material(name, texture_nodes, group=None):
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    tree = material.node_tree
+    for node_name in texture_nodes:
+        tree.nodes.new('ShaderNodeTexImage').name = node_name
+    if group is not None:
+        group_node = tree.nodes.new('ShaderNodeGroup')
+        group_node.name = group.name
+        group_node.node_tree = group
+        if group.name == 'Outlines':
+            for i in range(1, 6):
+                group_node.inputs.new(f'Outline Color {i}', (0, 0, 0, 1), 'RGBA')
+    material.use_fake_user = True
+
+
+def build_shader_preset():
+    """Shader预设中应用材质需要的模板材质、节点组和灯光物体"""
+    ramp = bpy.data.node_groups.new('Shadow Ramp')
+    for node_name in ('Hair_Shadow_Ramp', 'Body_Shadow_Ramp'):
+        texture = ramp.nodes.new('ShaderNodeTexImage')
+        texture.name = node_name
+        mix = ramp.nodes.new('ShaderNodeMix')
+        ramp.links.new(texture.outputs['Color'], mix.inputs[3])
+    outlines = bpy.data.node_groups.new('Outlines')
+    _template_material('GI_Face', ['Face_Diffuse'])
+    _template_material('GI_Hair', ['Body_Diffuse_UV0', 'Body_Lightmap_UV0'], ramp)
+    _template_material('GI_Body', ['Body_Diffuse_UV0', 'Body_Lightmap_UV0'], ramp)
+    _template_material('GI_Outlines', ['Outline_Diffuse', 'Outline_Lightmap'], outlines)
+    bpy.data.node_groups.new('Light Vectors').use_fake_user = True
+    bpy.data.objects.new('Light Direction Template', None)
+
+
+@pytest.fixture
+def scene(module, tmp_path, monkeypatch):
+    """选中了所有角色的替身场景，每个角色的根对象上记录了各自的材质目录"""
+    monkeypatch.setenv('BOBH_SHARED_MATERIALS', '0')
+    monkeypatch.setattr(bpy.app, 'background', True)
+    module('utils.character_asset_index').CharacterAssetIndex.invalidate()
+    module('utils.outline_info').OutlineSidecarCache.invalidate()
+    module('utils.mmd_model_index').MMDModelIndex.invalidate()
+
+    bpy.reset()
+    build_shader_preset()
+    asset_index = module('utils.character_asset_index')
+    characters = []
+    for i in range(CHARACTER_COUNT):
+        directory = str(tmp_path / f'C{i}')
+        generate_material_directory(directory, f'Avatar_C{i}', i, DIRECTORY_PARAMS, asset_index)
+        root, mesh = build_character(bpy, i, MODEL_PARAMS)
+        root.material_directory = directory
+        for child in root.children:
+            child.select_set(True)
+        mesh.select_set(True)
+        characters.append(types.SimpleNamespace(root=root, mesh=mesh, directory=directory))
+    bpy.context.view_layer.objects.active = characters[0].mesh
+    return types.SimpleNamespace(context=bpy.context, characters=characters)
+
+
+@pytest.fixture
+def add_character(module, scene):
+    """在场景中再创建一个MMD模型（没有材质目录），返回它的模型名称"""
+    get_model_name = module('utils.character_state').get_model_name
+
+    def add():
+        root, _ = build_character(bpy, len(bpy.data.collections), MODEL_PARAMS)
+        return get_model_name(root)
+    return add
+
+
+@pytest.fixture
+def modal_window(scene, monkeypatch):
+    """让invoke按界面中的分步方式执行: 提供窗口和计时器的替身"""
+    monkeypatch.setattr(bpy.app, 'background', False)
+    window_manager = scene.context.window_manager
+    window_manager.progress_begin = lambda low, high: None
+    window_manager.progress_update = lambda value: None
+    window_manager.progress_end = lambda: None
+    window_manager.windows = []
+    window_manager.event_timer_add = lambda *args, **kwargs: 'timer'
+    window_manager.event_timer_remove = lambda timer: None
+    window_manager.modal_handler_add = lambda operator: None
+    scene.context.window = object()
+    return scene
@@ -0,0 +1,250 @@
+import os
+import types
+
+import bpy
+from benchmark import write_png
+
+
+TIMER = types.SimpleNamespace(type='TIMER')
+ESC = types.SimpleNamespace(type='ESC')
+
+
+def apply_operator(module):
+    operator = module('operators.apply_shader_to_mmd_mode').BOBH_OT_apply_shader_to_mmd_model()
+    operator.apply_all_selected = True
+    return operator
+
+
+def errors(operator):
+    return [message for level, message in operator.reports if 'ERROR' in level]
+
+
+def bound_images(id_data):
+    """材质或节点组中图片节点名称 -> 绑定的图片名称"""
+    tree = getattr(id_data, 'node_tree', id_data)
+    return {
+        node.name: node.image.name
+        for node in tree.nodes
+        if getattr(node, 'image', None) is not None
+    }
+
+
+def character_materials(module, root):
+    return module('utils.character_state').load_apply_state(root)['materials']
+
+
+def snapshot(module, scene):
+    """回滚后应与应用前完全一致的场景状态"""
+    index = module('utils.mmd_model_index').MMDModelIndex
+    state = module('utils.character_state').STATE_PROPERTY
+    return (
+        sorted(material.name for material in bpy.data.materials),
+        sorted(obj.name for obj in bpy.data.objects),
+        sorted(collection.name for collection in bpy.data.collections),
+        sorted(group.name for group in bpy.data.node_groups),
+        sorted(image.name for image in bpy.data.images),
+        [[slot.material.name for slot in mesh_obj.material_slots]
+         for character in scene.characters for mesh_obj in index.get(character.root).meshes],
+        [(obj.name, sorted(collection.name for collection in obj.users_collection)) for obj in bpy.data.objects],
+        [character.root.get(state) for character in scene.characters],
+        scene.context.scene.view_settings.view_transform,
+    )
+
+
+def run_modal(operator, context, steps_before_esc=None):
+    assert operator.invoke(context, None) == {'RUNNING_MODAL'}
+    steps = 0
+    while True:
+        if steps == steps_before_esc:
+            return operator.modal(context, ESC)
+        result = operator.modal(context, TIMER)
+        steps += 1
+        if result != {'RUNNING_MODAL'}:
+            return result
+
+
+def test_apply_binds_each_character_textures(module, scene):
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+
+    for i, character in enumerate(scene.characters):
+        materials = character_materials(module, character.root)
+        body = bpy.data.materials[materials['Body_Mat_Name']]
+        assert bound_images(body) == {
+            'Body_Diffuse_UV0': f'Avatar_C{i}_Tex_Body_Diffuse.png',
+            'Body_Lightmap_UV0': f'Avatar_C{i}_Tex_Body_Lightmap.png',
+        }
+        outline = bpy.data.materials[materials['Hair_Outline_Mat_Name']]
+        assert bound_images(outline) == {
+            'Outline_Diffuse': f'Avatar_C{i}_Hair_Diffuse.png',
+            'Outline_Lightmap': f'Avatar_C{i}_Hair_Lightmap.png',
+        }
+        ramp = next(node for node in body.node_tree.nodes if node.name == 'Shadow Ramp').node_tree
+        assert bound_images(ramp)['Body_Shadow_Ramp'] == f'Avatar_C{i}_Tex_Body_Shadow_Ramp.png'
+
+    # 每个角色使用自己的Shadow Ramp副本，模板中的节点组不被修改
+    template_ramp = bpy.data.node_groups['Shadow Ramp']
+    assert bound_images(template_ramp) == {}
+
+
+def test_preflight_hashes_seed_path_hash_cache(module, scene, monkeypatch):
+    image_cache = module('utils.image_cache')
+    image_cache.clear_cache()
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+
+    # 绑定的贴图都已经由预检计算过哈希，不再重新读取文件
+    def compute_file_hash(path, chunk_size=1 << 20):
+        raise AssertionError(f'重新计算了哈希: {path}')
+
+    monkeypatch.setattr(image_cache, 'compute_file_hash', compute_file_hash)
+    images = [image for image in bpy.data.images if image.get(image_cache.HASH_PROPERTY)]
+    assert images
+    for image in images:
+        assert image_cache.get_content_hash(image.filepath) == image[image_cache.HASH_PROPERTY]
+
+
+def test_reapply_keeps_materials_and_images(module, scene):
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+    before = snapshot(module, scene)
+
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+    assert snapshot(module, scene) == before
+
+
+def test_reapply_rebinds_only_changed_textures(module, scene):
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+    changed, unchanged = scene.characters
+    materials_before = sorted(material.name for material in bpy.data.materials)
+    body_name = character_materials(module, changed.root)['Body_Mat_Name']
+    other_body = bpy.data.materials[character_materials(module, unchanged.root)['Body_Mat_Name']]
+    old_image = bpy.data.materials[body_name].node_tree.nodes.get('Body_Diffuse_UV0').image
+    other_images = bound_images(other_body)
+
+    path = os.path.join(changed.directory, 'Avatar_C0_Tex_Body_Diffuse.png')
+    write_png(path, 16, 16, (1, 2, 3, 255))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+    # 沿用原来的材质，只替换变化的贴图
+    assert sorted(material.name for material in bpy.data.materials) == materials_before
+    new_image = bpy.data.materials[body_name].node_tree.nodes.get('Body_Diffuse_UV0').image
+    assert new_image is not old_image
+    image_cache = module('utils.image_cache')
+    assert new_image[image_cache.HASH_PROPERTY] == image_cache.compute_file_hash(path)
+    assert bound_images(other_body) == other_images
+
+
+def test_shared_mode_uses_one_material_set_with_slots(module, scene, monkeypatch):
+    monkeypatch.setenv('BOBH_SHARED_MATERIALS', '1')
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+
+    character_state = module('utils.character_state')
+    material_maps = [character_materials(module, character.root) for character in scene.characters]
+    assert material_maps[0] == material_maps[1]
+    face = bpy.data.materials[material_maps[0]['Face_Mat_Name']]
+    expected = {}
+    for i, character in enumerate(scene.characters):
+        slot = character_state.get_character_slot(face, character_state.get_model_name(character.root))
+        expected[character_state.slot_node_name('Face_Diffuse', slot)] = f'Avatar_C{i}_Face_Diffuse.png'
+    assert bound_images(face) == expected
+    assert sorted(expected) == ['Face_Diffuse', 'Face_Diffuse #1']
+
+
+def test_switching_to_shared_mode_revalidates_textures(module, scene, monkeypatch):
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}, errors(operator)
+    character = scene.characters[0]
+    assert not operator.needs_texture_update(character.root, character.directory)
+
+    monkeypatch.setenv('BOBH_SHARED_MATERIALS', '1')
+    assert operator.needs_texture_update(character.root, character.directory)
+
+
+def test_modal_cancel_rolls_back(module, modal_window):
+    before = snapshot(module, modal_window)
+    operator = apply_operator(module)
+    assert run_modal(operator, modal_window.context, steps_before_esc=9) == {'CANCELLED'}
+    assert snapshot(module, modal_window) == before
+
+
+def test_modal_cancel_after_reapply_in_shared_mode_rolls_back(module, modal_window, monkeypatch):
+    operator = apply_operator(module)
+    assert run_modal(operator, modal_window.context) == {'FINISHED'}, errors(operator)
+    before = snapshot(module, modal_window)
+
+    monkeypatch.setenv('BOBH_SHARED_MATERIALS', '1')
+    operator = apply_operator(module)
+    assert run_modal(operator, modal_window.context, steps_before_esc=12) == {'CANCELLED'}
+    assert snapshot(module, modal_window) == before
+
+
+def test_modal_passes_through_editing_events(module, modal_window):
+    operator = apply_operator(module)
+    assert operator.invoke(modal_window.context, None) == {'RUNNING_MODAL'}
+    assert operator.modal(modal_window.context, types.SimpleNamespace(type='DEL')) == {'PASS_THROUGH'}
+    assert operator.modal(modal_window.context, types.SimpleNamespace(type='MIDDLEMOUSE')) == {'PASS_THROUGH'}
+    operator.modal(modal_window.context, ESC)
+
+
+def test_modal_aborts_and_rolls_back_when_target_is_deleted(module, modal_window):
+    before = snapshot(module, modal_window)
+    operator = apply_operator(module)
+    context = modal_window.context
+    assert operator.invoke(context, None) == {'RUNNING_MODAL'}
+    for _ in range(5):
+        assert operator.modal(context, TIMER) == {'RUNNING_MODAL'}
+
+    # 步骤之间用户删除了还没处理的角色的mesh
+    bpy.data.objects.remove(modal_window.characters[1].mesh)
+    assert operator.modal(context, TIMER) == {'CANCELLED'}
+    assert errors(operator)
+    after = snapshot(module, modal_window)
+    assert after[0] == before[0]  # 材质
+    assert after[2:5] == before[2:5]  # 集合、节点组、图片
+    assert after[-1] == before[-1]  # 色彩管理设置
+
+
+def fail_character(monkeypatch, module, failing_root):
+    """让failing_root在最后一个阶段失败（材质已经创建并替换）"""
+    operator_class = module('operators.apply_shader_to_mmd_mode').BOBH_OT_apply_shader_to_mmd_model
+    create_empties = operator_class.create_light_dir_and_head_empty
+
+    def create_light_dir_and_head_empty(self, model_index, collection_name, mesh_location):
+        if model_index.root is failing_root:
+            raise module('bobh_exception').BobHException('模拟失败')
+        return create_empties(self, model_index, collection_name, mesh_location)
+
+    monkeypatch.setattr(operator_class, 'create_light_dir_and_head_empty', create_light_dir_and_head_empty)
+
+
+def test_failed_character_is_rolled_back(module, scene, monkeypatch):
+    failing = scene.characters[1]
+    slots_before = [slot.material.name for slot in failing.mesh.material_slots]
+    materials_before = {material.name for material in bpy.data.materials}
+    fail_character(monkeypatch, module, failing.root)
+
+    operator = apply_operator(module)
+    assert operator.execute(scene.context) == {'FINISHED'}
+    assert errors(operator) == [f'{failing.root.name}: 模拟失败']
+    assert [slot.material.name for slot in failing.mesh.material_slots] == slots_before
+    assert failing.root.get(module('utils.character_state').STATE_PROPERTY) is None
+    # 只留下成功的角色的材质
+    created = {material.name for material in bpy.data.materials} - materials_before
+    succeeded = character_materials(module, scene.characters[0].root)
+    assert created == set(succeeded.values())
+
+
+def test_modal_rolls_back_when_every_character_fails(module, modal_window, monkeypatch):
+    before = snapshot(module, modal_window)
+    for character in modal_window.characters:
+        fail_character(monkeypatch, module, character.root)
+    operator = apply_operator(module)
+    assert run_modal(operator, modal_window.context) == {'CANCELLED'}
+    assert snapshot(module, modal_window) == before
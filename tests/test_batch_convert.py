@@ -0,0 +1,27 @@
+import json
+
+import pytest
+from batch_convert import load_manifest
+
+
+def write_manifest(tmp_path, jobs):
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps(jobs), encoding='utf-8')
+    return str(path)
+
+
+def test_default_names_are_unique_for_same_output_basename(tmp_path):
+    jobs = load_manifest(write_manifest(tmp_path, [
+        {'source': 'a/Furina.pmx', 'material_directory': 'a', 'output': 'out_a/Furina.blend'},
+        {'source': 'b/Furina.pmx', 'material_directory': 'b', 'output': 'out_b/Furina.blend'},
+    ]))
+    assert [job['name'] for job in jobs] == ['000_Furina', '001_Furina']
+
+
+def test_duplicate_names_are_rejected(tmp_path):
+    path = write_manifest(tmp_path, [
+        {'source': 'a.pmx', 'material_directory': 'a', 'output': 'a.blend', 'name': 'Furina'},
+        {'source': 'b.pmx', 'material_directory': 'b', 'output': 'b.blend', 'name': 'Furina'},
+    ])
+    with pytest.raises(ValueError):
+        load_manifest(path)
@@ -0,0 +1,29 @@
+import bpy
+
+
+def test_report_reads_unloaded_images_from_png_header(module, scene, monkeypatch):
+    operator = module('operators.apply_shader_to_mmd_mode').BOBH_OT_apply_shader_to_mmd_model()
+    operator.apply_all_selected = True
+    assert operator.execute(scene.context) == {'FINISHED'}
+
+    # 读取size会让Blender解码图片，没有加载的图片不能读取
+    image_class = type(next(iter(bpy.data.images)))
+
+    class UnloadedImage(image_class):
+        @property
+        def size(self):
+            raise AssertionError(f'读取了未加载图片的尺寸: {self.name}')
+
+    unloaded = [image for image in bpy.data.images if not image.has_data]
+    for image in unloaded:
+        image.__class__ = UnloadedImage
+
+    report = module('utils.memory_report').build_memory_report(scene.context)
+    assert [character['name'] for character in report['characters']] == [c.root.name for c in scene.characters]
+    # 角色贴图是材质目录中的PNG文件（测试中为8x8）
+    infos = [report['images'][image.name_full] for image in unloaded if image.name_full in report['images']]
+    assert infos
+    for info in infos:
+        assert not info['loaded']
+        assert (info['width'], info['height']) == (8, 8)
+        assert info['bytes'] == 8 * 8 * 4 * (4 if info['is_float'] else 1)
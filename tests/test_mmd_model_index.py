@@ -0,0 +1,79 @@
+import types
+
+import bpy
+import pytest
+
+
+@pytest.fixture
+def index_class(module, scene):
+    return module('utils.mmd_model_index').MMDModelIndex
+
+
+def add_mesh(name, parent):
+    obj = bpy.data.objects.new(name, bpy.data.meshes.new(name))
+    obj.parent = parent
+    return obj
+
+
+def depsgraph_update(*objects):
+    """只包含物体更新的depsgraph替身"""
+    return types.SimpleNamespace(
+        id_type_updated=lambda id_type: id_type == 'OBJECT',
+        updates=[types.SimpleNamespace(id=obj) for obj in objects],
+    )
+
+
+def test_index_is_cached_until_hierarchy_changes(index_class, scene):
+    root = scene.characters[0].root
+    index = index_class.get(root)
+    assert index_class.get(root) is index
+
+    mesh = add_mesh('Extra_mesh', root)
+    rebuilt = index_class.get(root)
+    assert rebuilt is not index
+    assert mesh in rebuilt.meshes
+
+
+def test_reparenting_mesh_out_of_model_invalidates(index_class, scene):
+    first, second = scene.characters
+    index = index_class.get(first.root)
+    first.mesh.parent = second.root
+    rebuilt = index_class.get(first.root)
+    assert rebuilt is not index
+    assert first.mesh not in rebuilt.meshes
+
+
+def test_renamed_root_gets_new_index(index_class, scene):
+    root = scene.characters[0].root
+    index = index_class.get(root)
+    root.mmd_root.name = 'Renamed'
+    assert index_class.get(root) is not index
+
+
+def test_depsgraph_handler_ignores_transform_updates(index_class, module, scene):
+    handler = module('utils.mmd_model_index')._on_depsgraph_update
+    character = scene.characters[0]
+    index = index_class.get(character.root)
+
+    # 只移动了物体：层级没有变化，缓存保留
+    character.mesh.location = (1.0, 0.0, 0.0)
+    handler(scene.context.scene, depsgraph_update(character.mesh))
+    assert index_class._cache
+
+    # 层级中的mesh改变了父级：缓存被清除
+    character.mesh.parent = scene.characters[1].root
+    handler(scene.context.scene, depsgraph_update(character.mesh))
+    assert not index_class._cache
+    assert index_class.get(character.root) is not index
+
+
+def test_depsgraph_handler_detects_new_child_of_indexed_model(index_class, module, scene):
+    handler = module('utils.mmd_model_index')._on_depsgraph_update
+    root = scene.characters[0].root
+    index_class.get(root)
+    loose = bpy.data.objects.new('Loose', None)
+    index_class.get(root)  # 物体总数变化后重新建立的索引
+
+    loose.parent = root
+    handler(scene.context.scene, depsgraph_update(loose))
+    assert not index_class._cache
@@ -0,0 +1,133 @@
+import sys
+
+import bpy
+import pytest
+
+
+HEAVY_MODULES = ('apply_shader_to_mmd_mode', 'apply_light_and_outline', 'apply_postprocess')
+# 面板绘制和应用处理函数用到的工具模块，启用插件时也不导入
+UTILITY_MODULES = ('memory_report', 'character_library', 'mmd_model_index', 'texture_proxy')
+
+
+@pytest.fixture
+def registered(addon, monkeypatch):
+    monkeypatch.setenv('BOBH_REGISTER_UI', '0')
+    addon.register()
+    yield addon
+    addon.unregister()
+
+
+def registered_class(name):
+    return next(cls for cls in bpy.utils.registered_classes if cls.__name__ == name)
+
+
+def test_lazy_stub_shares_properties_with_operator(registered, module):
+    stub = registered_class('BOBH_OT_apply_shader_to_mmd_model')
+    operator_class = module('operators.apply_shader_to_mmd_mode').BOBH_OT_apply_shader_to_mmd_model
+    assert stub is not operator_class
+    assert stub.bl_idname == operator_class.bl_idname
+    for name, definition in stub.__annotations__.items():
+        real_definition = operator_class.__annotations__[name]
+        assert (definition.kind, definition.keywords) == (real_definition.kind, real_definition.keywords)
+
+
+def test_lazy_stub_execute_applies_materials(registered, module, scene):
+    stub = registered_class('BOBH_OT_apply_shader_to_mmd_model')
+    operator = stub()
+    operator.apply_all_selected = True
+    assert operator.execute(scene.context) == {'FINISHED'}
+    character_state = module('utils.character_state')
+    for character in scene.characters:
+        assert character_state.find_existing_material_map(
+            character.root, character_state.get_model_name(character.root)
+        ) is not None
+    assert 'BOBH_OT_apply_shader_to_mmd_model' in module('registry').get_lazy_load_times()
+
+
+def test_register_does_not_import_operator_modules(addon, monkeypatch):
+    loaded = [name for name in sys.modules if name.endswith(HEAVY_MODULES)]
+    for name in loaded:
+        monkeypatch.delitem(sys.modules, name)
+    monkeypatch.setenv('BOBH_REGISTER_UI', '0')
+    addon.register()
+    try:
+        assert not [name for name in sys.modules if name.endswith(HEAVY_MODULES)]
+    finally:
+        addon.unregister()
+
+
+def test_register_with_panels_does_not_import_utility_modules(addon, monkeypatch):
+    for name in [name for name in sys.modules if name.endswith(UTILITY_MODULES + ('.panel',))]:
+        monkeypatch.delitem(sys.modules, name)
+    monkeypatch.setenv('BOBH_REGISTER_UI', '1')
+    addon.register()
+    try:
+        assert registered_class('BOBH_PT_main_panel')
+        assert not [name for name in sys.modules if name.endswith(UTILITY_MODULES)]
+        assert bpy.app.handlers.depsgraph_update_post == []
+    finally:
+        addon.unregister()
+
+
+def test_utility_handlers_are_registered_on_import_and_reenable(addon, module):
+    mmd_model_index = module('utils.mmd_model_index')
+    handler = mmd_model_index._on_depsgraph_update
+    addon.register()
+    try:
+        assert handler in bpy.app.handlers.depsgraph_update_post
+    finally:
+        addon.unregister()
+    assert handler not in bpy.app.handlers.depsgraph_update_post
+
+    # 重新启用插件时，已经导入的模块重新注册处理函数
+    addon.register()
+    try:
+        assert bpy.app.handlers.depsgraph_update_post.count(handler) == 1
+    finally:
+        addon.unregister()
+
+
+def lazy_entries(module):
+    registry = module('registry')
+    return [entry for entry in registry.REGISTRY if entry[2] == registry.LAZY]
+
+
+def test_lazy_stubs_match_operator_classes(module):
+    registry = module('registry')
+    for module_name, class_name, _, definition in lazy_entries(module):
+        stub = registry.make_lazy_operator(module_name, class_name, definition)
+        operator_class = registry.load_class(module_name, class_name)
+        for key in ('bl_idname', 'bl_label', 'bl_description', 'bl_options'):
+            assert getattr(stub, key, None) == getattr(operator_class, key, None), (class_name, key)
+        assert set(stub.__annotations__) == set(getattr(operator_class, '__annotations__', {})), class_name
+        for method in definition['methods']:
+            assert method in vars(operator_class), (class_name, method)
+
+
+def test_lazy_stub_rejects_property_mismatch(module):
+    registry = module('registry')
+    module_name, class_name, _, definition = lazy_entries(module)[0]
+    definition = dict(definition, properties=lambda: {'unknown': bpy.props.BoolProperty()})
+    stub = registry.make_lazy_operator(module_name, class_name, definition)
+    with pytest.raises(module('bobh_exception').BobHException):
+        stub._load_implementation()
+    assert stub._lazy_implementation is None
+
+
+def test_lazy_stub_forwards_helpers_and_loads_once(module):
+    registry = module('registry')
+    entry = next(entry for entry in lazy_entries(module) if entry[1] == 'BOBH_OT_set_character_material_directory')
+    stub = registry.make_lazy_operator(*entry[:2], entry[3])
+    operator = stub()
+    # 特殊属性不会触发导入
+    assert not hasattr(operator, '__wrapped__')
+    assert stub._lazy_implementation is None
+
+    # 辅助方法和类常量从真实的操作类中取，并以占位操作实例作为self
+    assert operator.REQUIRED_MAT_FILES
+    assert operator.validate_path.__self__ is operator
+    implementation = stub._lazy_implementation
+    load_time = registry.get_lazy_load_times()[entry[1]]
+    assert operator.REQUIRED_OUTLINE_FILES
+    assert stub._lazy_implementation is implementation
+    assert registry.get_lazy_load_times()[entry[1]] == load_time
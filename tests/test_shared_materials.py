@@ -0,0 +1,45 @@
+import bpy
+
+
+def model_names(module, scene):
+    get_model_name = module('utils.character_state').get_model_name
+    return [get_model_name(character.root) for character in scene.characters]
+
+
+def test_slot_allocation_is_stable_and_fills_a_set_before_creating_another(module, scene, add_character):
+    shared_materials = module('utils.shared_materials')
+    first, second = model_names(module, scene)
+
+    first_map, first_slot = shared_materials.allocate_shared_slot(first, 2)
+    second_map, second_slot = shared_materials.allocate_shared_slot(second, 2)
+    assert first_map == second_map
+    assert {first_slot, second_slot} == {0, 1}
+    assert shared_materials.allocate_shared_slot(first, 2) == (first_map, first_slot)
+
+    # 两个槽位都已占用，第三个角色使用新的一套共享材质
+    third = add_character()
+    third_map, third_slot = shared_materials.allocate_shared_slot(third, 2)
+    assert third_map['Body_Mat_Name'] != first_map['Body_Mat_Name']
+    assert third_slot == 0
+
+
+def test_released_slot_is_reused(module, scene, add_character):
+    shared_materials = module('utils.shared_materials')
+    first, second = model_names(module, scene)
+    material_map, first_slot = shared_materials.allocate_shared_slot(first, 2)
+    shared_materials.allocate_shared_slot(second, 2)
+
+    shared_materials.release_shared_slot(first)
+    third = add_character()
+    assert shared_materials.allocate_shared_slot(third, 2) == (material_map, first_slot)
+
+
+def test_slot_of_deleted_model_is_reused(module, scene, add_character):
+    shared_materials = module('utils.shared_materials')
+    first, second = model_names(module, scene)
+    material_map, _ = shared_materials.allocate_shared_slot(first, 2)
+    _, second_slot = shared_materials.allocate_shared_slot(second, 2)
+
+    bpy.data.objects.remove(scene.characters[1].root)
+    third = add_character()
+    assert shared_materials.allocate_shared_slot(third, 2) == (material_map, second_slot)
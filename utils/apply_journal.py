@@ -0,0 +1,256 @@
+import bpy
+from contextlib import contextmanager
+from .character_state import STATE_PROPERTY, SHARED_SLOTS_PROPERTY, is_character_material
+from .character_node_groups import COPY_SOURCE_PROPERTY, CONTENT_KEY_PROPERTY
+from .mmd_model_index import MMDModelIndex
+from .shared_materials import SLOT_ATTRIBUTE
+
+
+# 回滚时删除新建数据块的顺序：先删除引用其他数据的数据块
+ROLLBACK_CATEGORIES = ('objects', 'collections', 'materials', 'node_groups', 'images')
+
+_MISSING = object()
+
+
+def _names(category):
+    # name_full包含所属库，同类数据块中唯一（链接的数据块可以与本地数据块同名）
+    return {datablock.name_full for datablock in getattr(bpy.data, category)}
+
+
+def _find_scene(name):
+    return next((scene for scene in bpy.data.scenes if scene.name == name), None)
+
+
+def _collection_reference(collection):
+    """集合的引用，场景的根集合不是独立的数据块，按所属场景记录"""
+    for scene in bpy.data.scenes:
+        if scene.collection == collection:
+            return ('scenes', scene.name)
+    return ('collections', collection.name)
+
+
+class ApplyJournal:
+    """记录应用材质前的场景状态，取消时删除应用过程新建的数据块并恢复被修改的已有数据
+
+    只记录应用过程会修改的数据：目标角色的材质槽、所在集合和记录的属性，
+    已有角色材质（包括嵌套节点组）中的贴图、节点组和描边颜色，以及场景的色彩管理设置（scene不为None时）。
+    所有数据都按类型和名称记录并在回滚时重新查找（不持有数据块的引用，撤销后引用会失效，
+    释放后内存地址也可能被新数据块复用），步骤之间用户删除或重命名的数据会被跳过，
+    用户自己创建的数据不受影响
+    """
+
+    def __init__(self, scene=None):
+        self._scene_name = None if scene is None else scene.name
+        self._view_transform = None if scene is None else scene.view_settings.view_transform
+        self._created = {category: [] for category in ROLLBACK_CATEGORIES}
+        self._renamed = {}
+        self._properties = {}
+        self._slots = {}
+        self._object_collections = {}
+        self._collections = {}
+        self._nodes = {}
+        for material in bpy.data.materials:
+            if is_character_material(material) and material.library is None:
+                self.record_property(('materials', material.name), SHARED_SLOTS_PROPERTY)
+                if material.node_tree is not None:
+                    self.record_node_tree(('materials', material.name))
+
+    def _resolve(self, reference):
+        """按(类型, 名称)查找数据块，找不到时返回None；'scenes'类型返回场景的根集合"""
+        category, name = reference
+        name = self._renamed.get(reference, name)
+        if category == 'scenes':
+            scene = _find_scene(name)
+            return None if scene is None else scene.collection
+        return getattr(bpy.data, category).get(name)
+
+    def _resolve_tree(self, reference):
+        # 材质的节点树是材质内嵌的数据，通过材质查找
+        owner = self._resolve(reference)
+        return getattr(owner, 'node_tree', owner)
+
+    @contextmanager
+    def track_created(self):
+        """记录这一步中新建的数据块"""
+        before = {category: _names(category) for category in ROLLBACK_CATEGORIES}
+        try:
+            yield
+        finally:
+            for category in ROLLBACK_CATEGORIES:
+                self._created[category].extend(_names(category) - before[category])
+
+    def track_steps(self, steps):
+        """逐步执行steps生成器，记录每一步中新建的数据块，返回steps的返回值"""
+        try:
+            while True:
+                with self.track_created():
+                    try:
+                        stage_name = next(steps)
+                    except StopIteration as stop:
+                        return stop.value
+                yield stage_name
+        finally:
+            steps.close()
+
+    def record_rename(self, category, old_name, new_name):
+        """应用过程重命名了已记录的数据块时调用，之后按新名称查找，回滚时恢复原名称"""
+        self._renamed[(category, old_name)] = new_name
+
+    def record_property(self, reference, key):
+        id_data = self._resolve(reference)
+        self._properties.setdefault((reference, key), id_data.get(key, _MISSING))
+
+    def record_node_tree(self, reference):
+        """记录节点树（和嵌套的节点组）中应用时可能被改写的节点状态"""
+        stack = [reference]
+        while stack:
+            reference = stack.pop()
+            tree = self._resolve_tree(reference)
+            if reference in self._nodes or getattr(tree, 'library', None) is not None:
+                continue
+            states = self._nodes[reference] = {}
+            if tree.get(COPY_SOURCE_PROPERTY) is not None:
+                self.record_property(reference, CONTENT_KEY_PROPERTY)
+            for node in tree.nodes:
+                if node.type == 'TEX_IMAGE':
+                    states[node.name] = ('image', None if node.image is None else node.image.name)
+                elif node.type == 'RGB':
+                    states[node.name] = ('color', tuple(node.outputs[0].default_value))
+                elif node.type == 'GROUP':
+                    inputs = {
+                        socket.identifier: tuple(socket.default_value)
+                        for socket in node.inputs
+                        if socket.type == 'RGBA' and not socket.is_linked
+                    }
+                    group_name = None if node.node_tree is None else node.node_tree.name
+                    states[node.name] = ('group', group_name, inputs)
+                    if node.node_tree is not None:
+                        stack.append(('node_groups', group_name))
+
+    def _record_collection(self, collection):
+        if collection.name in self._collections or collection.library is not None:
+            return
+        parents = [('collections', parent.name) for parent in bpy.data.collections if collection.name in parent.children]
+        parents.extend(('scenes', scene.name) for scene in bpy.data.scenes if collection.name in scene.collection.children)
+        self._collections[collection.name] = parents
+
+    def record_targets(self, targets):
+        """记录每个目标角色 (根对象名称, mesh名称) 的层级中所有物体的集合、mesh的材质槽和根对象上的应用记录"""
+        for root_name, _ in targets:
+            mmd_root_obj = bpy.data.objects.get(root_name)
+            if mmd_root_obj is None:
+                continue
+            self.record_property(('objects', root_name), STATE_PROPERTY)
+            stack = [mmd_root_obj]
+            while stack:
+                obj = stack.pop()
+                stack.extend(obj.children)
+                if obj.name in self._object_collections:
+                    continue
+                self._object_collections[obj.name] = [_collection_reference(collection) for collection in obj.users_collection]
+                for collection in obj.users_collection:
+                    if collection not in (scene.collection for scene in bpy.data.scenes):
+                        self._record_collection(collection)
+            for mesh_obj in MMDModelIndex.get(mmd_root_obj).meshes:
+                self._slots[mesh_obj.name] = [
+                    None if slot.material is None else slot.material.name for slot in mesh_obj.material_slots
+                ]
+                self.record_property(('objects', mesh_obj.name), SLOT_ATTRIBUTE)
+
+    def _restore_slots(self, mesh_name, material_names):
+        mesh_obj = bpy.data.objects.get(mesh_name)
+        if mesh_obj is None:
+            return
+        for slot, material_name in zip(mesh_obj.material_slots, material_names):
+            material = None if material_name is None else bpy.data.materials.get(material_name)
+            if slot.material != material:
+                slot.material = material
+
+    def _restore_nodes(self, reference, states):
+        tree = self._resolve_tree(reference)
+        if tree is None:
+            return
+        for node_name, state in states.items():
+            node = tree.nodes.get(node_name)
+            if node is None:
+                continue
+            if state[0] == 'image':
+                node.image = None if state[1] is None else bpy.data.images.get(state[1])
+            elif state[0] == 'color':
+                node.outputs[0].default_value = state[1]
+            else:
+                node.node_tree = None if state[1] is None else bpy.data.node_groups.get(state[1])
+                for socket in node.inputs:
+                    if socket.identifier in state[2] and not socket.is_linked:
+                        socket.default_value = state[2][socket.identifier]
+
+    def _restore_property(self, reference, key, value):
+        id_data = self._resolve(reference)
+        if id_data is None:
+            return
+        if value is _MISSING:
+            if key in id_data:
+                del id_data[key]
+        else:
+            id_data[key] = value
+
+    def _restore_collection(self, name, parents):
+        collection = self._resolve(('collections', name))
+        if collection is None:
+            return
+        if collection.name != name:
+            collection.name = name
+        self._renamed.pop(('collections', name), None)
+        parents = [parent for parent in map(self._resolve, parents) if parent is not None]
+        for parent in list(bpy.data.collections) + [scene.collection for scene in bpy.data.scenes]:
+            if collection.name in parent.children and parent not in parents:
+                parent.children.unlink(collection)
+        for parent in parents:
+            if collection.name not in parent.children:
+                parent.children.link(collection)
+
+    def _restore_object_collections(self, obj_name, collection_references):
+        obj = bpy.data.objects.get(obj_name)
+        if obj is None:
+            return
+        collections = [collection for collection in map(self._resolve, collection_references) if collection is not None]
+        for collection in collections:
+            if obj.name not in collection.objects:
+                collection.objects.link(obj)
+        for collection in list(obj.users_collection):
+            if collection not in collections:
+                collection.objects.unlink(obj)
+
+    def rollback(self):
+        """恢复记录的状态，返回删除的新建数据块数量
+
+        应用期间被删除或重命名的数据会被跳过
+        """
+        restores = [(self._restore_slots, item) for item in self._slots.items()]
+        restores.extend((self._restore_nodes, item) for item in self._nodes.items())
+        restores.extend((self._restore_property, (*key, value)) for key, value in self._properties.items())
+        # 先恢复集合的名称和层级，再恢复物体所在的集合
+        restores.extend((self._restore_collection, item) for item in self._collections.items())
+        restores.extend((self._restore_object_collections, item) for item in self._object_collections.items())
+        for restore, args in restores:
+            try:
+                restore(*args)
+            except ReferenceError:
+                pass
+
+        removed = 0
+        for category in ROLLBACK_CATEGORIES:
+            collection = getattr(bpy.data, category)
+            datablocks = {datablock.name_full: datablock for datablock in collection}
+            for name in self._created[category]:
+                datablock = datablocks.pop(name, None)
+                if datablock is not None:
+                    collection.remove(datablock)
+                    removed += 1
+        self._created = {category: [] for category in ROLLBACK_CATEGORIES}
+
+        scene = None if self._scene_name is None else _find_scene(self._scene_name)
+        if scene is not None:
+            scene.view_settings.view_transform = self._view_transform
+        MMDModelIndex.invalidate()
+        return removed
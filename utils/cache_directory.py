@@ -0,0 +1,19 @@
+import bpy
+import os
+import tempfile
+
+
+CACHE_FOLDER_NAME = 'bobh_mmd_genshin_shader_importer'
+
+
+def get_cache_directory(*sub_folders):
+    """返回插件的持久缓存目录（位于Blender用户数据目录下），无法创建时退回系统临时目录"""
+    try:
+        base = bpy.utils.user_resource('DATAFILES', path=CACHE_FOLDER_NAME, create=True)
+    except Exception:
+        base = ''
+    if not base:
+        base = os.path.join(tempfile.gettempdir(), CACHE_FOLDER_NAME)
+    directory = os.path.join(base, *sub_folders)
+    os.makedirs(directory, exist_ok=True)
+    return directory
@@ -0,0 +1,126 @@
+import os
+
+
+# 材质目录下必需的贴图文件后缀
+REQUIRED_MAT_FILES = [
+    '_Tex_Body_Diffuse.png',
+    '_Tex_Body_Lightmap.png',
+    '_Tex_Body_Shadow_Ramp.png',
+    '_Face_Diffuse.png',
+    '_Hair_Diffuse.png',
+    '_Hair_Lightmap.png',
+    '_Hair_Shadow_Ramp.png',
+]
+
+# Materials 子目录下必需的描边文件后缀
+REQUIRED_OUTLINE_FILES = [
+    '_Mat_Body.json',
+    '_Mat_Face.json',
+    '_Mat_Hair.json',
+]
+
+# 可选的描边文件后缀（_Mat_Dress.json和_Mat_Leather.json作用相同，任选其一即可）
+OPTIONAL_OUTLINE_FILES = [
+    '_Mat_Dress.json',
+    '_Mat_Leather.json',
+]
+
+# 应用贴图时查找的后缀（与校验使用的后缀略有不同，保持原有匹配行为）
+APPLY_TEXTURE_FILES = [
+    '_Face_Diffuse.png',
+    '_Hair_Diffuse.png',
+    '_Hair_Lightmap.png',
+    '_Hair_Shadow_Ramp.png',
+    '_Body_Diffuse.png',
+    '_Body_Lightmap.png',
+    '_Body_Shadow_Ramp.png',
+]
+
+TEXTURE_SUFFIXES = tuple(dict.fromkeys(REQUIRED_MAT_FILES + APPLY_TEXTURE_FILES))
+OUTLINE_SUFFIXES = tuple(REQUIRED_OUTLINE_FILES + OPTIONAL_OUTLINE_FILES)
+
+
+def _dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _scan_suffixes(directory, suffixes, extension=None):
+    """扫描一次目录，返回 后缀 -> 文件完整路径 的映射（每个后缀取第一个匹配的文件）"""
+    resolved = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if extension is not None and not name.endswith(extension):
+                continue
+            if not name.endswith(suffixes):
+                continue
+            for suffix in suffixes:
+                if suffix not in resolved and name.endswith(suffix):
+                    resolved[suffix] = entry.path
+    return resolved
+
+
+class CharacterAssetIndex:
+    """角色材质目录索引：一次扫描主目录和 Materials 子目录，缓存各后缀对应的文件路径"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.materials_directory = os.path.join(directory, 'Materials')
+        self.directory_mtime = _dir_mtime(directory)
+        self.materials_mtime = _dir_mtime(self.materials_directory)
+        self.has_materials_directory = os.path.isdir(self.materials_directory)
+
+        self.textures = _scan_suffixes(directory, TEXTURE_SUFFIXES, extension='.png')
+        if self.has_materials_directory:
+            self.outlines = _scan_suffixes(self.materials_directory, OUTLINE_SUFFIXES)
+        else:
+            self.outlines = {}
+
+    def is_stale(self):
+        return (_dir_mtime(self.directory) != self.directory_mtime
+                or _dir_mtime(self.materials_directory) != self.materials_mtime)
+
+    def texture_path(self, suffix):
+        """返回贴图文件路径，找不到时返回空字符串"""
+        return self.textures.get(suffix, '')
+
+    def outline_path(self, suffix):
+        """返回描边json文件路径，找不到时返回None"""
+        return self.outlines.get(suffix)
+
+    def missing_textures(self, suffixes=REQUIRED_MAT_FILES):
+        return [suffix for suffix in suffixes if suffix not in self.textures]
+
+    def missing_outlines(self, suffixes=REQUIRED_OUTLINE_FILES):
+        return [suffix for suffix in suffixes if suffix not in self.outlines]
+
+    def first_outline(self, suffixes=OPTIONAL_OUTLINE_FILES):
+        """按顺序返回第一个存在的 (后缀, 路径)，都不存在时返回 (None, None)"""
+        for suffix in suffixes:
+            path = self.outlines.get(suffix)
+            if path:
+                return suffix, path
+        return None, None
+
+    # 以规范化后的目录路径为键缓存索引
+    _cache = {}
+
+    @classmethod
+    def get(cls, directory):
+        """获取目录索引，目录修改时间变化时自动重新扫描"""
+        key = os.path.normcase(os.path.abspath(directory))
+        index = cls._cache.get(key)
+        if index is None or index.is_stale():
+            index = cls(directory)
+            cls._cache[key] = index
+        return index
+
+    @classmethod
+    def invalidate(cls, directory=None):
+        if directory is None:
+            cls._cache.clear()
+        else:
+            cls._cache.pop(os.path.normcase(os.path.abspath(directory)), None)
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .cache_directory import get_cache_directory
+from .character_asset_index import (
+    REQUIRED_MAT_FILES,
+    REQUIRED_OUTLINE_FILES,
+    OPTIONAL_OUTLINE_FILES,
+    TEXTURE_SUFFIXES,
+    OUTLINE_SUFFIXES,
+)
+
+
+LIBRARY_VERSION = 1
+
+# 每个目录的记录: [目录修改时间, Materials修改时间, 贴图位掩码, 描边位掩码, 文件名前缀, 子目录名列表]
+# 位掩码的第i位表示 TEXTURE_SUFFIXES / OUTLINE_SUFFIXES 中第i个后缀的文件存在
+MTIME, MATERIALS_MTIME, TEXTURE_MASK, OUTLINE_MASK, PREFIX, SUBDIRS = range(6)
+
+
+def _mask(suffixes, all_suffixes):
+    mask = 0
+    for suffix in suffixes:
+        mask |= 1 << all_suffixes.index(suffix)
+    return mask
+
+
+REQUIRED_TEXTURE_MASK = _mask(REQUIRED_MAT_FILES, TEXTURE_SUFFIXES)
+REQUIRED_OUTLINE_MASK = _mask(REQUIRED_OUTLINE_FILES, OUTLINE_SUFFIXES)
+OPTIONAL_OUTLINE_MASK = _mask(OPTIONAL_OUTLINE_FILES, OUTLINE_SUFFIXES)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _match_suffixes(name, suffixes):
+    """返回文件名匹配的后缀位掩码和第一个匹配后缀之前的前缀"""
+    mask = 0
+    prefix = ''
+    if name.endswith(suffixes):
+        for bit, suffix in enumerate(suffixes):
+            if name.endswith(suffix):
+                mask |= 1 << bit
+                prefix = prefix or name[:-len(suffix)]
+    return mask, prefix
+
+
+def scan_directory(path):
+    """扫描一个目录（不递归），返回该目录的记录"""
+    texture_mask = 0
+    outline_mask = 0
+    prefix = ''
+    subdirs = []
+    has_materials = False
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if name == 'Materials':
+                    has_materials = True
+                else:
+                    subdirs.append(name)
+            elif name.endswith('.png'):
+                mask, name_prefix = _match_suffixes(name, TEXTURE_SUFFIXES)
+                texture_mask |= mask
+                prefix = prefix or name_prefix
+
+    materials_mtime = None
+    if has_materials:
+        materials_directory = os.path.join(path, 'Materials')
+        materials_mtime = _mtime(materials_directory)
+        with os.scandir(materials_directory) as entries:
+            for entry in entries:
+                mask, name_prefix = _match_suffixes(entry.name, OUTLINE_SUFFIXES)
+                outline_mask |= mask
+                prefix = prefix or name_prefix
+    return [_mtime(path), materials_mtime, texture_mask, outline_mask, prefix, sorted(subdirs)]
+
+
+class CharacterLibrary:
+    """整个解包目录的角色索引，保存在插件缓存目录中，按目录修改时间增量更新
+
+    目录的修改时间只在其中的文件或子目录增删、改名时变化，所以修改时间不变的目录直接沿用记录，
+    只重新扫描变化的目录（仍然需要检查每个子目录的修改时间）
+    """
+
+    _instances = {}
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        key = hashlib.sha1(os.path.normcase(self.root).encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(get_cache_directory('character_library'), f'{key}.json')
+        self.entries = {}
+        self._characters = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if (data.get('version') == LIBRARY_VERSION
+                    and data.get('textures') == list(TEXTURE_SUFFIXES)
+                    and data.get('outlines') == list(OUTLINE_SUFFIXES)):
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def get(cls, root):
+        key = os.path.normcase(os.path.abspath(root))
+        library = cls._instances.get(key)
+        if library is None:
+            library = cls(root)
+            cls._instances[key] = library
+        return library
+
+    @classmethod
+    def invalidate(cls):
+        cls._instances.clear()
+
+    def _visit(self, relative_path, cached):
+        path = os.path.join(self.root, relative_path)
+        if (cached is not None and cached[MTIME] == _mtime(path)
+                and cached[MATERIALS_MTIME] == _mtime(os.path.join(path, 'Materials'))):
+            return relative_path, cached, False
+        try:
+            return relative_path, scan_directory(path), True
+        except OSError:
+            return relative_path, None, True
+
+    def scan(self, max_workers=None):
+        """用线程池并行遍历根目录，返回 (目录数, 重新扫描的目录数)"""
+        if not os.path.isdir(self.root):
+            raise NotADirectoryError(f'目录不存在: {self.root}')
+        previous = self.entries
+        entries = {}
+        rescanned = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {pool.submit(self._visit, '.', previous.get('.'))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    relative_path, entry, scanned = future.result()
+                    rescanned += scanned
+                    if entry is None:
+                        continue
+                    entries[relative_path] = entry
+                    for name in entry[SUBDIRS]:
+                        child = name if relative_path == '.' else f'{relative_path}/{name}'
+                        pending.add(pool.submit(self._visit, child, previous.get(child)))
+        self.entries = entries
+        self._characters = None
+        self.save()
+        return len(entries), rescanned
+
+    def save(self):
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({
+                    'version': LIBRARY_VERSION,
+                    'root': self.root,
+                    'textures': list(TEXTURE_SUFFIXES),
+                    'outlines': list(OUTLINE_SUFFIXES),
+                    'entries': self.entries,
+                }, file, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def characters(self):
+        """返回所有包含角色贴图或描边文件的目录，完整的排在前面（面板每次重绘都会调用，结果缓存到下次扫描）"""
+        if self._characters is not None:
+            return self._characters
+        result = []
+        for relative_path, entry in self.entries.items():
+            if not entry[TEXTURE_MASK] and not entry[OUTLINE_MASK]:
+                continue
+            textures_complete = entry[TEXTURE_MASK] & REQUIRED_TEXTURE_MASK == REQUIRED_TEXTURE_MASK
+            outlines_complete = entry[OUTLINE_MASK] & REQUIRED_OUTLINE_MASK == REQUIRED_OUTLINE_MASK
+            result.append({
+                'name': entry[PREFIX] or os.path.basename(relative_path),
+                'relative_path': relative_path,
+                'path': os.path.normpath(os.path.join(self.root, relative_path)),
+                'textures_complete': textures_complete,
+                'outlines_complete': outlines_complete,
+                'has_optional_outline': bool(entry[OUTLINE_MASK] & OPTIONAL_OUTLINE_MASK),
+                'complete': textures_complete and outlines_complete,
+            })
+        result.sort(key=lambda character: (not character['complete'], character['name'].lower()))
+        self._characters = result
+        return result
+
+    def find(self, query='', complete_only=False):
+        """按名称或相对路径（不区分大小写）查找角色目录"""
+        query = query.lower()
+        return [
+            character for character in self.characters()
+            if (not complete_only or character['complete'])
+            and (query in character['name'].lower() or query in character['relative_path'].lower())
+        ]
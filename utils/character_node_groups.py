@@ -0,0 +1,91 @@
+import bpy
+import json
+
+
+# 写时复制得到的节点组上记录的模板节点组名称和内容键
+COPY_SOURCE_PROPERTY = 'bobh_group_source'
+CONTENT_KEY_PROPERTY = 'bobh_group_key'
+
+
+def get_group_source(node_tree):
+    """返回节点组的模板名称，节点组本身就是模板时返回自己的完整名称"""
+    return node_tree.get(COPY_SOURCE_PROPERTY) or node_tree.name_full
+
+
+def group_content_key(node_tree, assignments):
+    """按写入后每个图片节点绑定的图片计算内容键，绑定相同图片的副本内容相同"""
+    images = []
+    for node in node_tree.nodes:
+        if node.type != 'TEX_IMAGE':
+            continue
+        image = assignments.get(node.name, node.image)
+        images.append((node.name, image.name_full if image is not None else ''))
+    return json.dumps([get_group_source(node_tree), sorted(images)], ensure_ascii=False)
+
+
+def find_group_template(source):
+    for node_tree in bpy.data.node_groups:
+        if node_tree.name_full == source:
+            return node_tree
+    return None
+
+
+def find_group_copy(source, content_key):
+    for node_tree in bpy.data.node_groups:
+        if node_tree.get(COPY_SOURCE_PROPERTY) == source and node_tree.get(CONTENT_KEY_PROPERTY) == content_key:
+            return node_tree
+    return None
+
+
+def remove_unused_copy(node_tree):
+    """删除不再被任何节点使用的副本（模板节点组保留）"""
+    if node_tree.get(COPY_SOURCE_PROPERTY) is not None and node_tree.users == 0:
+        bpy.data.node_groups.remove(node_tree)
+
+
+def assign_group_images(group_nodes, assignments):
+    """把图片写入节点组内的图片节点，只为需要写入角色贴图的节点组创建副本
+
+    group_nodes: 需要写入的节点组节点（例如头发和身体材质中的Shadow Ramp）
+    assignments: {组内图片节点名称: 图片}
+
+    引用同一个节点组的节点一起处理；写入后内容与已有副本相同时直接共用该副本，
+    否则复制一份（嵌套的节点组仍然共用）。返回新创建的副本数量
+    """
+    nodes_by_tree = {}
+    for group_node in group_nodes:
+        if group_node.node_tree is not None:
+            nodes_by_tree.setdefault(group_node.node_tree, []).append(group_node)
+
+    created = 0
+    for node_tree, tree_nodes in nodes_by_tree.items():
+        tree_assignments = {
+            name: image for name, image in assignments.items() if node_tree.nodes.get(name) is not None
+        }
+        if not tree_assignments:
+            continue
+        source = get_group_source(node_tree)
+        content_key = group_content_key(node_tree, tree_assignments)
+        if node_tree.get(CONTENT_KEY_PROPERTY) == content_key:
+            continue
+
+        target = find_group_copy(source, content_key)
+        if target is None:
+            if node_tree.get(COPY_SOURCE_PROPERTY) is not None and node_tree.users == len(tree_nodes):
+                # 副本只被这些节点使用，直接修改
+                target = node_tree
+            else:
+                # 总是从模板复制（模板已被删除时从当前副本复制），链接的节点组复制后成为本地数据
+                target = (find_group_template(source) or node_tree).copy()
+                target.use_fake_user = False
+                target[COPY_SOURCE_PROPERTY] = source
+                created += 1
+            for name, image in tree_assignments.items():
+                target.nodes[name].image = image
+            target[CONTENT_KEY_PROPERTY] = content_key
+
+        for group_node in tree_nodes:
+            group_node.node_tree = target
+        if target is not node_tree:
+            remove_unused_copy(node_tree)
+    return created
@@ -0,0 +1,130 @@
+import bpy
+import json
+
+
+# 角色材质上记录所属模型和用途的自定义属性
+MODEL_PROPERTY = 'bobh_model_name'
+ROLE_PROPERTY = 'bobh_role'
+# MMD根对象上记录上一次应用结果的自定义属性（json字符串）
+STATE_PROPERTY = 'bobh_apply_state'
+# 共享材质（多个角色共用一套材质）的模型名称标记，以及记录每个槽位所属模型的属性（json列表）
+SHARED_MODEL_NAME = '*'
+SHARED_SLOTS_PROPERTY = 'bobh_shared_slots'
+
+# 每个角色的材质用途，与 meterial_name_map 的键一致
+MATERIAL_ROLES = {
+    'Body_Mat_Name': ('GI_Body', 'Body'),
+    'Hair_Mat_Name': ('GI_Hair', 'Hair'),
+    'Face_Mat_Name': ('GI_Face', 'Face'),
+    'Face_Outline_Mat_Name': ('GI_Outlines', 'Face_Outline'),
+    'Hair_Outline_Mat_Name': ('GI_Outlines', 'Hair_Outline'),
+    'Body_Outline_Mat_Name': ('GI_Outlines', 'Body_Outline'),
+}
+
+
+def get_model_name(mmd_root_obj):
+    return f'{mmd_root_obj.mmd_root.name}_{mmd_root_obj.mmd_root.name_e}_'
+
+
+def default_material_name(model_name, role):
+    return f'GI_{model_name}_{MATERIAL_ROLES[role][1]}'
+
+
+def tag_character_material(material, model_name, role):
+    material[MODEL_PROPERTY] = model_name
+    material[ROLE_PROPERTY] = role
+
+
+def is_shared_material(material):
+    return material.get(MODEL_PROPERTY) == SHARED_MODEL_NAME
+
+
+def get_shared_slots(material):
+    try:
+        return json.loads(material.get(SHARED_SLOTS_PROPERTY, '[]'))
+    except ValueError:
+        return []
+
+
+def get_character_slot(material, model_name):
+    """返回角色在共享材质中的槽位编号，不使用该材质时返回None"""
+    slots = get_shared_slots(material)
+    return slots.index(model_name) if model_name in slots else None
+
+
+def slot_node_name(name, slot):
+    """共享材质中每个槽位的节点名称，第0个槽位使用模板中的节点本身"""
+    return name if slot == 0 else f'{name} #{slot}'
+
+
+def node_slot(name):
+    _, separator, slot = name.rpartition(' #')
+    return int(slot) if separator and slot.isdigit() else 0
+
+
+def is_character_material(material, model_name=None):
+    tagged_model = material.get(MODEL_PROPERTY)
+    if tagged_model is None:
+        return False
+    if model_name is None or tagged_model == model_name:
+        return True
+    return tagged_model == SHARED_MODEL_NAME and get_character_slot(material, model_name) is not None
+
+
+def load_apply_state(mmd_root_obj):
+    try:
+        return json.loads(mmd_root_obj.get(STATE_PROPERTY, '{}'))
+    except ValueError:
+        return {}
+
+
+def save_apply_state(mmd_root_obj, state):
+    mmd_root_obj[STATE_PROPERTY] = json.dumps(state, ensure_ascii=False)
+
+
+def find_existing_material_map(mmd_root_obj, model_name):
+    """返回上一次应用时创建的材质名称映射，材质缺失或标记不匹配时返回None"""
+    material_map = load_apply_state(mmd_root_obj).get('materials')
+    if not material_map or set(material_map) != set(MATERIAL_ROLES):
+        return None
+    for role, mat_name in material_map.items():
+        material = bpy.data.materials.get(mat_name)
+        if material is None or material.get(ROLE_PROPERTY) != role or not is_character_material(material, model_name):
+            return None
+    return material_map
+
+
+def get_material_map(mmd_root_obj):
+    """返回角色的材质名称映射，没有记录时按默认命名规则推断"""
+    model_name = get_model_name(mmd_root_obj)
+    material_map = find_existing_material_map(mmd_root_obj, model_name)
+    if material_map is None:
+        material_map = {role: default_material_name(model_name, role) for role in MATERIAL_ROLES}
+    return material_map
+
+
+def iter_character_texture_nodes(model_name=None):
+    """遍历角色材质（包括嵌套的节点组）中绑定了图片的纹理节点，model_name为None时遍历所有角色
+
+    共享材质中只遍历该角色槽位的节点
+    """
+    visited = set()
+    stack = []
+    for material in bpy.data.materials:
+        if material.node_tree is None or not is_character_material(material, model_name):
+            continue
+        slot = None
+        if model_name is not None and is_shared_material(material):
+            slot = get_character_slot(material, model_name)
+        stack.append((material.node_tree, slot))
+    while stack:
+        tree, slot = stack.pop()
+        if (tree.name_full, slot) in visited:
+            continue
+        visited.add((tree.name_full, slot))
+        for node in tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image is not None:
+                if slot is None or node_slot(node.name) == slot:
+                    yield node
+            elif node.type == 'GROUP' and node.node_tree is not None:
+                stack.append((node.node_tree, slot))
@@ -0,0 +1,125 @@
+import bpy
+import hashlib
+import os
+import re
+
+
+# 保存在图片数据块上的内容哈希，重新打开blend文件后依然可以复用
+HASH_PROPERTY = 'bobh_content_hash'
+
+# 规范化路径 -> ((mtime_ns, size), 内容哈希)，文件未修改时不再重新计算哈希
+_path_hash_cache = {}
+# 内容哈希 -> 图片数据块名称
+_hash_image_cache = {}
+
+_DUPLICATE_SUFFIX = re.compile(r'\.\d{3,}$')
+
+
+def _normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def compute_file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_content_hash(path):
+    """获取文件内容哈希，路径和修改时间都未变化时直接使用缓存"""
+    key = _normalize_path(path)
+    signature = _file_signature(path)
+    cached = _path_hash_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    content_hash = compute_file_hash(path)
+    _path_hash_cache[key] = (signature, content_hash)
+    return content_hash
+
+
+def remember_content_hash(path, content_hash):
+    """记录已经由其他流程计算好的哈希（例如贴图预检时顺带计算的）"""
+    _path_hash_cache[_normalize_path(path)] = (_file_signature(path), content_hash)
+
+
+def _get_cached_image(content_hash):
+    name = _hash_image_cache.get(content_hash)
+    if name is None:
+        return None
+    image = bpy.data.images.get(name)
+    if image is None or image.get(HASH_PROPERTY) != content_hash:
+        _hash_image_cache.pop(content_hash, None)
+        return None
+    return image
+
+
+def _find_image_by_hash(content_hash):
+    for image in bpy.data.images:
+        if image.get(HASH_PROPERTY) == content_hash:
+            return image
+    return None
+
+
+def load_image(path, content_hash=None):
+    """按内容哈希加载图片，已经存在相同内容的图片数据块时直接复用"""
+    if content_hash is None:
+        content_hash = get_content_hash(path)
+    else:
+        # 预检时已经完整读取文件计算了哈希，记录到路径缓存中，之后（例如生成代理贴图时）不再重新读取文件
+        remember_content_hash(path, content_hash)
+
+    image = _get_cached_image(content_hash)
+    if image is None:
+        image = _find_image_by_hash(content_hash)
+    if image is None:
+        image = bpy.data.images.load(path, check_existing=False)
+        image[HASH_PROPERTY] = content_hash
+
+    _hash_image_cache[content_hash] = image.name
+    return image
+
+
+def evict_unused_duplicates():
+    """删除没有用户的重复图片数据块（相同内容哈希，或同一文件重复加载产生的 .001 副本）
+
+    返回删除的数据块数量
+    """
+    kept_hashes = set()
+    kept_paths = set()
+    for image in bpy.data.images:
+        if image.users == 0:
+            continue
+        content_hash = image.get(HASH_PROPERTY)
+        if content_hash is not None:
+            kept_hashes.add(content_hash)
+            if image.filepath:
+                kept_paths.add(_normalize_path(bpy.path.abspath(image.filepath)))
+
+    to_remove = []
+    for image in bpy.data.images:
+        if image.users != 0 or image.use_fake_user:
+            continue
+        content_hash = image.get(HASH_PROPERTY)
+        if content_hash is not None:
+            if content_hash in kept_hashes:
+                to_remove.append(image)
+            continue
+        if (_DUPLICATE_SUFFIX.search(image.name) and image.filepath
+                and _normalize_path(bpy.path.abspath(image.filepath)) in kept_paths):
+            to_remove.append(image)
+
+    for image in to_remove:
+        bpy.data.images.remove(image)
+    return len(to_remove)
+
+
+def clear_cache():
+    _path_hash_cache.clear()
+    _hash_image_cache.clear()
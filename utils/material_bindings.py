@@ -0,0 +1,218 @@
+from ..bobh_exception import BobHException
+from .character_node_groups import assign_group_images
+from .character_state import MATERIAL_ROLES, slot_node_name
+from .preset_library import PRESET_FILES
+
+
+# 贴图后缀 -> 图片设置和绑定目标 {材质用途键: 节点路径}
+# 节点路径是从材质节点树开始的节点名称，前面的节点为节点组节点（进入其节点组继续查找），最后一个为图片节点
+GENSHIN_V3_4_TEXTURES = {
+    '_Face_Diffuse.png': {
+        'colorspace': 'sRGB',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Face_Mat_Name': ('Face_Diffuse',),
+            'Face_Outline_Mat_Name': ('Outline_Diffuse',),
+        },
+    },
+    '_Hair_Diffuse.png': {
+        'colorspace': 'sRGB',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Hair_Mat_Name': ('Body_Diffuse_UV0',),
+            'Hair_Outline_Mat_Name': ('Outline_Diffuse',),
+        },
+    },
+    '_Hair_Lightmap.png': {
+        'colorspace': 'Non-Color',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Hair_Mat_Name': ('Body_Lightmap_UV0',),
+            'Hair_Outline_Mat_Name': ('Outline_Lightmap',),
+        },
+    },
+    '_Hair_Shadow_Ramp.png': {
+        'colorspace': 'sRGB',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Hair_Mat_Name': ('Shadow Ramp', 'Hair_Shadow_Ramp'),
+        },
+    },
+    '_Body_Diffuse.png': {
+        'colorspace': 'sRGB',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Body_Mat_Name': ('Body_Diffuse_UV0',),
+            'Body_Outline_Mat_Name': ('Outline_Diffuse',),
+        },
+    },
+    '_Body_Lightmap.png': {
+        'colorspace': 'Non-Color',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Body_Mat_Name': ('Body_Lightmap_UV0',),
+            'Body_Outline_Mat_Name': ('Outline_Lightmap',),
+        },
+    },
+    '_Body_Shadow_Ramp.png': {
+        'colorspace': 'sRGB',
+        'alpha_mode': 'CHANNEL_PACKED',
+        'targets': {
+            'Body_Mat_Name': ('Shadow Ramp', 'Body_Shadow_Ramp'),
+        },
+    },
+}
+
+# 描边颜色: 描边节点组节点路径、描边颜色键 -> 节点组输入，以及 描边材质用途键 -> 描边文件类型
+GENSHIN_V3_4_OUTLINES = {
+    'group': ('Outlines',),
+    'color_inputs': {f'Color{i}': f'Outline Color {i}' for i in range(1, 6)},
+    'targets': {
+        'Face_Outline_Mat_Name': 'FaceOutline',
+        'Hair_Outline_Mat_Name': 'HairOutline',
+        'Body_Outline_Mat_Name': 'BodyOutline',
+    },
+}
+
+# Shader预设文件 -> 绑定表，新版本的预设只需要增加一张表
+BINDING_SCHEMAS = {
+    'Genshin Impact v3.4.blend': {
+        'textures': GENSHIN_V3_4_TEXTURES,
+        'outlines': GENSHIN_V3_4_OUTLINES,
+    },
+}
+
+# 编译后的节点路径: (模板名称, 节点路径) -> 每一级节点在所在节点树中的索引
+# 材质和节点组复制后节点顺序不变，在模板上解析一次后所有角色的副本都按索引直接取节点
+_compiled_paths = {}
+
+
+def get_binding_schema(preset_file=None):
+    """返回当前Shader预设的绑定表"""
+    if preset_file is None:
+        preset_file = PRESET_FILES['SHADER']
+    schema = BINDING_SCHEMAS.get(preset_file)
+    if schema is None:
+        raise BobHException(f'没有Shader预设 {preset_file} 的材质绑定表')
+    return schema
+
+
+def slot_path(path, slot):
+    """共享材质中图片节点（路径的最后一级）按槽位命名，节点组节点不变"""
+    if slot is None:
+        return path
+    return path[:-1] + (slot_node_name(path[-1], slot),)
+
+
+def _follow_indices(node_tree, path, indices):
+    node = None
+    for depth, (name, index) in enumerate(zip(path, indices)):
+        if depth:
+            node_tree = node.node_tree
+            if node_tree is None:
+                return None
+        nodes = node_tree.nodes
+        if index >= len(nodes) or nodes[index].name != name:
+            return None
+        node = nodes[index]
+    return node
+
+
+def _compile_path(node_tree, path):
+    indices = []
+    node = None
+    for depth, name in enumerate(path):
+        if depth:
+            node_tree = node.node_tree
+            if node_tree is None:
+                return None, None
+        for index, candidate in enumerate(node_tree.nodes):
+            if candidate.name == name:
+                break
+        else:
+            return None, None
+        node = candidate
+        indices.append(index)
+    return node, tuple(indices)
+
+
+def resolve_node_path(node_tree, path, template_name):
+    """按编译后的索引取节点，索引失效（名称不符）时按名称重新解析并更新编译结果，找不到时返回None"""
+    key = (template_name, path)
+    indices = _compiled_paths.get(key)
+    if indices is not None:
+        node = _follow_indices(node_tree, path, indices)
+        if node is not None:
+            return node
+    node, indices = _compile_path(node_tree, path)
+    if node is not None:
+        _compiled_paths[key] = indices
+    return node
+
+
+def _require_node(material, role, path):
+    if material.node_tree is None:
+        raise BobHException(f'材质 {material.name} 没有使用节点')
+    node = resolve_node_path(material.node_tree, path, MATERIAL_ROLES[role][0])
+    if node is None:
+        raise BobHException(f'材质 {material.name} 中找不到节点: {" / ".join(path)}')
+    return node
+
+
+def bind_textures(schema, materials, images, slot=None):
+    """按绑定表把图片写入角色材质，返回写入的图片节点数量
+
+    materials: 材质用途键 -> 材质
+    images: 贴图后缀 -> 图片
+    slot: 共享材质中角色的槽位，每个角色单独的材质时为None
+    """
+    group_nodes = []
+    group_assignments = {}
+    bound = 0
+    for suffix, binding in schema['textures'].items():
+        image = images[suffix]
+        image.colorspace_settings.name = binding['colorspace']
+        image.alpha_mode = binding['alpha_mode']
+        for role, path in binding['targets'].items():
+            material = materials[role]
+            if len(path) > 1 and slot is None:
+                # 节点组被所有角色的材质共用，写入前按需复制（写时复制），绑定相同贴图的角色共用同一个副本
+                group_nodes.append(_require_node(material, role, path[:-1]))
+                group_assignments[path[-1]] = image
+            else:
+                # 共享材质的节点组在创建时已经复制并按槽位展开，只属于这套共享材质
+                _require_node(material, role, slot_path(path, slot)).image = image
+            bound += 1
+
+    if group_nodes:
+        assign_group_images(list(dict.fromkeys(group_nodes)), group_assignments)
+    return bound
+
+
+def bind_outline_colors(schema, materials, outline_info, slot=None):
+    """按绑定表写入描边颜色：每个角色单独的材质写入描边节点组输入的默认值，共享材质写入角色槽位的RGB节点"""
+    outlines = schema['outlines']
+    for role, outline_type in outlines['targets'].items():
+        material = materials[role]
+        colors = outline_info[outline_type]
+        group_node = _require_node(material, role, outlines['group'])
+        for color_key, input_name in outlines['color_inputs'].items():
+            color = colors[color_key]
+            value = (color['r'], color['g'], color['b'], color['a'])
+            if slot is None:
+                group_node.inputs[input_name].default_value = value
+            else:
+                _require_node(material, role, (slot_node_name(input_name, slot),)).outputs[0].default_value = value
+
+
+def slot_texture_nodes(schema):
+    """共享材质中每个槽位需要单独一份的节点: (材质中的图片节点名称, {节点组节点名称: 组内图片节点名称})"""
+    texture_nodes = set()
+    group_texture_nodes = {}
+    for binding in schema['textures'].values():
+        for path in binding['targets'].values():
+            if len(path) == 1:
+                texture_nodes.add(path[0])
+            else:
+                group_texture_nodes.setdefault(path[-2], set()).add(path[-1])
+    return texture_nodes, group_texture_nodes
@@ -0,0 +1,118 @@
+import json
+import os
+import re
+from ..bobh_exception import BobHException
+
+
+# 默认关键词表，按贴图名称（不区分大小写）匹配
+DEFAULT_KEYWORD_TABLE = {
+    'face': ['面', '颜', 'face'],
+    # 特殊处理"spa_h.png"这种情况
+    'hair': ['发', '髪', '髮', 'hair', 'spa_h'],
+    # 更精确的身体材质关键词
+    'body': ['体', '肌', 'skin'],
+    'dress': ['服', '衣', 'dress', '裙', '裤'],
+    'eye': ['目', 'eye'],
+}
+
+# 排除的材质名称关键词，按材质名称（区分大小写）匹配
+DEFAULT_EXCLUDE_KEYWORDS = ['面具', 'mask', 'Mask', '舌', 'teeth', 'Teeth', '歯']
+
+# 类别优先级，同时匹配多个类别时取靠前的
+CATEGORY_PRIORITY = ['face', 'hair', 'body', 'dress', 'eye']
+
+# 类别 -> 替换成的角色材质（服装和眼睛也使用身体材质）
+CATEGORY_ROLES = {
+    'face': 'Face_Mat_Name',
+    'hair': 'Hair_Mat_Name',
+    'body': 'Body_Mat_Name',
+    'dress': 'Body_Mat_Name',
+    'eye': 'Body_Mat_Name',
+}
+
+
+def load_keyword_table(path):
+    """读取额外的关键词表json: {"face": [...], "hair": [...], ..., "exclude": [...]}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            table = json.load(file)
+    except (OSError, ValueError) as e:
+        raise BobHException(f'无法读取材质关键词表: {path} - {e}')
+    unknown = set(table) - set(CATEGORY_PRIORITY) - {'exclude'}
+    if unknown:
+        raise BobHException(f'材质关键词表中有未知类别: {", ".join(sorted(unknown))}')
+    return table
+
+
+class MaterialClassifier:
+    """把所有关键词表编译为一个正则，按优先级识别材质类别，并按贴图名称缓存结果"""
+
+    def __init__(self, extra_tables=()):
+        keywords = {category: list(DEFAULT_KEYWORD_TABLE.get(category, ())) for category in CATEGORY_PRIORITY}
+        exclude_keywords = list(DEFAULT_EXCLUDE_KEYWORDS)
+        for table in extra_tables:
+            for category, words in table.items():
+                if category == 'exclude':
+                    exclude_keywords.extend(words)
+                else:
+                    keywords[category].extend(words)
+
+        # 关键词 -> 优先级，同一个关键词出现在多个类别时取优先级最高的
+        self._keyword_priority = {}
+        for priority, category in enumerate(CATEGORY_PRIORITY):
+            for word in keywords[category]:
+                self._keyword_priority.setdefault(word.lower(), priority)
+
+        # 按优先级、长度排序，使用前瞻断言以便找出所有（包括重叠的）匹配
+        ordered = sorted(self._keyword_priority, key=lambda word: (self._keyword_priority[word], -len(word)))
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(word) for word in ordered) + '))') if ordered else None
+        self._exclude_pattern = (
+            re.compile('|'.join(re.escape(word) for word in exclude_keywords)) if exclude_keywords else None
+        )
+        self._cache = {}
+
+    def is_excluded(self, material_name):
+        return self._exclude_pattern is not None and self._exclude_pattern.search(material_name) is not None
+
+    def classify_texture(self, texture_name):
+        """返回贴图名称对应的类别，无法识别时返回None"""
+        key = texture_name.lower()
+        if key in self._cache:
+            return self._cache[key]
+
+        best = None
+        if self._pattern is not None:
+            for match in self._pattern.finditer(key):
+                priority = self._keyword_priority[match.group(1)]
+                if best is None or priority < best:
+                    best = priority
+                    if best == 0:
+                        break
+        category = CATEGORY_PRIORITY[best] if best is not None else None
+        self._cache[key] = category
+        return category
+
+    def classify_role(self, texture_name):
+        """返回贴图名称对应的角色材质用途键，无法识别时返回None"""
+        return CATEGORY_ROLES.get(self.classify_texture(texture_name))
+
+
+# (关键词表路径, 修改时间) -> 分类器
+_classifier_cache = {}
+
+
+def get_material_classifier(extra_table_paths=()):
+    """获取分类器，关键词表文件未变化时复用已编译的分类器（及其结果缓存）"""
+    key = []
+    for path in extra_table_paths:
+        try:
+            key.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            raise BobHException(f'找不到材质关键词表: {path}')
+    key = tuple(key)
+    classifier = _classifier_cache.get(key)
+    if classifier is None:
+        classifier = MaterialClassifier([load_keyword_table(path) for path, _ in key])
+        _classifier_cache.clear()
+        _classifier_cache[key] = classifier
+    return classifier
@@ -0,0 +1,162 @@
+import bpy
+from ..bobh_exception import BobHException
+from .character_state import get_model_name, find_existing_material_map, iter_character_texture_nodes
+from .image_cache import HASH_PROPERTY
+from .mmd_model_index import MMDModelIndex
+from .preset_library import find_preset_datablock
+from .texture_preflight import read_png_header
+from .texture_proxy import PROXY_SOURCE_PROPERTY
+
+
+# 最近一次统计的结果，供面板显示
+_last_report = None
+
+# PNG颜色类型 -> 通道数
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+
+def get_last_report():
+    return _last_report
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.2f} GB'
+
+
+def estimate_image_bytes(width, height, is_float):
+    """解码后的内存占用：Blender在内存中总是以RGBA保存，字节图片每通道1字节，浮点图片每通道4字节"""
+    return width * height * 4 * (4 if is_float else 1)
+
+
+def image_dimensions(image):
+    """返回 (宽, 高, 通道数, 是否浮点)，无法确定时返回None
+
+    读取size等属性会让Blender解码还没有加载的图片，未加载的图片只读取PNG文件头（IHDR）
+    """
+    if image.has_data:
+        width, height = image.size
+        return width, height, image.channels, image.is_float
+    try:
+        width, height, bit_depth, color_type = read_png_header(bpy.path.abspath(image.filepath))
+    except BobHException:
+        return None
+    # Blender把16位PNG作为浮点图片加载
+    return width, height, PNG_CHANNELS[color_type], bit_depth == 16
+
+
+def image_info(image):
+    width, height, channels, is_float = image_dimensions(image) or (0, 0, 0, False)
+    return {
+        'name': image.name,
+        'filepath': image.filepath,
+        'width': width,
+        'height': height,
+        'channels': channels,
+        'is_float': is_float,
+        'is_proxy': image.get(PROXY_SOURCE_PROPERTY) is not None,
+        'loaded': image.has_data,
+        'bytes': estimate_image_bytes(width, height, is_float),
+        'characters': [],
+    }
+
+
+def find_outline_modifier(mesh_obj, outline_group):
+    if outline_group is None:
+        return None
+    for modifier in mesh_obj.modifiers:
+        if modifier.type == 'NODES' and modifier.node_group == outline_group:
+            return modifier
+    return None
+
+
+def measure_outline_geometry(mesh_obj, modifier, depsgraph):
+    """返回描边修改器增加的 (顶点数, 面角数)：求值后的网格减去原始网格"""
+    if modifier is None or not modifier.show_viewport:
+        return 0, 0
+    evaluated = mesh_obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    try:
+        vertices = len(mesh.vertices) - len(mesh_obj.data.vertices)
+        corners = len(mesh.loops) - len(mesh_obj.data.loops)
+    finally:
+        evaluated.to_mesh_clear()
+    return max(0, vertices), max(0, corners)
+
+
+def find_character_roots(scene):
+    """场景中已经应用过材质的MMD模型根对象"""
+    return [
+        obj for obj in scene.objects
+        if getattr(obj, 'mmd_type', None) == 'ROOT'
+        and find_existing_material_map(obj, get_model_name(obj)) is not None
+    ]
+
+
+def build_memory_report(context, max_texture_size=2048):
+    """统计每个角色绑定的贴图和描边增加的几何数据，以及整个场景的合计"""
+    global _last_report
+    depsgraph = context.evaluated_depsgraph_get()
+    outline_group = find_preset_datablock('node_groups', 'GI_Outline')
+
+    images = {}
+    characters = []
+    for root_obj in find_character_roots(context.scene):
+        model_name = get_model_name(root_obj)
+        character = {
+            'name': root_obj.name,
+            'model_name': model_name,
+            'images': [],
+            'image_bytes': 0,
+            'outline_vertices': 0,
+            'outline_corners': 0,
+            'meshes': 0,
+        }
+        for node in iter_character_texture_nodes(model_name):
+            info = images.get(node.image.name_full)
+            if info is None:
+                info = images[node.image.name_full] = image_info(node.image)
+            if root_obj.name not in info['characters']:
+                info['characters'].append(root_obj.name)
+                character['images'].append(info['name'])
+                character['image_bytes'] += info['bytes']
+
+        for mesh_obj in MMDModelIndex.get(root_obj).meshes:
+            character['meshes'] += 1
+            modifier = find_outline_modifier(mesh_obj, outline_group)
+            vertices, corners = measure_outline_geometry(mesh_obj, modifier, depsgraph)
+            character['outline_vertices'] += vertices
+            character['outline_corners'] += corners
+        characters.append(character)
+
+    # 内容相同（哈希或文件路径相同）却是不同数据块的贴图
+    by_content = {}
+    for info in images.values():
+        image = bpy.data.images.get(info['name'])
+        key = (image.get(HASH_PROPERTY) if image is not None else None) or bpy.path.abspath(info['filepath'])
+        if key:
+            by_content.setdefault(key, []).append(info['name'])
+    duplicates = [names for names in by_content.values() if len(names) > 1]
+    oversized = [
+        info['name'] for info in images.values()
+        if max(info['width'], info['height']) > max_texture_size
+    ]
+
+    _last_report = {
+        'characters': characters,
+        'images': images,
+        'scene': {
+            'images': len(images),
+            'image_bytes': sum(info['bytes'] for info in images.values()),
+            'shared_images': sum(1 for info in images.values() if len(info['characters']) > 1),
+            'outline_vertices': sum(character['outline_vertices'] for character in characters),
+            'outline_corners': sum(character['outline_corners'] for character in characters),
+        },
+        'duplicates': duplicates,
+        'oversized': oversized,
+        'max_texture_size': max_texture_size,
+    }
+    return _last_report
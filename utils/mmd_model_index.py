@@ -0,0 +1,184 @@
+import bpy
+from bpy.app.handlers import persistent
+from collections import deque
+from .character_state import get_model_name, get_material_map
+
+
+HEAD_BONE_NAME = '頭'
+
+# 每个角色创建的空物体名称后缀
+CHARACTER_EMPTIES = {
+    'light_direction': 'Light Direction',
+    'head_origin': 'Head Origin',
+    'head_forward': 'Head Forward',
+    'head_up': 'Head Up',
+}
+
+
+def find_mmd_root_object(obj):
+    while obj is not None and getattr(obj, 'mmd_type', None) != 'ROOT':
+        obj = obj.parent
+    return obj
+
+
+class MMDModelIndex:
+    """MMD模型的查找结果缓存：骨骼、mesh、头部骨骼、角色空物体和材质
+
+    只保存数据块名称，使用时再通过名称取回，撤销或删除物体后不会持有失效的引用
+    """
+
+    # 根对象名称 -> 索引
+    _cache = {}
+    # 已建立索引的层级中的物体名称 -> (根对象名称, 父级名称)，用于判断物体的更新是否改变了层级结构
+    _members = {}
+
+    def __init__(self, root_obj):
+        self.root_name = root_obj.name
+        self.model_name = get_model_name(root_obj)
+        self.object_count = len(bpy.data.objects)
+
+        armature_name = None
+        mesh_names = []
+        parents = {}
+        queue = deque(root_obj.children)
+        while queue:
+            obj = queue.popleft()
+            parents[obj.name] = obj.parent.name
+            if obj.type == 'ARMATURE' and armature_name is None:
+                armature_name = obj.name
+            elif obj.type == 'MESH':
+                mesh_names.append(obj.name)
+            queue.extend(obj.children)
+        self.armature_name = armature_name
+        self.mesh_names = mesh_names
+        self.parents = parents
+
+        armature_obj = self.armature
+        self.has_head_bone = armature_obj is not None and HEAD_BONE_NAME in armature_obj.data.bones
+
+    @property
+    def root(self):
+        return bpy.data.objects.get(self.root_name)
+
+    @property
+    def armature(self):
+        if self.armature_name is None:
+            return None
+        return bpy.data.objects.get(self.armature_name)
+
+    @property
+    def meshes(self):
+        meshes = (bpy.data.objects.get(name) for name in self.mesh_names)
+        return [obj for obj in meshes if obj is not None]
+
+    def get_empty(self, key):
+        return bpy.data.objects.get(f'{self.model_name}{CHARACTER_EMPTIES[key]}')
+
+    @property
+    def materials(self):
+        """材质用途键 -> 材质数据块（不存在的为None）"""
+        return {
+            role: bpy.data.materials.get(mat_name)
+            for role, mat_name in get_material_map(self.root).items()
+        }
+
+    def is_valid(self, root_obj):
+        if root_obj.name != self.root_name or get_model_name(root_obj) != self.model_name:
+            return False
+        # 新增物体（例如导入或新建后作为子级）时物体总数变化
+        if len(bpy.data.objects) != self.object_count:
+            return False
+        if self.armature_name is not None and self.armature is None:
+            return False
+        for name in self.mesh_names:
+            obj = bpy.data.objects.get(name)
+            if obj is None or obj.parent is None or obj.parent.name != self.parents[name]:
+                return False
+        return True
+
+    @classmethod
+    def get(cls, root_obj):
+        index = cls._cache.get(root_obj.name)
+        if index is None or not index.is_valid(root_obj):
+            if index is not None:
+                for name in index.parents:
+                    cls._members.pop(name, None)
+            index = cls(root_obj)
+            cls._cache[root_obj.name] = index
+            for name, parent_name in index.parents.items():
+                cls._members[name] = (index.root_name, parent_name)
+        return index
+
+    @classmethod
+    def get_for_object(cls, obj):
+        """返回物体所属MMD模型的索引，物体不属于MMD模型时返回None"""
+        root_obj = find_mmd_root_object(obj)
+        if root_obj is None:
+            return None
+        return cls.get(root_obj)
+
+    @classmethod
+    def invalidate(cls):
+        cls._cache.clear()
+        cls._members.clear()
+
+    @classmethod
+    def changes_structure(cls, obj):
+        """物体的更新是否改变了已建立索引的层级：层级中的物体改变了父级，或者其他物体成为层级的子级"""
+        parent_name = obj.parent.name if obj.parent is not None else None
+        member = cls._members.get(obj.name)
+        if member is not None:
+            return member[1] != parent_name
+        if parent_name is None:
+            return False
+        root_obj = find_mmd_root_object(obj)
+        return root_obj is not None and root_obj.name in cls._cache
+
+
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+    cache = MMDModelIndex._cache
+    if not cache or not depsgraph.id_type_updated('OBJECT'):
+        return
+    # 变换、动画播放和姿态的更新不影响索引，只在新增、删除物体或改变层级时使缓存失效
+    if any(len(bpy.data.objects) != index.object_count for index in cache.values()):
+        MMDModelIndex.invalidate()
+        return
+    for update in depsgraph.updates:
+        obj = getattr(update.id, 'original', update.id)
+        if isinstance(obj, bpy.types.Object) and MMDModelIndex.changes_structure(obj):
+            MMDModelIndex.invalidate()
+            return
+
+
+@persistent
+def _on_file_changed(*args):
+    MMDModelIndex.invalidate()
+
+
+_HANDLERS = (
+    ('depsgraph_update_post', _on_depsgraph_update),
+    ('load_post', _on_file_changed),
+    ('undo_post', _on_file_changed),
+    ('redo_post', _on_file_changed),
+)
+
+
+def register():
+    for handler_name, handler in _HANDLERS:
+        handlers = getattr(bpy.app.handlers, handler_name)
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    for handler_name, handler in _HANDLERS:
+        handlers = getattr(bpy.app.handlers, handler_name)
+        if handler in handlers:
+            handlers.remove(handler)
+    MMDModelIndex.invalidate()
+
+
+# 启用插件时不导入这个模块，第一次使用时导入并注册处理函数（只有用过索引才需要在场景变化时清除缓存），
+# 重新启用插件时由registry.register_handlers为已经导入的模块重新注册
+register()
@@ -0,0 +1,47 @@
+# 正在进行的分步操作（供窗口管理器的进度条和面板显示）: {'operator', 'stage', 'character', 'value'}，没有时为None
+_active = None
+
+
+def get_active_progress():
+    return _active
+
+
+def run_steps(steps):
+    """一次执行完生成器的所有步骤，返回生成器的返回值"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _redraw(context):
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+def begin_progress(context, operator_name):
+    global _active
+    _active = {'operator': operator_name, 'stage': '', 'character': '', 'value': 0.0}
+    context.window_manager.progress_begin(0, 100)
+    _redraw(context)
+
+
+def update_progress(context, stage, character, value):
+    """value为0到1之间的完成比例"""
+    if _active is None:
+        return
+    _active.update(stage=stage, character=character, value=value)
+    context.window_manager.progress_update(int(value * 100))
+    _redraw(context)
+
+
+def end_progress(context):
+    global _active
+    if _active is None:
+        return
+    _active = None
+    context.window_manager.progress_end()
+    _redraw(context)
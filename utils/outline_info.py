@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import re
+from .cache_directory import get_cache_directory
+
+
+# 描边颜色在材质json中的属性名
+OUTLINE_COLOR_PROPERTIES = {
+    'Color1': '_OutlineColor',
+    'Color2': '_OutlineColor2',
+    'Color3': '_OutlineColor3',
+    'Color4': '_OutlineColor4',
+    'Color5': '_OutlineColor5',
+}
+
+SIDECAR_VERSION = 1
+
+_M_COLORS_PATTERN = re.compile(r'"m_Colors"\s*:\s*')
+_decoder = json.JSONDecoder()
+
+
+def _colors_to_dict(colors):
+    # 有些导出工具把 m_Colors 保存为 [{"first": name, "second": color}] 形式
+    if isinstance(colors, list):
+        return {item['first']: item['second'] for item in colors}
+    return colors
+
+
+def extract_outline_colors(path):
+    """只解析 m_SavedProperties.m_Colors 部分，读取五个描边颜色"""
+    with open(path, 'r', encoding='utf-8') as file:
+        text = file.read()
+
+    match = _M_COLORS_PATTERN.search(text)
+    if match is not None:
+        colors, _ = _decoder.raw_decode(text, match.end())
+    else:
+        colors = json.loads(text)['m_SavedProperties']['m_Colors']
+    colors = _colors_to_dict(colors)
+
+    return {key: colors[prop] for key, prop in OUTLINE_COLOR_PROPERTIES.items()}
+
+
+def sidecar_path(directory):
+    """材质目录对应的描边颜色缓存文件，保存在插件缓存目录中，不写入用户的解包目录（可能只读或受版本管理，
+    写入还会改变目录的修改时间，使贴图索引和角色库索引失效）"""
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(directory)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(get_cache_directory('outline_colors'), f'{key}.json')
+
+
+class OutlineSidecarCache:
+    """按目录保存的描边颜色缓存，以文件修改时间和大小判断是否需要重新解析"""
+
+    _instances = {}
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = sidecar_path(directory)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == SIDECAR_VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def get(cls, directory):
+        key = os.path.normcase(os.path.abspath(directory))
+        cache = cls._instances.get(key)
+        if cache is None:
+            cache = cls(directory)
+            cls._instances[key] = cache
+        return cache
+
+    @classmethod
+    def invalidate(cls):
+        cls._instances.clear()
+
+    def read_outline_colors(self, path):
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        entry = self.entries.get(name)
+        if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['colors']
+
+        colors = extract_outline_colors(path)
+        self.entries[name] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'colors': colors}
+        self.dirty = True
+        return colors
+
+    def save(self):
+        """写回缓存文件，无法写入时静默跳过"""
+        if not self.dirty:
+            return
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': SIDECAR_VERSION, 'entries': self.entries}, file)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+        except OSError:
+            pass
@@ -0,0 +1,206 @@
+import bpy
+import json
+import os
+from ..bobh_exception import BobHException
+from .cache_directory import get_cache_directory
+from .image_cache import compute_file_hash
+from ..preferences import use_linked_presets, get_preset_library_directory
+
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+DATA_DIR = os.path.join(ADDON_DIR, 'Data')
+
+# 插件自带的预设文件
+PRESET_FILES = {
+    'SHADER': 'Genshin Impact v3.4.blend',
+    'OUTLINES': 'Genshin Impact Outlines v3.blend',
+    'POSTPROCESS': 'Genshin Impact Post-Processing.blend',
+}
+
+# 清单中记录的数据块类型
+CATEGORIES = ('materials', 'node_groups', 'objects')
+
+# 每个流程步骤需要从各个预设文件导入的资源: {预设文件键: {类型: {原名称: 导入后名称}}}
+PIPELINE_ASSETS = {
+    'apply_shader': {
+        'SHADER': {
+            'materials': {
+                'HoYoverse - Genshin Body': 'GI_Body',
+                'HoYoverse - Genshin Face': 'GI_Face',
+                'HoYoverse - Genshin Hair': 'GI_Hair',
+                'HoYoverse - Genshin Outlines': 'GI_Outlines',
+            },
+            'objects': {
+                'Light Direction': 'Light Direction Template',
+            },
+            'node_groups': {
+                'Light Vectors': 'Light Vectors',
+            },
+        },
+    },
+    'apply_light_and_outline': {
+        'OUTLINES': {
+            'node_groups': {
+                'HoYoverse - Genshin Impact Outlines': 'GI_Outline',
+            },
+        },
+    },
+    'apply_postprocess': {
+        'POSTPROCESS': {
+            'node_groups': {
+                'HoYoverse - Post Processing': 'GI_PostProcessing',
+            },
+        },
+    },
+}
+
+MANIFEST_FILE_NAME = 'preset_manifest.json'
+MANIFEST_VERSION = 1
+
+# 磁盘缓存的内存副本: {'files': {路径: {mtime_ns, size, hash}}, 'manifests': {hash: 清单}}
+_manifest_cache = None
+
+
+def get_preset_path(preset_key):
+    """优先使用偏好设置中的预设库目录（工作室共享副本），其中没有该文件时使用插件自带的Data目录"""
+    library_directory = get_preset_library_directory()
+    if library_directory:
+        path = os.path.join(library_directory, PRESET_FILES[preset_key])
+        if os.path.exists(path):
+            return path
+    return os.path.join(DATA_DIR, PRESET_FILES[preset_key])
+
+
+# {类型: {导入后名称: 原名称}}，用于在链接模式下找到未重命名的库数据
+_SOURCE_NAMES = {}
+for _step_assets in PIPELINE_ASSETS.values():
+    for _preset_assets in _step_assets.values():
+        for _category, _names in _preset_assets.items():
+            for _source_name, _local_name in _names.items():
+                _SOURCE_NAMES.setdefault(_category, {})[_local_name] = _source_name
+
+
+def find_preset_datablock(category, local_name):
+    """按导入后的名称查找预设数据块
+
+    追加模式下数据块已被重命名；链接模式下库数据不能重命名，按原名称查找链接的数据块
+    """
+    collection = getattr(bpy.data, category)
+    datablock = collection.get(local_name)
+    if datablock is not None:
+        return datablock
+    source_name = _SOURCE_NAMES.get(category, {}).get(local_name)
+    if source_name is None:
+        return None
+    for datablock in collection:
+        if datablock.library is not None and datablock.name == source_name:
+            return datablock
+    return None
+
+
+def _manifest_cache_path():
+    return os.path.join(get_cache_directory(), MANIFEST_FILE_NAME)
+
+
+def _load_manifest_cache():
+    global _manifest_cache
+    if _manifest_cache is None:
+        _manifest_cache = {'files': {}, 'manifests': {}}
+        try:
+            with open(_manifest_cache_path(), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == MANIFEST_VERSION:
+                _manifest_cache['files'] = data.get('files', {})
+                _manifest_cache['manifests'] = data.get('manifests', {})
+        except (OSError, ValueError):
+            pass
+    return _manifest_cache
+
+
+def _save_manifest_cache():
+    cache = _load_manifest_cache()
+    try:
+        path = _manifest_cache_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'version': MANIFEST_VERSION, **cache}, file, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
+def _read_library_names(blend_path):
+    # 不向data_to赋值时只读取名称列表，不会导入任何数据
+    with bpy.data.libraries.load(blend_path, link=False) as (data_from, _):
+        return {category: list(getattr(data_from, category)) for category in CATEGORIES}
+
+
+def get_manifest(blend_path):
+    """返回blend文件中各类数据块的名称清单，按文件哈希缓存，文件未变化时不打开库文件"""
+    if not os.path.exists(blend_path):
+        raise BobHException(f'预设文件未找到: {blend_path}')
+
+    cache = _load_manifest_cache()
+    key = os.path.normcase(os.path.abspath(blend_path))
+    stat = os.stat(blend_path)
+    file_entry = cache['files'].get(key)
+    if file_entry is None or file_entry['mtime_ns'] != stat.st_mtime_ns or file_entry['size'] != stat.st_size:
+        file_entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': compute_file_hash(blend_path)}
+        cache['files'][key] = file_entry
+        _save_manifest_cache()
+
+    manifest = cache['manifests'].get(file_entry['hash'])
+    if manifest is None:
+        manifest = _read_library_names(blend_path)
+        cache['manifests'][file_entry['hash']] = manifest
+        _save_manifest_cache()
+    return manifest
+
+
+def find_missing_assets(blend_path, assets):
+    """根据清单检查资源是否存在，返回缺少的资源名称列表"""
+    manifest = get_manifest(blend_path)
+    missing = []
+    for category, names in assets.items():
+        available = set(manifest.get(category, ()))
+        missing.extend(name for name in names if name not in available)
+    return missing
+
+
+def load_assets(blend_path, assets, link=False):
+    """一次打开库文件导入所有需要的资源
+
+    assets: {类型: [名称]} (也可以是以名称为键的字典)
+    返回 {类型: {名称: 导入的数据块}}
+    """
+    missing = find_missing_assets(blend_path, assets)
+    if missing:
+        raise BobHException(f'预设文件 {os.path.basename(blend_path)} 中缺少: {", ".join(missing)}')
+
+    with bpy.data.libraries.load(blend_path, link=link) as (_, data_to):
+        for category, names in assets.items():
+            setattr(data_to, category, list(names))
+
+    loaded = {}
+    for category, names in assets.items():
+        names = list(names)
+        datablocks = getattr(data_to, category)
+        loaded[category] = {name: datablock for name, datablock in zip(names, datablocks)}
+        failed = [name for name, datablock in loaded[category].items() if datablock is None]
+        if failed:
+            raise BobHException(f'无法从 {os.path.basename(blend_path)} 导入: {", ".join(failed)}')
+    return loaded
+
+
+def load_pipeline_assets(step, link=None):
+    """导入某个流程步骤需要的全部资源，每个预设文件只打开一次
+
+    link为None时按偏好设置决定追加还是链接
+
+    返回 {预设文件键: {类型: {名称: 数据块}}}
+    """
+    if link is None:
+        link = use_linked_presets()
+    return {
+        preset_key: load_assets(get_preset_path(preset_key), assets, link=link)
+        for preset_key, assets in PIPELINE_ASSETS[step].items()
+    }
@@ -0,0 +1,219 @@
+import bpy
+import json
+from ..bobh_exception import BobHException
+from .character_state import (
+    MATERIAL_ROLES,
+    ROLE_PROPERTY,
+    SHARED_MODEL_NAME,
+    SHARED_SLOTS_PROPERTY,
+    get_model_name,
+    get_shared_slots,
+    is_shared_material,
+    slot_node_name,
+    tag_character_material,
+)
+from .material_bindings import get_binding_schema, slot_texture_nodes
+from .preset_library import find_preset_datablock
+
+
+# 共享材质上记录所属的材质组编号
+SHARED_SET_PROPERTY = 'bobh_shared_set'
+# 角色mesh物体上记录槽位编号的属性，共享材质通过对象属性（Attribute节点）读取
+SLOT_ATTRIBUTE = 'bobh_character_slot'
+
+SLOT_NODE_SPACING = 280
+
+
+def _find_socket(sockets, identifier):
+    for socket in sockets:
+        if socket.identifier == identifier:
+            return socket
+    raise KeyError(identifier)
+
+
+def _slot_factors(node_tree, capacity):
+    """返回每个槽位的选择因子输出（第0个为None）：物体的槽位属性等于该槽位编号时为1，否则为0"""
+    attribute = node_tree.nodes.new('ShaderNodeAttribute')
+    attribute.name = SLOT_ATTRIBUTE
+    attribute.attribute_type = 'OBJECT'
+    attribute.attribute_name = SLOT_ATTRIBUTE
+    factors = [None]
+    for slot in range(1, capacity):
+        compare = node_tree.nodes.new('ShaderNodeMath')
+        compare.operation = 'COMPARE'
+        compare.inputs[1].default_value = slot
+        compare.inputs[2].default_value = 0.5
+        node_tree.links.new(attribute.outputs['Fac'], compare.inputs[0])
+        factors.append(compare.outputs[0])
+    return factors
+
+
+def _select_by_slot(node_tree, sockets, factors, data_type):
+    """按槽位从sockets中选出一个输出：用Mix节点依次把后面槽位的输出混合进来"""
+    suffix = 'Color' if data_type == 'RGBA' else 'Float'
+    result = sockets[0]
+    for slot in range(1, len(sockets)):
+        mix = node_tree.nodes.new('ShaderNodeMix')
+        mix.data_type = data_type
+        node_tree.links.new(factors[slot], _find_socket(mix.inputs, 'Factor_Float'))
+        node_tree.links.new(result, _find_socket(mix.inputs, f'A_{suffix}'))
+        node_tree.links.new(sockets[slot], _find_socket(mix.inputs, f'B_{suffix}'))
+        result = _find_socket(mix.outputs, f'Result_{suffix}')
+    return result
+
+
+def expand_texture_node(node_tree, node, factors):
+    """为贴图节点的每个槽位复制一份（输入连接相同），原有的输出连接改为按槽位选择"""
+    copies = [node]
+    for slot in range(1, len(factors)):
+        copy = node_tree.nodes.new('ShaderNodeTexImage')
+        copy.name = slot_node_name(node.name, slot)
+        copy.label = node.label or node.name
+        copy.location = (node.location[0], node.location[1] - SLOT_NODE_SPACING * slot)
+        copy.interpolation = node.interpolation
+        copy.projection = node.projection
+        copy.extension = node.extension
+        for index, socket in enumerate(node.inputs):
+            for link in socket.links:
+                node_tree.links.new(link.from_socket, copy.inputs[index])
+        copies.append(copy)
+
+    for index, socket in enumerate(node.outputs):
+        targets = [link.to_socket for link in socket.links]
+        if not targets:
+            continue
+        data_type = 'RGBA' if socket.type == 'RGBA' else 'FLOAT'
+        selected = _select_by_slot(node_tree, [copy.outputs[index] for copy in copies], factors, data_type)
+        for target in targets:
+            # 连接到已有连接的输入时会替换原来的连接
+            node_tree.links.new(selected, target)
+
+
+def expand_outline_colors(node_tree, group_node, factors, input_names):
+    """描边颜色从节点组输入的默认值改为每个槽位一个RGB节点，按槽位选择后连接到输入"""
+    for input_name in input_names:
+        socket = group_node.inputs[input_name]
+        if socket.is_linked:
+            raise BobHException(f'共享材质模板中描边颜色输入已被连接: {input_name}')
+        colors = []
+        for slot in range(len(factors)):
+            rgb = node_tree.nodes.new('ShaderNodeRGB')
+            rgb.name = slot_node_name(input_name, slot)
+            rgb.label = rgb.name
+            rgb.location = (group_node.location[0] - 600, group_node.location[1] - SLOT_NODE_SPACING * slot)
+            rgb.outputs[0].default_value = tuple(socket.default_value)
+            colors.append(rgb.outputs[0])
+        node_tree.links.new(_select_by_slot(node_tree, colors, factors, 'RGBA'), socket)
+
+
+def expand_shared_material(material, capacity, group_copies):
+    """把材质展开为capacity个槽位
+
+    group_copies: 模板节点组完整名称 -> 展开后的副本，同一套共享材质中的头发和身体共用
+    每个槽位需要单独一份的节点和描边颜色输入由材质绑定表决定
+    """
+    schema = get_binding_schema()
+    texture_nodes, group_texture_nodes = slot_texture_nodes(schema)
+    outline_group_node = schema['outlines']['group'][-1]
+    node_tree = material.node_tree
+    factors = _slot_factors(node_tree, capacity)
+    for node in list(node_tree.nodes):
+        if node.type == 'TEX_IMAGE' and node.name in texture_nodes:
+            expand_texture_node(node_tree, node, factors)
+        elif node.type == 'GROUP' and node.name in group_texture_nodes and node.node_tree is not None:
+            group = group_copies.get(node.node_tree.name_full)
+            if group is None:
+                # 节点组属于这套共享材质，链接的节点组复制后成为本地数据
+                group = group_copies[node.node_tree.name_full] = node.node_tree.copy()
+                group.use_fake_user = False
+                group_factors = _slot_factors(group, capacity)
+                for name in sorted(group_texture_nodes[node.name]):
+                    inner_node = group.nodes.get(name)
+                    if inner_node is not None:
+                        expand_texture_node(group, inner_node, group_factors)
+            node.node_tree = group
+        elif node.type == 'GROUP' and node.name == outline_group_node:
+            expand_outline_colors(node_tree, node, factors, schema['outlines']['color_inputs'].values())
+
+
+def find_shared_material_sets():
+    """材质组编号 -> {材质用途键: 材质}，只返回用途齐全的组"""
+    material_sets = {}
+    for material in bpy.data.materials:
+        if is_shared_material(material):
+            material_sets.setdefault(material.get(SHARED_SET_PROPERTY), {})[material.get(ROLE_PROPERTY)] = material
+    return {
+        set_id: materials for set_id, materials in material_sets.items()
+        if set(materials) == set(MATERIAL_ROLES)
+    }
+
+
+def _write_slots(materials, slots):
+    value = json.dumps(slots, ensure_ascii=False)
+    for material in materials.values():
+        material[SHARED_SLOTS_PROPERTY] = value
+
+
+def _material_name_map(materials):
+    return {role: material.name for role, material in materials.items()}
+
+
+def create_shared_material_set(set_id, capacity):
+    group_copies = {}
+    materials = {}
+    for role, (ref_material_name, role_name) in MATERIAL_ROLES.items():
+        ref_material = find_preset_datablock('materials', ref_material_name)
+        material = ref_material.copy()
+        material.name = f'GI_Shared_{role_name}'
+        material.use_fake_user = False
+        tag_character_material(material, SHARED_MODEL_NAME, role)
+        material[SHARED_SET_PROPERTY] = set_id
+        expand_shared_material(material, capacity, group_copies)
+        materials[role] = material
+    _write_slots(materials, [''] * capacity)
+    return materials
+
+
+def allocate_shared_slot(model_name, capacity):
+    """为角色分配共享材质中的槽位，返回 (材质名称映射, 槽位编号)
+
+    已有槽位时直接返回；否则使用空闲的槽位（包括场景中已经不存在的模型留下的槽位），
+    所有材质组都已满时创建一套新的共享材质
+    """
+    material_sets = find_shared_material_sets()
+    for materials in material_sets.values():
+        slots = get_shared_slots(materials['Body_Mat_Name'])
+        if model_name in slots:
+            return _material_name_map(materials), slots.index(model_name)
+
+    live_models = {
+        get_model_name(obj) for obj in bpy.data.objects if getattr(obj, 'mmd_type', None) == 'ROOT'
+    }
+    for materials in material_sets.values():
+        slots = get_shared_slots(materials['Body_Mat_Name'])
+        for slot, owner in enumerate(slots):
+            if not owner or owner not in live_models:
+                slots[slot] = model_name
+                _write_slots(materials, slots)
+                return _material_name_map(materials), slot
+
+    materials = create_shared_material_set(max(material_sets, default=-1) + 1, capacity)
+    slots = get_shared_slots(materials['Body_Mat_Name'])
+    slots[0] = model_name
+    _write_slots(materials, slots)
+    return _material_name_map(materials), 0
+
+
+def release_shared_slot(model_name):
+    """角色不再使用共享材质时释放它的槽位"""
+    for materials in find_shared_material_sets().values():
+        slots = get_shared_slots(materials['Body_Mat_Name'])
+        if model_name in slots:
+            slots[slots.index(model_name)] = ''
+            _write_slots(materials, slots)
+
+
+def assign_character_slot(mesh_objects, slot):
+    for mesh_obj in mesh_objects:
+        if mesh_obj.get(SLOT_ATTRIBUTE) != slot:
+            mesh_obj[SLOT_ATTRIBUTE] = slot
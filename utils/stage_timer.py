@@ -0,0 +1,113 @@
+import bpy
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from .cache_directory import get_cache_directory
+from ..preferences import stage_timing_enabled, get_stage_timing_log_file
+
+
+# 最近一次运行的结果，供面板显示
+_last_run = None
+
+
+def get_last_run():
+    return _last_run
+
+
+def get_default_log_file():
+    return os.path.join(get_cache_directory('logs'), 'stage_timing.jsonl')
+
+
+def _datablock_counts():
+    return {
+        'objects': len(bpy.data.objects),
+        'materials': len(bpy.data.materials),
+        'images': len(bpy.data.images),
+    }
+
+
+class StageTimer:
+    """按阶段记录一次操作的耗时，未启用时stage()只是一个空的上下文
+
+    用法:
+        timer = StageTimer('bobh.apply_postprocess')
+        with timer.stage('setup_compositor_nodes') as counts:
+            counts['nodes'] = 3
+        timer.finish('FINISHED')
+
+    counts中可以写入本阶段处理的物体/材质/图片等数量，未写入的objects/materials/images
+    记录为本阶段新增的数据块数量
+    """
+
+    def __init__(self, operator_name):
+        self.operator_name = operator_name
+        self.enabled = stage_timing_enabled()
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, character=None):
+        counts = {}
+        if not self.enabled:
+            yield counts
+            return
+
+        before = _datablock_counts()
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            duration = time.perf_counter() - start
+            for key, value in _datablock_counts().items():
+                counts.setdefault(key, value - before[key])
+            self.records.append({
+                'stage': name,
+                'character': character,
+                'duration': duration,
+                'counts': counts,
+            })
+
+    def finish(self, result):
+        """记录操作结果，更新面板显示的结果并把所有记录追加到日志文件"""
+        global _last_run
+        if not self.enabled:
+            return
+
+        total = time.perf_counter() - self._start
+        _last_run = {
+            'operator': self.operator_name,
+            'result': result,
+            'total': total,
+            'stages': self.summarize(),
+        }
+
+        timestamp = time.time()
+        base = {
+            'timestamp': timestamp,
+            'run_id': self.run_id,
+            'operator': self.operator_name,
+            'blend_file': bpy.data.filepath,
+        }
+        lines = [json.dumps({**base, **record}, ensure_ascii=False) for record in self.records]
+        lines.append(json.dumps({**base, 'stage': 'total', 'result': result, 'duration': total}, ensure_ascii=False))
+
+        log_file = get_stage_timing_log_file() or get_default_log_file()
+        try:
+            log_directory = os.path.dirname(log_file)
+            if log_directory:
+                os.makedirs(log_directory, exist_ok=True)
+            with open(log_file, 'a', encoding='utf-8') as file:
+                file.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            print(f'无法写入耗时日志: {log_file} - {e}')
+
+    def summarize(self):
+        """按阶段合并多个角色的耗时，保持阶段首次出现的顺序"""
+        stages = {}
+        for record in self.records:
+            duration, count = stages.get(record['stage'], (0.0, 0))
+            stages[record['stage']] = (duration + record['duration'], count + 1)
+        return [(name, duration, count) for name, (duration, count) in stages.items()]
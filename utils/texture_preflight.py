@@ -0,0 +1,161 @@
+import hashlib
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from ..bobh_exception import BobHException
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# 签名 + IHDR块（长度、类型、13字节数据、CRC），IHDR必须是第一个块
+PNG_HEADER_SIZE = len(PNG_SIGNATURE) + 8 + 13 + 4
+# 颜色类型 -> 允许的位深
+PNG_BIT_DEPTHS = {0: (1, 2, 4, 8, 16), 2: (8, 16), 3: (1, 2, 4, 8), 4: (8, 16), 6: (8, 16)}
+# 带alpha通道的颜色类型（灰度+alpha, RGBA）
+PNG_ALPHA_COLOR_TYPES = (4, 6)
+
+# Blender能加载的最大贴图尺寸
+MAX_TEXTURE_SIZE = 16384
+# Shadow Ramp每行一条渐变，高度只有几十像素
+MAX_SHADOW_RAMP_HEIGHT = 64
+
+# 贴图后缀 -> 对贴图的要求，alpha: Lightmap的alpha通道保存材质区域（作为Non-Color读取），
+# ramp: Shadow Ramp每行一条渐变，宽度大于高度
+TEXTURE_EXPECTATIONS = {
+    '_Tex_Body_Lightmap.png': {'alpha': True},
+    '_Body_Lightmap.png': {'alpha': True},
+    '_Hair_Lightmap.png': {'alpha': True},
+    '_Tex_Body_Shadow_Ramp.png': {'ramp': True},
+    '_Body_Shadow_Ramp.png': {'ramp': True},
+    '_Hair_Shadow_Ramp.png': {'ramp': True},
+}
+
+
+def verify_png_file(path):
+    """完整读取PNG文件并校验签名和每个chunk的CRC，返回文件内容的sha1
+
+    读取文件的同时也让文件进入系统缓存，后续Blender加载时不必再等待磁盘/网络
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError as e:
+        raise BobHException(f'无法读取贴图文件: {path} - {e}')
+
+    if len(data) == 0:
+        raise BobHException(f'贴图文件为空: {path}')
+    if not data.startswith(PNG_SIGNATURE):
+        raise BobHException(f'不是有效的PNG文件: {path}')
+
+    offset = len(PNG_SIGNATURE)
+    view = memoryview(data)
+    seen_iend = False
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack_from('>I4s', data, offset)
+        chunk_end = offset + 8 + length + 4
+        if chunk_end > len(data):
+            raise BobHException(f'PNG文件被截断: {path}')
+        expected_crc = struct.unpack_from('>I', data, chunk_end - 4)[0]
+        if zlib.crc32(view[offset + 4:chunk_end - 4]) != expected_crc:
+            raise BobHException(f'PNG文件CRC校验失败({chunk_type.decode("latin-1")}): {path}')
+        offset = chunk_end
+        if chunk_type == b'IEND':
+            seen_iend = True
+            break
+    if not seen_iend:
+        raise BobHException(f'PNG文件缺少IEND结束块: {path}')
+
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_png_header(path):
+    """只读取PNG签名和IHDR块，返回 (宽, 高, 位深, 颜色类型)"""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read(PNG_HEADER_SIZE)
+    except OSError as e:
+        raise BobHException(f'无法读取贴图文件: {path} - {e}')
+
+    if len(data) == 0:
+        raise BobHException(f'贴图文件为空: {path}')
+    if not data.startswith(PNG_SIGNATURE):
+        raise BobHException(f'不是有效的PNG文件: {path}')
+    if len(data) < PNG_HEADER_SIZE:
+        raise BobHException(f'PNG文件被截断: {path}')
+    length, chunk_type = struct.unpack_from('>I4s', data, len(PNG_SIGNATURE))
+    if chunk_type != b'IHDR' or length != 13:
+        raise BobHException(f'PNG文件缺少IHDR块: {path}')
+    expected_crc = struct.unpack_from('>I', data, PNG_HEADER_SIZE - 4)[0]
+    if zlib.crc32(data[len(PNG_SIGNATURE) + 4:PNG_HEADER_SIZE - 4]) != expected_crc:
+        raise BobHException(f'PNG文件CRC校验失败(IHDR): {path}')
+
+    width, height, bit_depth, color_type, compression, filter_method, interlace = struct.unpack_from(
+        '>IIBBBBB', data, len(PNG_SIGNATURE) + 8
+    )
+    if bit_depth not in PNG_BIT_DEPTHS.get(color_type, ()):
+        raise BobHException(f'PNG文件头无效(颜色类型{color_type}, {bit_depth}位): {path}')
+    if compression != 0 or filter_method != 0 or interlace > 1:
+        raise BobHException(f'PNG文件头无效(压缩/过滤/隔行方式): {path}')
+    return width, height, bit_depth, color_type
+
+
+def check_texture_header(path, suffix):
+    """按贴图用途检查PNG文件头中的尺寸、位深和alpha通道，不符合时抛出BobHException"""
+    width, height, bit_depth, color_type = read_png_header(path)
+    name = os.path.basename(path)
+    if not 0 < width <= MAX_TEXTURE_SIZE or not 0 < height <= MAX_TEXTURE_SIZE:
+        raise BobHException(f'贴图尺寸无效({width}x{height}): {name}')
+    expectation = TEXTURE_EXPECTATIONS.get(suffix, {})
+    if expectation.get('alpha') and color_type not in PNG_ALPHA_COLOR_TYPES:
+        raise BobHException(f'贴图缺少alpha通道(颜色类型{color_type}, {bit_depth}位): {name}')
+    if expectation.get('ramp') and (height > MAX_SHADOW_RAMP_HEIGHT or height >= width):
+        raise BobHException(f'贴图尺寸不像Shadow Ramp({width}x{height}，应为每行一条渐变): {name}')
+
+
+def check_texture_headers(index, suffixes):
+    """检查角色材质目录（CharacterAssetIndex）中各用途的贴图，返回所有问题的描述，没有问题时返回空列表
+
+    只读取每个文件开头的IHDR块，可以在创建任何数据块之前拒绝缺失、损坏或不符合用途的贴图
+    """
+    problems = []
+    for suffix in suffixes:
+        path = index.texture_path(suffix)
+        if not path:
+            problems.append(f'缺少贴图文件: {suffix}')
+            continue
+        try:
+            check_texture_header(path, suffix)
+        except BobHException as e:
+            problems.append(str(e))
+    # 同一个文件可能同时匹配多个后缀（例如_Tex_Body_Diffuse.png和_Body_Diffuse.png）
+    return list(dict.fromkeys(problems))
+
+
+class TexturePreflight:
+    """在后台线程池中预读并校验贴图，主线程绑定贴图时再取结果"""
+
+    def __init__(self, paths, max_workers=None):
+        paths = list(dict.fromkeys(path for path in paths if path))
+        if max_workers is None:
+            max_workers = min(8, len(paths)) or 1
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bobh_preflight')
+        self._futures = {
+            os.path.normcase(os.path.abspath(path)): self._executor.submit(verify_png_file, path)
+            for path in paths
+        }
+
+    def result(self, path):
+        """等待指定贴图的校验结果，返回内容哈希；该贴图不在预检列表中时返回None"""
+        future = self._futures.get(os.path.normcase(os.path.abspath(path)))
+        if future is None:
+            return None
+        return future.result()
+
+    def wait_all(self):
+        for future in self._futures.values():
+            future.result()
+
+    def shutdown(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,263 @@
+import bpy
+import os
+import struct
+import zlib
+from bpy.app.handlers import persistent
+from .cache_directory import get_cache_directory
+from .character_state import iter_character_texture_nodes
+from .image_cache import HASH_PROPERTY, get_content_hash
+from ..preferences import use_texture_proxies, get_texture_proxy_scale
+
+
+# 代理图片上记录对应的全分辨率图片名称
+PROXY_SOURCE_PROPERTY = 'bobh_proxy_source'
+# 代理图片上记录缩小比例
+PROXY_SCALE_PROPERTY = 'bobh_proxy_scale'
+# 全分辨率图片上记录当前使用的代理图片名称
+PROXY_PROPERTY = 'bobh_proxy'
+
+# alpha通道存放材质区域编号的贴图，缩小时alpha按最近邻取样（求平均会产生不存在的编号，Shader会选错Ramp行）
+ID_ALPHA_SUFFIXES = ('_Lightmap.png',)
+
+# 渲染期间换回全分辨率图片的节点: [(节点, 代理图片)]
+_swapped_nodes = []
+# 保存期间换回全分辨率图片的节点: [(节点, 代理图片)]
+_saved_nodes = []
+
+
+def _proxy_cache_path(content_hash, scale, nearest_alpha):
+    suffix = '_nearest_alpha' if nearest_alpha else ''
+    return os.path.join(get_cache_directory('texture_proxies'), f'{content_hash}_{scale}{suffix}.png')
+
+
+def has_id_alpha(image):
+    file_name = os.path.basename(image.filepath) or image.name
+    return file_name.endswith(ID_ALPHA_SUFFIXES)
+
+
+def _write_png_rgba8(path, pixels):
+    """把 (高, 宽, 4) 的uint8数组写为PNG（数组第一行为图片顶部）"""
+    import numpy as np
+
+    height, width, _ = pixels.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, width * 4)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        file.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        file.write(chunk(b'IEND', b''))
+    os.replace(temp_path, path)
+
+
+def build_proxy_file(image, scale, path, nearest_alpha=False):
+    """读取图片的像素缓冲，按scale做盒式缩小后写入path，nearest_alpha时alpha通道按最近邻取样"""
+    import numpy as np
+
+    width, height = image.size
+    buffer = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(buffer)
+    # Blender的像素从底部一行开始，缩小后再翻转为PNG的行顺序
+    pixels = buffer.reshape(height, width, 4)
+    proxy_height, proxy_width = max(1, height // scale), max(1, width // scale)
+    pixels = pixels[:proxy_height * scale, :proxy_width * scale]
+    if scale > 1 and height >= scale and width >= scale:
+        alpha = pixels[::scale, ::scale, 3]
+        pixels = pixels.reshape(proxy_height, scale, proxy_width, scale, 4).mean(axis=(1, 3))
+        if nearest_alpha:
+            pixels[:, :, 3] = alpha
+    pixels = np.clip(pixels[::-1] * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    _write_png_rgba8(path, pixels)
+
+
+def get_proxy_image(image, scale, cached_only=False):
+    """返回图片的缩小代理，按内容哈希和缩放比例缓存在磁盘上
+
+    浮点图片或尺寸过小的图片不使用代理，原样返回；cached_only时磁盘上没有代理也原样返回（不生成）
+    """
+    if scale <= 1:
+        return image
+    proxy_name = image.get(PROXY_PROPERTY)
+    proxy = bpy.data.images.get(proxy_name) if proxy_name else None
+    if (proxy is not None and proxy.get(PROXY_SOURCE_PROPERTY) == image.name
+            and proxy.get(PROXY_SCALE_PROPERTY) == scale):
+        return proxy
+
+    nearest_alpha = has_id_alpha(image)
+    content_hash = image.get(HASH_PROPERTY) or get_content_hash(bpy.path.abspath(image.filepath))
+    path = _proxy_cache_path(content_hash, scale, nearest_alpha)
+    if not os.path.exists(path):
+        if cached_only:
+            return image
+        # is_float和size会解码全分辨率图片，只在需要生成代理时读取
+        if image.is_float:
+            return image
+        width, height = image.size
+        if width < scale * 2 or height < scale * 2:
+            return image
+        build_proxy_file(image, scale, path, nearest_alpha)
+
+    proxy = bpy.data.images.load(path, check_existing=True)
+    proxy.name = f'{image.name} (1/{scale})'
+    proxy[PROXY_SOURCE_PROPERTY] = image.name
+    proxy[PROXY_SCALE_PROPERTY] = scale
+    proxy.colorspace_settings.name = image.colorspace_settings.name
+    proxy.alpha_mode = image.alpha_mode
+    image[PROXY_PROPERTY] = proxy.name
+    # 全分辨率图片在视口中不被引用，需要fake user防止保存时被丢弃，并释放已解码的像素
+    image.use_fake_user = True
+    image.buffers_free()
+    _lock_interface_during_render()
+    return proxy
+
+
+def _lock_interface_during_render():
+    # 界面中渲染时渲染回调在渲染线程中执行，锁定界面后渲染期间主线程不会同时修改或绘制这些数据
+    for scene in bpy.data.scenes:
+        if not scene.render.use_lock_interface:
+            scene.render.use_lock_interface = True
+
+
+def get_source_image(image):
+    """返回代理图片对应的全分辨率图片，不是代理时返回None"""
+    source_name = image.get(PROXY_SOURCE_PROPERTY)
+    return bpy.data.images.get(source_name) if source_name else None
+
+
+def _sync_image_settings(target, source):
+    # 应用贴图时色彩空间和alpha模式设置在视口绑定的图片上
+    if target.colorspace_settings.name != source.colorspace_settings.name:
+        target.colorspace_settings.name = source.colorspace_settings.name
+    if target.alpha_mode != source.alpha_mode:
+        target.alpha_mode = source.alpha_mode
+
+
+def bind_proxies(scale, cached_only=False):
+    """把角色材质中的贴图换成代理，返回替换的节点数量"""
+    count = 0
+    for node in list(iter_character_texture_nodes()):
+        image = node.image
+        source = get_source_image(image)
+        if source is not None:
+            if image.get(PROXY_SCALE_PROPERTY) == scale:
+                continue
+            image = source
+        proxy = get_proxy_image(image, scale, cached_only)
+        if proxy is not image:
+            _sync_image_settings(proxy, node.image)
+            node.image = proxy
+            count += 1
+    return count
+
+
+def bind_full_resolution():
+    """把角色材质中的代理换回全分辨率贴图，返回替换的节点数量"""
+    count = 0
+    for node in list(iter_character_texture_nodes()):
+        source = get_source_image(node.image)
+        if source is not None:
+            _sync_image_settings(source, node.image)
+            source.use_fake_user = False
+            node.image = source
+            count += 1
+    return count
+
+
+def _swap_to_full_resolution(swapped):
+    """把代理换成全分辨率图片，被替换的节点和代理记录到swapped中"""
+    for node in list(iter_character_texture_nodes()):
+        source = get_source_image(node.image)
+        if source is not None:
+            _sync_image_settings(source, node.image)
+            swapped.append((node, node.image))
+            node.image = source
+
+
+def _restore_proxies(swapped):
+    while swapped:
+        node, proxy = swapped.pop()
+        try:
+            node.image = proxy
+        except ReferenceError:
+            pass
+
+
+@persistent
+def _on_render_pre(scene, *args):
+    if _swapped_nodes:
+        # 动画渲染时每帧都会调用，第一帧已经换过
+        return
+    _swap_to_full_resolution(_swapped_nodes)
+
+
+@persistent
+def _on_render_done(scene, *args):
+    # 在整个渲染任务结束（或取消）后换回代理，而不是每帧之后，避免动画渲染时每帧来回切换贴图
+    _restore_proxies(_swapped_nodes)
+
+
+@persistent
+def _on_save_pre(*args):
+    # 保存的文件中总是绑定全分辨率贴图（代理没有用户，不会被保存），
+    # 没有启用插件的渲染农场或命令行渲染也能得到正确的结果
+    _swap_to_full_resolution(_saved_nodes)
+
+
+@persistent
+def _on_save_post(*args):
+    _restore_proxies(_saved_nodes)
+
+
+def bind_cached_proxies():
+    """打开文件后重新绑定磁盘上已有的代理，不在打开文件时生成代理（需要解码全分辨率贴图）
+
+    由插件的load_post处理函数在启用了代理贴图时调用，返回替换的节点数量
+    """
+    if bpy.app.background or not use_texture_proxies():
+        return 0
+    try:
+        return bind_proxies(get_texture_proxy_scale(), cached_only=True)
+    except OSError:
+        return 0
+
+
+@persistent
+def _on_load_post(*args):
+    _swapped_nodes.clear()
+    _saved_nodes.clear()
+
+
+_HANDLERS = (
+    ('render_pre', _on_render_pre),
+    ('render_complete', _on_render_done),
+    ('render_cancel', _on_render_done),
+    ('save_pre', _on_save_pre),
+    ('save_post', _on_save_post),
+    ('load_post', _on_load_post),
+)
+
+
+def register():
+    for handler_name, handler in _HANDLERS:
+        handlers = getattr(bpy.app.handlers, handler_name)
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    for handler_name, handler in _HANDLERS:
+        handlers = getattr(bpy.app.handlers, handler_name)
+        if handler in handlers:
+            handlers.remove(handler)
+    _restore_proxies(_swapped_nodes)
+    _restore_proxies(_saved_nodes)
+
+
+# 启用插件时不导入这个模块，第一次使用时导入并注册处理函数（只有绑定过代理贴图才需要在渲染和保存时换回全分辨率），
+# 重新启用插件时由registry.register_handlers为已经导入的模块重新注册
+register()